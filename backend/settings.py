@@ -136,6 +136,12 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+#
+# `python manage.py test` usa este mismo servidor MySQL y crea la base de
+# pruebas DATABASE_TEST_NAME (por defecto test_<DATABASE_NAME>); el usuario
+# necesita permiso para crearla y borrarla. Las pruebas de concurrencia de
+# ventas (ventas.tests.ReservarStockConcurrenciaTests) requieren SELECT ...
+# FOR UPDATE y se omiten en motores que no lo soportan, como sqlite.
 
 DATABASES = {
     'default': {
@@ -145,6 +151,28 @@ DATABASES = {
         'PASSWORD': os.getenv('DATABASE_PASSWORD'),
         'HOST': os.getenv('DATABASE_HOST'),
         'PORT': os.getenv('DATABASE_PORT'),
+        'TEST': {
+            'NAME': os.getenv('DATABASE_TEST_NAME'),
+        },
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+#
+# Compartida por todos los workers (combos activos, índice de categorías de
+# combos, frecuencias de la búsqueda de productos): una caché en memoria de
+# cada proceso dejaría a los demás workers con datos viejos tras invalidar.
+# La tabla se crea con la migración core.0002_cache_compartida.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_compartida',
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
     }
 }
 
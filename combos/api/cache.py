@@ -0,0 +1,176 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+
+# ======================================================
+# Cachés de combos para el POS
+# ======================================================
+# - Combos activos (/api/combos/active/): se invalida completa.
+# - Índice de categorías (combos.api.categorias): las categorías usadas en
+#   casillas de combos, más una entrada por categoría con sus productos.
+#   Cada categoría tiene su propia versión: un cambio de stock solo descarta
+#   las categorías de los productos que cambiaron y la lista se vuelve a
+#   armar al leerla. No hay lectura-modificación-escritura de una entrada
+#   compartida, así dos ventas simultáneas no pueden pisarse.
+#
+# Cada caché se guarda bajo una llave que incluye una versión. Invalidar es
+# cambiar la versión: una lectura que haya empezado antes del cambio guarda
+# su resultado bajo la versión vieja y nadie lo vuelve a leer. Las
+# invalidaciones corren al confirmar la transacción (on_commit), para que la
+# siguiente lectura ya vea los datos nuevos. La caché por defecto es
+# compartida entre workers (CACHES en settings), así una invalidación en un
+# worker vale para todos.
+#
+# Este módulo no importa inventario (los modelos se importan dentro de las
+# funciones): lo usan registrar_movimientos y reservar_stock sin crear
+# importaciones circulares.
+
+LLAVE_VERSION_COMBOS_ACTIVOS = 'combos:activos:version'
+LLAVE_VERSION_INDICE_CATEGORIAS = 'combos:categorias:version'
+
+# Red de seguridad por si algún cambio no pasa por las invalidaciones
+SEGUNDOS_CACHE_COMBOS = 300
+
+
+def _get_version(llave_version):
+    version = cache.get(llave_version)
+    if version is None:
+        cache.add(llave_version, uuid4().hex, None)
+        version = cache.get(llave_version)
+    return version
+
+
+def _cambiar_version(llave_version):
+    cache.set(llave_version, uuid4().hex, None)
+
+
+def get_llave_combos_activos():
+    """Llave vigente de la caché de combos activos."""
+    return f'combos:activos:{_get_version(LLAVE_VERSION_COMBOS_ACTIVOS)}'
+
+
+def get_llave_indice_categorias():
+    """Llave vigente del índice de categorías."""
+    return f'combos:categorias:{_get_version(LLAVE_VERSION_INDICE_CATEGORIAS)}'
+
+
+def _get_llave_version_categoria(categoria_id):
+    return f'combos:categoria:{categoria_id}:version'
+
+
+def get_llave_productos_categoria(categoria_id):
+    """
+    Llave vigente de los productos de una categoría del índice: cambia con la
+    versión del índice completo y con la de la categoría.
+    """
+    return 'combos:categoria:{}:{}:{}'.format(
+        categoria_id,
+        _get_version(LLAVE_VERSION_INDICE_CATEGORIAS),
+        _get_version(_get_llave_version_categoria(categoria_id)),
+    )
+
+
+def get_cache_combos_activos():
+    """
+    Retorna (llave, entrada) con la entrada cacheada vigente o None.
+    La entrada es {'productos': set de producto_id, 'combos': [...]}.
+    """
+    llave = get_llave_combos_activos()
+    return llave, cache.get(llave)
+
+
+def get_cache_indice_categorias():
+    """
+    Retorna (llave, categorías) con el conjunto vigente de categoria_id
+    usadas en casillas de combos, o None.
+    """
+    llave = get_llave_indice_categorias()
+    return llave, cache.get(llave)
+
+
+def get_cache_productos_categoria(categoria_id):
+    """Retorna (llave, productos) con la lista vigente de una categoría o None."""
+    llave = get_llave_productos_categoria(categoria_id)
+    return llave, cache.get(llave)
+
+
+def guardar_cache_combos(llave, entrada):
+    cache.set(llave, entrada, SEGUNDOS_CACHE_COMBOS)
+
+
+def invalidar_combos_activos():
+    """Descarta la caché de combos activos al confirmar la transacción en curso."""
+    transaction.on_commit(lambda: _cambiar_version(LLAVE_VERSION_COMBOS_ACTIVOS))
+
+
+def invalidar_indice_categorias():
+    """Descarta el índice de categorías al confirmar la transacción en curso."""
+    transaction.on_commit(lambda: _cambiar_version(LLAVE_VERSION_INDICE_CATEGORIAS))
+
+
+def _cambiar_versiones_categorias(categoria_ids):
+    cache.set_many({_get_llave_version_categoria(c): uuid4().hex for c in categoria_ids}, None)
+
+
+def _get_membresia_combos(producto_ids):
+    """
+    Con una consulta, indica si alguno de los productos es componente de un
+    combo activo y a qué categorías usadas en casillas de combos pertenecen.
+    Retorna (en_combo_activo, categoria_ids).
+    """
+    from combos.models import ProductoCombo
+    from productos.models import Producto
+
+    filas = set(
+        ProductoCombo.objects
+        .filter(combo__deleted_at__isnull=True)
+        .filter(
+            Q(producto_id__in=producto_ids)
+            | Q(categoria_id__in=Producto.all_objects.filter(pk__in=producto_ids).values('categoria_id'))
+        )
+        .values_list('producto_id', 'categoria_id', 'combo__activo')
+        .distinct()
+    )
+    en_combo_activo = any(producto_id is not None and activo for producto_id, _, activo in filas)
+    categoria_ids = {categoria_id for producto_id, categoria_id, _ in filas if producto_id is None}
+    return en_combo_activo, categoria_ids
+
+
+def notificar_cambio_productos(producto_ids, cambio_stock=True):
+    """
+    Al confirmar la transacción, refleja en las cachés el cambio de los
+    productos indicados:
+
+    - Combos activos: se descarta si alguno de los productos es componente
+      de un combo activo.
+    - Índice de categorías: se descartan las categorías de esos productos.
+
+    Los cambios de stock (ventas, recepciones, ajustes) primero consultan en
+    la base de datos si los productos están en algún combo; si no lo están
+    no se toca la caché, que con DatabaseCache también son consultas. Los
+    cambios del producto mismo (cambio_stock=False) pueden sacarlo de una
+    categoría indexada sin que se sepa cuál era, así que siempre revisan los
+    combos activos y descartan el índice completo.
+    """
+    producto_ids = set(producto_ids)
+    if not producto_ids:
+        return
+
+    def _notificar():
+        if cambio_stock:
+            en_combo_activo, categoria_ids = _get_membresia_combos(producto_ids)
+            if en_combo_activo:
+                _cambiar_version(LLAVE_VERSION_COMBOS_ACTIVOS)
+            if categoria_ids:
+                _cambiar_versiones_categorias(categoria_ids)
+            return
+
+        entrada = cache.get(get_llave_combos_activos())
+        if entrada is not None and not entrada['productos'].isdisjoint(producto_ids):
+            _cambiar_version(LLAVE_VERSION_COMBOS_ACTIVOS)
+        _cambiar_version(LLAVE_VERSION_INDICE_CATEGORIAS)
+
+    transaction.on_commit(_notificar)
@@ -0,0 +1,75 @@
+from combos.models import ProductoCombo
+from combos.api.cache import get_cache_indice_categorias, get_cache_productos_categoria, guardar_cache_combos
+from productos.models import Producto
+from inventarioproducto.api.utils import get_stock_productos
+
+
+# ======================================================
+# Índice categoría → productos elegibles para combos
+# ======================================================
+# Un combo puede tener casillas de categoría: en el POS el cliente elige
+# cualquier producto con stock de esa categoría. El índice vive en caché en
+# dos partes (ver combos.api.cache):
+#
+#   - las categorías usadas en alguna casilla: {categoria_id}
+#   - una entrada por categoría con sus productos con stock, ordenados
+#
+# Cada parte se arma al leerla si no está vigente. Los cambios de stock
+# descartan solo las categorías de los productos que cambiaron; los cambios
+# de combos, categorías o productos descartan el índice completo.
+
+
+def calcular_categorias_casillas():
+    """categoria_id usadas en casillas de combos no eliminados (una consulta)."""
+    return set(
+        ProductoCombo.objects
+        .filter(combo__deleted_at__isnull=True, categoria_id__isnull=False)
+        .values_list('categoria_id', flat=True)
+        .distinct()
+    )
+
+
+def calcular_productos_categoria(categoria_id):
+    """Productos con stock de una categoría, ordenados por nombre (dos consultas)."""
+    filas = list(
+        Producto.objects
+        .filter(categoria_id=categoria_id)
+        .values_list('id', 'nombre', 'precio_final')
+    )
+    stock = get_stock_productos(fila[0] for fila in filas)
+
+    productos = [
+        {
+            "id": producto_id,
+            "nombre": nombre,
+            "precio_final": float(precio_final),
+            "stock_disponible": stock[producto_id],
+        }
+        for producto_id, nombre, precio_final in filas
+        if stock[producto_id] > 0
+    ]
+    return sorted(productos, key=lambda p: (p['nombre'].lower(), p['id']))
+
+
+def get_categorias_casillas():
+    """Categorías usadas en casillas de combos, desde la caché si está vigente."""
+    llave, categorias = get_cache_indice_categorias()
+    if categorias is None:
+        categorias = calcular_categorias_casillas()
+        guardar_cache_combos(llave, categorias)
+    return categorias
+
+
+def get_productos_categoria(categoria_id):
+    """
+    Productos con stock de una categoría usada en casillas de combos,
+    ordenados por nombre, o None si la categoría no está en ningún combo.
+    """
+    if categoria_id not in get_categorias_casillas():
+        return None
+
+    llave, productos = get_cache_productos_categoria(categoria_id)
+    if productos is None:
+        productos = calcular_productos_categoria(categoria_id)
+        guardar_cache_combos(llave, productos)
+    return productos
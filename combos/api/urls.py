@@ -5,6 +5,7 @@ urlpatterns = [
     path('create/',                                         views.create_combo,                 name='create_combo'),
     path('list/',                                           views.list_combos,                  name='list_combos'),
     path('active/',                                         views.get_active_combos,            name='get_active_combos'),
+    path('categorias/<int:categoria_id>/productos/',        views.list_productos_categoria_combo, name='list_productos_categoria_combo'),
     path('<int:pk>/',                                       views.get_combo,                    name='get_combo'),
     path('<int:pk>/update/',                                views.update_combo,                 name='update_combo'),
     path('<int:pk>/delete/',                                views.delete_combo,                 name='delete_combo'),
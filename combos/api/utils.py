@@ -0,0 +1,145 @@
+from decimal import Decimal
+
+from django.db.models import Sum, Count, F, DecimalField, ExpressionWrapper
+from django.utils import timezone
+
+from combos.models import Combo, ProductoCombo
+from combos.api.cache import get_cache_combos_activos, guardar_cache_combos, invalidar_combos_activos
+from inventarioproducto.api.utils import get_stock_productos
+
+# Tope que se informa al POS cuando un combo solo tiene categorías
+CANTIDAD_MAXIMA_SOLO_CATEGORIAS = 999
+
+
+def _get_totales_combos(combo_ids):
+    """{combo_id: (precio_total, num_items)} de los componentes activos, con una consulta."""
+    subtotal = ExpressionWrapper(F('precio_combo') * F('cantidad'),
+                                 output_field=DecimalField(max_digits=14, decimal_places=2))
+    return {
+        fila['combo_id']: (fila['precio_total'] or Decimal('0.00'), fila['num_items'])
+        for fila in (
+            ProductoCombo.objects.filter(combo_id__in=combo_ids)
+            .values('combo_id')
+            .annotate(precio_total=Sum(subtotal), num_items=Count('id'))
+            .order_by()
+        )
+    }
+
+
+def actualizar_totales_combo(combo_id):
+    """
+    Recalcula precio_total y num_items de un combo desde sus componentes
+    activos. Se llama dentro de la transacción que agrega, edita o quita el
+    componente: bloquea la fila del combo antes de leer los componentes, así
+    dos ediciones simultáneas del mismo combo se aplican una tras otra y la
+    segunda ya ve a la primera.
+    """
+    combo = Combo.all_objects.select_for_update().get(pk=combo_id)
+    combo.precio_total, combo.num_items = _get_totales_combos([combo_id]).get(combo_id, (Decimal('0.00'), 0))
+    combo.save(update_fields=['precio_total', 'num_items', 'updated_at'])
+    return combo
+
+
+def recalcular_totales_combos(combo_ids):
+    """
+    Repara los totales desnormalizados de varios combos (incluidos los
+    eliminados lógicamente) con una consulta de agregados y un bulk_update.
+    Retorna el número de combos corregidos. Debe llamarse dentro de una
+    transacción.
+    """
+    totales = _get_totales_combos(combo_ids)
+    ahora = timezone.now()
+    corregidos = []
+    for combo in Combo.all_objects.select_for_update().filter(pk__in=combo_ids).order_by('id'):
+        precio_total, num_items = totales.get(combo.id, (Decimal('0.00'), 0))
+        if combo.precio_total != precio_total or combo.num_items != num_items:
+            combo.precio_total, combo.num_items = precio_total, num_items
+            combo.updated_at = ahora
+            corregidos.append(combo)
+
+    if corregidos:
+        Combo.all_objects.bulk_update(corregidos, ['precio_total', 'num_items', 'updated_at'])
+        invalidar_combos_activos()
+    return len(corregidos)
+
+
+def calcular_combos_activos():
+    """
+    Arma la lista de combos activos para el POS con su stock disponible.
+
+    Lee combos, componentes, productos y categorías con prefetch (una
+    consulta por tabla) y el stock de todos los productos componentes con
+    una sola consulta; cantidadMaxima se calcula en memoria y precio_total
+    es el total guardado en el combo.
+    Retorna {'productos': set de producto_id componentes, 'combos': [...]}.
+    """
+    combos = list(
+        Combo.objects.filter(activo=True).prefetch_related(
+            'productos_combo__producto', 'productos_combo__categoria'
+        ).order_by('nombre')
+    )
+
+    producto_ids = {
+        pc.producto_id
+        for combo in combos
+        for pc in combo.productos_combo.all()
+        if pc.producto_id
+    }
+    stock = get_stock_productos(producto_ids)
+
+    data = []
+    for combo in combos:
+        productos_info = []
+        cantidad_maxima = None  # None mientras no haya productos individuales
+
+        for pc in combo.productos_combo.all():
+            if pc.producto:
+                # Flujo producto individual: stock desde el saldo materializado
+                stock_disponible = stock[pc.producto_id]
+                combos_posibles = stock_disponible // pc.cantidad if pc.cantidad > 0 else 0
+                cantidad_maxima = combos_posibles if cantidad_maxima is None else min(cantidad_maxima, combos_posibles)
+
+                productos_info.append({
+                    "producto_id": pc.producto.id,
+                    "producto_nombre": pc.producto.nombre,
+                    "precio_combo": float(pc.precio_combo),
+                    "cantidad": pc.cantidad,
+                    "stock_disponible": stock_disponible,
+                })
+            elif pc.categoria:
+                # Flujo categoría: el stock se determina al elegir producto en el POS
+                productos_info.append({
+                    "categoria_id": pc.categoria.id,
+                    "categoria_nombre": pc.categoria.nombre,
+                    "precio_combo": float(pc.precio_combo),
+                    "cantidad": pc.cantidad,
+                    "stock_disponible": None,
+                })
+
+        if cantidad_maxima is None:
+            # Solo categorías: disponible sin límite de stock fijo (se valida al elegir producto)
+            cantidad_maxima = CANTIDAD_MAXIMA_SOLO_CATEGORIAS
+
+        data.append({
+            "id": combo.id,
+            "nombre": combo.nombre,
+            "precio_total": float(combo.precio_total),
+            "productos": productos_info,
+            "cantidadMaxima": int(cantidad_maxima),
+            "isCombo": True,
+        })
+
+    return {'productos': producto_ids, 'combos': data}
+
+
+def get_combos_activos():
+    """
+    Combos activos para el POS, desde la caché si está vigente.
+    Se invalida al cambiar combos, sus componentes, productos, categorías o
+    el stock de algún producto componente (ver combos.api.cache).
+    """
+    llave, entrada = get_cache_combos_activos()
+    if entrada is None:
+        entrada = calcular_combos_activos()
+        guardar_cache_combos(llave, entrada)
+    return entrada['combos']
@@ -12,8 +12,8 @@ from user.api.permissions import RolePermission
 from combos.models import Combo, ProductoCombo
 from productos.models import Producto
 from categoria.models import Categoria
-from proveedores.models import OrdenProveedorDetalle
-from ventas.models import DetalleVenta
+from combos.api.utils import get_combos_activos, actualizar_totales_combo
+from combos.api.categorias import get_productos_categoria
 
 COMBO_MANAGER_ROLES = ['admin', 'vendedor']
 
@@ -82,9 +82,7 @@ def create_combo(request):
 @permission_classes([IsAuthenticated, RolePermission(COMBO_MANAGER_ROLES)])
 def list_combos(request):
     try:
-        combos = Combo.objects.select_related('creado_por').prefetch_related(
-            'productos_combo__producto'
-        ).all()
+        combos = Combo.objects.select_related('creado_por').all()
 
         search = request.query_params.get('search')
         activo = request.query_params.get('activo')
@@ -113,7 +111,7 @@ def list_combos(request):
                 "nombre": combo.nombre,
                 "activo": combo.activo,
                 "precio_total": float(combo.precio_total),
-                "num_productos": combo.productos_combo.count(),
+                "num_productos": combo.num_items,
                 "creado_por": combo.creado_por.username if combo.creado_por else None,
                 "created_at": combo.created_at,
             })
@@ -191,7 +189,8 @@ def update_combo(request, pk):
 
         combo.nombre = nombre
         combo.activo = activo
-        combo.save()
+        # Sin tocar precio_total / num_items, que mantienen los componentes
+        combo.save(update_fields=['nombre', 'activo', 'updated_at'])
 
         return Response(
             {"message": "Combo actualizado correctamente."},
@@ -276,12 +275,14 @@ def add_product_to_combo(request, pk):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            producto_combo = ProductoCombo.objects.create(
-                combo=combo,
-                producto=producto,
-                precio_combo=precio_combo,
-                cantidad=cantidad
-            )
+            with transaction.atomic():
+                producto_combo = ProductoCombo.objects.create(
+                    combo=combo,
+                    producto=producto,
+                    precio_combo=precio_combo,
+                    cantidad=cantidad
+                )
+                actualizar_totales_combo(combo.id)
 
             data = {
                 "id": producto_combo.id,
@@ -302,12 +303,14 @@ def add_product_to_combo(request, pk):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            producto_combo = ProductoCombo.objects.create(
-                combo=combo,
-                categoria=categoria,
-                precio_combo=precio_combo,
-                cantidad=cantidad
-            )
+            with transaction.atomic():
+                producto_combo = ProductoCombo.objects.create(
+                    combo=combo,
+                    categoria=categoria,
+                    precio_combo=precio_combo,
+                    cantidad=cantidad
+                )
+                actualizar_totales_combo(combo.id)
 
             data = {
                 "id": producto_combo.id,
@@ -342,7 +345,9 @@ def remove_product_from_combo(request, pk, producto_combo_id):
     producto_combo = get_object_or_404(ProductoCombo, id=producto_combo_id, combo=combo)
 
     try:
-        producto_combo.delete()  # Soft delete
+        with transaction.atomic():
+            producto_combo.delete()  # Soft delete
+            actualizar_totales_combo(combo.id)
         return Response(
             {"message": "Producto eliminado del combo correctamente."},
             status=status.HTTP_200_OK
@@ -376,7 +381,9 @@ def update_product_in_combo(request, pk, producto_combo_id):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        producto_combo.save()
+        with transaction.atomic():
+            producto_combo.save()
+            actualizar_totales_combo(combo.id)
 
         return Response(
             {"message": "Producto actualizado en combo correctamente."},
@@ -398,85 +405,39 @@ def get_active_combos(request):
     """
     Endpoint optimizado para el POS que retorna solo combos activos
     con información de stock disponible para cada producto.
+    El cálculo es por conjuntos y se cachea (ver combos.api.utils).
     """
     try:
-        combos = Combo.objects.filter(activo=True).prefetch_related(
-            'productos_combo__producto'
-        ).order_by('nombre')
+        return Response(get_combos_activos(), status=status.HTTP_200_OK)
 
-        data = []
-
-        for combo in combos:
-            productos_info = []
-            stock_minimo = float('inf')  # Para calcular cuántos combos se pueden vender
-
-            tiene_productos_individuales = False
-
-            for pc in combo.productos_combo.all():
-                if pc.producto:
-                    tiene_productos_individuales = True
-                    # Flujo producto individual: calcular stock
-                    cantidad_recibida = (
-                        OrdenProveedorDetalle.objects
-                        .filter(
-                            orden_proveedor__estado='recibida',
-                            producto_id=pc.producto.id,
-                            deleted_at__isnull=True
-                        )
-                        .aggregate(total=Sum('cantidad'))['total'] or 0
-                    )
-
-                    cantidad_vendida = (
-                        DetalleVenta.objects
-                        .filter(
-                            producto_id=pc.producto.id,
-                            deleted_at__isnull=True
-                        )
-                        .aggregate(total=Sum('cantidad'))['total'] or 0
-                    )
-
-                    stock_disponible = cantidad_recibida - cantidad_vendida
-
-                    combos_posibles = stock_disponible // pc.cantidad if pc.cantidad > 0 else 0
-                    stock_minimo = min(stock_minimo, combos_posibles)
-
-                    productos_info.append({
-                        "producto_id": pc.producto.id,
-                        "producto_nombre": pc.producto.nombre,
-                        "precio_combo": float(pc.precio_combo),
-                        "cantidad": pc.cantidad,
-                        "stock_disponible": stock_disponible,
-                    })
-                elif pc.categoria:
-                    # Flujo categoría: el stock se determina al elegir producto en el POS
-                    productos_info.append({
-                        "categoria_id": pc.categoria.id,
-                        "categoria_nombre": pc.categoria.nombre,
-                        "precio_combo": float(pc.precio_combo),
-                        "cantidad": pc.cantidad,
-                        "stock_disponible": None,
-                    })
-
-            if tiene_productos_individuales:
-                # Stock limitado por los productos individuales
-                cantidad_maxima_combos = int(stock_minimo) if stock_minimo != float('inf') else 0
-            else:
-                # Solo categorías: disponible sin límite de stock fijo (se valida al elegir producto)
-                cantidad_maxima_combos = 999
+    except Exception as e:
+        return Response(
+            {"error": f"Error al obtener combos activos: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
-            data.append({
-                "id": combo.id,
-                "nombre": combo.nombre,
-                "precio_total": float(combo.precio_total),
-                "productos": productos_info,
-                "cantidadMaxima": cantidad_maxima_combos,
-                "isCombo": True,
-            })
 
-        return Response(data, status=status.HTTP_200_OK)
+# ======================================================
+# Productos elegibles de una categoría de combo (GET /categorias/<id>/productos/)
+# ======================================================
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, RolePermission(COMBO_MANAGER_ROLES)])
+def list_productos_categoria_combo(request, categoria_id):
+    """
+    Productos con stock que el POS puede ofrecer en una casilla de categoría
+    de un combo. Se sirve del índice de categorías cacheado.
+    """
+    try:
+        productos = get_productos_categoria(categoria_id)
+        if productos is None:
+            return Response(
+                {"error": "La categoría no está en ninguna casilla de combo."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(productos, status=status.HTTP_200_OK)
 
     except Exception as e:
         return Response(
-            {"error": f"Error al obtener combos activos: {str(e)}"},
+            {"error": f"Error al obtener los productos de la categoría: {str(e)}"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from combos.models import Combo
+from combos.api.utils import recalcular_totales_combos
+
+
+COMBOS_POR_BLOQUE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula el precio total y el número de componentes guardados en cada combo "
+        "desde sus componentes activos, y corrige los que no coincidan."
+    )
+
+    def handle(self, *args, **options):
+        combo_ids = list(Combo.all_objects.order_by('id').values_list('id', flat=True))
+
+        corregidos = 0
+        for i in range(0, len(combo_ids), COMBOS_POR_BLOQUE):
+            with transaction.atomic():
+                corregidos += recalcular_totales_combos(combo_ids[i:i + COMBOS_POR_BLOQUE])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Totales revisados en {len(combo_ids)} combo(s); {corregidos} corregido(s)."
+        ))
@@ -0,0 +1,49 @@
+# Generated by Django 4.2 on 2026-10-16 23:47
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def calcular_totales(apps, schema_editor):
+    """Llena precio_total y num_items desde los componentes activos de cada combo."""
+    Combo = apps.get_model('combos', 'Combo')
+    ProductoCombo = apps.get_model('combos', 'ProductoCombo')
+
+    componentes = ProductoCombo.objects.filter(combo_id=models.OuterRef('pk'), deleted_at__isnull=True).order_by()
+    total = componentes.values('combo_id').annotate(
+        total=models.Sum(
+            models.F('precio_combo') * models.F('cantidad'),
+            output_field=models.DecimalField(max_digits=14, decimal_places=2),
+        )
+    ).values('total')
+    cuenta = componentes.values('combo_id').annotate(cuenta=models.Count('id')).values('cuenta')
+
+    Combo.objects.update(
+        precio_total=Coalesce(
+            models.Subquery(total), models.Value(Decimal('0.00')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+        num_items=Coalesce(models.Subquery(cuenta), models.Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('combos', '0002_alter_productocombo_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='combo',
+            name='num_items',
+            field=models.PositiveIntegerField(default=0, verbose_name='Número de Componentes'),
+        ),
+        migrations.AddField(
+            model_name='combo',
+            name='precio_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='Precio Total del Combo'),
+        ),
+        migrations.RunPython(calcular_totales, migrations.RunPython.noop),
+    ]
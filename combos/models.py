@@ -30,6 +30,22 @@ class Combo(BaseModel):
         verbose_name="Creado por"
     )
 
+    # Totales desnormalizados de los componentes activos (precio_combo * cantidad
+    # y número de componentes). Los mantiene actualizar_totales_combo al
+    # agregar, editar o quitar componentes; se reparan con el comando
+    # recalcular_totales_combos.
+    precio_total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="Precio Total del Combo"
+    )
+
+    num_items = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Número de Componentes"
+    )
+
     class Meta:
         verbose_name = "Combo"
         verbose_name_plural = "Combos"
@@ -39,20 +55,6 @@ class Combo(BaseModel):
     def __str__(self):
         return self.nombre
 
-    @property
-    def precio_total(self):
-        """
-        Calcula el precio total del combo sumando los precios especiales
-        de todos los productos asociados multiplicados por su cantidad.
-        """
-        total = self.productos_combo.aggregate(
-            total=models.Sum(
-                models.F('precio_combo') * models.F('cantidad'),
-                output_field=models.DecimalField()
-            )
-        )['total']
-        return total or Decimal('0.00')
-
 
 class ProductoCombo(BaseModel):
     """
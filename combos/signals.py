@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from combos.models import Combo, ProductoCombo
+from productos.models import Producto
+from categoria.models import Categoria
+from combos.api.cache import invalidar_combos_activos, invalidar_indice_categorias, notificar_cambio_productos
+
+
+# Cambios en la definición de combos (incluida la eliminación lógica, que
+# pasa por save) o en los nombres de categorías que muestran. El stock no
+# pasa por señales: registrar_movimientos y reservar_stock usan
+# actualizaciones masivas y llaman a notificar_cambio_productos.
+@receiver([post_save, post_delete], sender=Combo)
+@receiver([post_save, post_delete], sender=ProductoCombo)
+@receiver([post_save, post_delete], sender=Categoria)
+def invalidar_combos_por_cambio(sender, **kwargs):
+    invalidar_combos_activos()
+    invalidar_indice_categorias()
+
+
+# Un producto editado o eliminado se actualiza solo en las cachés que lo usan
+@receiver([post_save, post_delete], sender=Producto)
+def actualizar_combos_por_producto(sender, instance, **kwargs):
+    notificar_cambio_productos([instance.pk], cambio_stock=False)
@@ -1,3 +1,180 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from categoria.models import Categoria
+from combos.api.cache import get_llave_productos_categoria
+from combos.api.categorias import get_productos_categoria
+from combos.api.utils import get_combos_activos
+from combos.models import Combo, ProductoCombo
+from inventarioproducto.api.utils import reservar_stock
+from inventarioproducto.models import SaldoInventario
+from productos.models import Producto
+from proveedores.models import Proveedor
+from user.models import User
+
+
+class CacheCombosStockTests(TestCase):
+    """
+    Los cambios de stock refrescan las cachés de combos solo cuando el
+    producto está en algún combo; el resto de las ventas no las toca.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        proveedor = Proveedor.objects.create(nombre_empresa='Prov', ciudad='X')
+        cls.categoria = Categoria.objects.create(nombre='Cat')
+        cls.categoria_casilla = Categoria.objects.create(nombre='Bebidas')
+
+        def crear_producto(nombre, categoria):
+            producto = Producto.objects.create(
+                nombre=nombre, categoria=categoria, proveedor=proveedor, precio_compra=10,
+                porcentaje_ganancia=10, precio_final=11, codigo_busqueda=nombre,
+            )
+            SaldoInventario.objects.update_or_create(producto=producto, defaults={'cantidad': 10})
+            return producto
+
+        cls.suelto = crear_producto('Suelto', cls.categoria)
+        cls.componente = crear_producto('Componente', cls.categoria)
+        cls.bebida = crear_producto('Bebida', cls.categoria_casilla)
+        cls.agua = crear_producto('Agua', cls.categoria_casilla)
+        cls.categoria_postres = Categoria.objects.create(nombre='Postres')
+        cls.postre = crear_producto('Postre', cls.categoria_postres)
+
+        combo = Combo.objects.create(nombre='Combo', activo=True)
+        ProductoCombo.objects.create(combo=combo, producto=cls.componente, precio_combo=5, cantidad=2)
+        ProductoCombo.objects.create(combo=combo, categoria=cls.categoria_casilla, precio_combo=3, cantidad=1)
+        ProductoCombo.objects.create(combo=combo, categoria=cls.categoria_postres, precio_combo=2, cantidad=1)
+
+    def _vender(self, producto, cantidad):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                reservar_stock({producto.id: cantidad}, referencia='TEST')
+
+    def _stock_casilla(self):
+        return {p['id']: p['stock_disponible'] for p in get_productos_categoria(self.categoria_casilla.id)}
+
+    def test_venta_fuera_de_combos_no_consulta_la_cache(self):
+        get_combos_activos()
+        get_productos_categoria(self.categoria_casilla.id)
+
+        tabla_cache = settings.CACHES['default']['LOCATION']
+        with CaptureQueriesContext(connection) as consultas:
+            self._vender(self.suelto, 1)
+        self.assertFalse([q['sql'] for q in consultas.captured_queries if tabla_cache in q['sql']])
+
+    def test_venta_de_componente_refresca_combos_activos(self):
+        self.assertEqual(get_combos_activos()[0]['cantidadMaxima'], 5)
+        self._vender(self.componente, 3)
+        self.assertEqual(get_combos_activos()[0]['cantidadMaxima'], 3)
+
+    def test_venta_de_producto_de_casilla_refresca_el_indice(self):
+        self.assertEqual(self._stock_casilla()[self.bebida.id], 10)
+        self._vender(self.bebida, 4)
+        self.assertEqual(self._stock_casilla()[self.bebida.id], 6)
+
+    def test_ventas_seguidas_de_la_misma_categoria_no_se_pisan(self):
+        get_productos_categoria(self.categoria_casilla.id)
+        # Dos ventas confirmadas antes de que alguien vuelva a leer el índice
+        self._vender(self.bebida, 1)
+        self._vender(self.agua, 10)
+        self.assertEqual(self._stock_casilla(), {self.bebida.id: 9})
+
+    def test_venta_solo_descarta_su_categoria(self):
+        get_productos_categoria(self.categoria_casilla.id)
+        get_productos_categoria(self.categoria_postres.id)
+        llave_postres = get_llave_productos_categoria(self.categoria_postres.id)
+        llave_casilla = get_llave_productos_categoria(self.categoria_casilla.id)
+
+        self._vender(self.bebida, 1)
+
+        self.assertEqual(get_llave_productos_categoria(self.categoria_postres.id), llave_postres)
+        self.assertNotEqual(get_llave_productos_categoria(self.categoria_casilla.id), llave_casilla)
+
+    def test_editar_producto_lo_mueve_de_categoria(self):
+        self.assertIn(self.agua.id, self._stock_casilla())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.agua.categoria = self.categoria_postres
+            self.agua.save()
+        self.assertNotIn(self.agua.id, self._stock_casilla())
+        self.assertIn(self.agua.id, {p['id'] for p in get_productos_categoria(self.categoria_postres.id)})
+        self.assertIsNone(get_productos_categoria(self.categoria.id))
+
+
+class TotalesComboTests(TestCase):
+    """
+    precio_total y num_items del combo se mantienen al agregar, editar y
+    quitar componentes, y /active/ los refleja en cuanto se confirma el cambio.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='gerente', role='admin')
+        proveedor = Proveedor.objects.create(nombre_empresa='Prov', ciudad='X')
+        cls.categoria = Categoria.objects.create(nombre='Bebidas')
+        cls.producto = Producto.objects.create(
+            nombre='Hamburguesa', categoria=cls.categoria, proveedor=proveedor, precio_compra=10,
+            porcentaje_ganancia=10, precio_final=11, codigo_busqueda='H1',
+        )
+        SaldoInventario.objects.update_or_create(producto=cls.producto, defaults={'cantidad': 10})
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def _confirmar(self, metodo, url, data=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = getattr(self.client, metodo)(url, data, format='json')
+        self.assertLess(respuesta.status_code, 300, respuesta.content)
+        return respuesta.json()
+
+    def _activo(self, combo_id):
+        return next(c for c in self.client.get('/api/combos/active/').json() if c['id'] == combo_id)
+
+    def assertTotales(self, combo_id, precio_total, num_items):
+        combo = Combo.objects.get(pk=combo_id)
+        self.assertEqual((combo.precio_total, combo.num_items), (Decimal(precio_total), num_items))
+        self.assertEqual(self._activo(combo_id)['precio_total'], float(precio_total))
+
+    def test_totales_al_editar_componentes(self):
+        combo_id = self._confirmar('post', '/api/combos/create/', {'nombre': 'Combo'})['id']
+        self.assertTotales(combo_id, '0.00', 0)
+
+        componente = self._confirmar('post', f'/api/combos/{combo_id}/add-product/', {
+            'producto_id': self.producto.id, 'precio_combo': '8.00', 'cantidad': 2,
+        })
+        self.assertTotales(combo_id, '16.00', 1)
+        self.assertEqual(self._activo(combo_id)['cantidadMaxima'], 5)
+
+        self._confirmar('post', f'/api/combos/{combo_id}/add-product/', {
+            'categoria_id': self.categoria.id, 'precio_combo': '3.50',
+        })
+        self.assertTotales(combo_id, '19.50', 2)
+
+        self._confirmar('put', f"/api/combos/{combo_id}/update-product/{componente['id']}/", {'precio_combo': '7.00'})
+        self.assertTotales(combo_id, '17.50', 2)
+
+        self._confirmar('delete', f"/api/combos/{combo_id}/remove-product/{componente['id']}/")
+        self.assertTotales(combo_id, '3.50', 1)
+        self.assertEqual(self._activo(combo_id)['cantidadMaxima'], 999)
+
+        # Desactivar el combo lo saca de /active/
+        self._confirmar('put', f'/api/combos/{combo_id}/update/', {'activo': False})
+        self.assertFalse([c for c in self.client.get('/api/combos/active/').json() if c['id'] == combo_id])
+
+    def test_comando_repara_totales(self):
+        combo = Combo.objects.create(nombre='Combo')
+        ProductoCombo.objects.create(combo=combo, producto=self.producto, precio_combo=5, cantidad=3)
+        Combo.objects.filter(pk=combo.pk).update(precio_total=Decimal('1.00'), num_items=7)
 
-# Create your tests here.
+        salida = StringIO()
+        call_command('recalcular_totales_combos', stdout=salida)
+        self.assertIn('1 corregido', salida.getvalue())
+        combo.refresh_from_db()
+        self.assertEqual((combo.precio_total, combo.num_items), (Decimal('15.00'), 1))
@@ -0,0 +1,32 @@
+# Generated by Django 4.2 on 2026-10-16 23:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Secuencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Eliminación Lógica')),
+                ('prefijo', models.CharField(max_length=20, unique=True, verbose_name='Prefijo')),
+                ('ultimo_valor', models.PositiveBigIntegerField(default=0, verbose_name='Último valor emitido')),
+                ('digitos', models.PositiveSmallIntegerField(default=5, verbose_name='Dígitos del consecutivo')),
+            ],
+            options={
+                'verbose_name': 'Secuencia',
+                'verbose_name_plural': 'Secuencias',
+                'db_table': 'secuencias',
+                'ordering': ['prefijo'],
+            },
+        ),
+    ]
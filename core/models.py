@@ -1,3 +1,25 @@
 from django.db import models
+from user.base.models import BaseModel
 
-# Create your models here.
+
+class Secuencia(BaseModel):
+    """
+    Contador consecutivo por prefijo (ej: 'V-' para ventas, 'OP-' para órdenes de proveedor).
+    Reemplaza los COUNT(*) + 1 y los recorridos de toda la tabla para generar códigos.
+    """
+    prefijo      = models.CharField(max_length=20, unique=True, verbose_name="Prefijo")
+    ultimo_valor = models.PositiveBigIntegerField(default=0, verbose_name="Último valor emitido")
+    digitos      = models.PositiveSmallIntegerField(default=5, verbose_name="Dígitos del consecutivo")
+
+    class Meta:
+        verbose_name = "Secuencia"
+        verbose_name_plural = "Secuencias"
+        db_table = "secuencias"
+        ordering = ['prefijo']
+
+    def __str__(self):
+        return f"{self.prefijo} ({self.ultimo_valor})"
+
+    def formatear(self, numero):
+        """Formatea un número con el prefijo y ceros a la izquierda: 5 -> 'V-00005'."""
+        return f"{self.prefijo}{numero:0{self.digitos}d}"
@@ -1,3 +1,50 @@
+from django.db import transaction
 from django.test import TestCase
 
-# Create your tests here.
+from core.models import Secuencia
+from core.utils import (
+    reservar_codigos, siguiente_codigo, consultar_siguiente_codigo, numero_desde_codigo, sincronizar_secuencia,
+)
+
+
+class SecuenciaTests(TestCase):
+    """Los códigos salen de un contador por prefijo, sin COUNT(*) ni recorridos de la tabla."""
+
+    def test_reserva_consecutivos(self):
+        self.assertEqual(siguiente_codigo('T-'), 'T-00001')
+        self.assertEqual(reservar_codigos('T-', 3), ['T-00002', 'T-00003', 'T-00004'])
+        self.assertEqual(siguiente_codigo('X-'), 'X-00001')
+        self.assertEqual(Secuencia.objects.get(prefijo='T-').ultimo_valor, 4)
+
+        with self.assertRaises(ValueError):
+            reservar_codigos('T-', 0)
+
+    def test_consultar_no_reserva(self):
+        self.assertEqual(consultar_siguiente_codigo('T-'), ('T-00001', 1))
+        self.assertFalse(Secuencia.objects.filter(prefijo='T-').exists())
+        siguiente_codigo('T-')
+        self.assertEqual(consultar_siguiente_codigo('T-'), ('T-00002', 2))
+        self.assertEqual(consultar_siguiente_codigo('T-'), ('T-00002', 2))
+
+    def test_transaccion_revertida_no_consume_el_consecutivo(self):
+        siguiente_codigo('T-')
+        with transaction.atomic():
+            self.assertEqual(siguiente_codigo('T-'), 'T-00002')
+            transaction.set_rollback(True)
+        self.assertEqual(siguiente_codigo('T-'), 'T-00002')
+
+    def test_sincronizar_solo_adelanta(self):
+        siguiente_codigo('T-')
+        sincronizar_secuencia('T-', 'T-00010')
+        self.assertEqual(siguiente_codigo('T-'), 'T-00011')
+
+        sincronizar_secuencia('T-', 'T-00003')
+        sincronizar_secuencia('T-', 'OTRO-00099')
+        sincronizar_secuencia('T-', 'T-ABC')
+        self.assertEqual(siguiente_codigo('T-'), 'T-00012')
+
+    def test_numero_desde_codigo(self):
+        self.assertEqual(numero_desde_codigo('OP-', 'OP-00005'), 5)
+        self.assertIsNone(numero_desde_codigo('OP-', 'V-00005'))
+        self.assertIsNone(numero_desde_codigo('OP-', 'OP-5A'))
+        self.assertIsNone(numero_desde_codigo('OP-', None))
@@ -1,3 +1,8 @@
+from django.db import transaction
+
+from core.models import Secuencia
+
+
 def remove_thousand_separators(value):
     """
         Elimina separadores de miles (puntos o comas) y deja solo dígitos y un punto decimal.
@@ -9,4 +14,79 @@ def remove_thousand_separators(value):
         return "0"
     # Elimina todos los puntos y comas que no sean parte del decimal
     value = str(value).replace(".", "").replace(",", "")
-    return value
\ No newline at end of file
+    return value
+
+
+def _get_secuencia_bloqueada(prefijo):
+    """Obtiene (o crea) la secuencia del prefijo con bloqueo de fila. Requiere transacción abierta."""
+    secuencia, _ = Secuencia.objects.select_for_update().get_or_create(prefijo=prefijo)
+    return secuencia
+
+
+def reservar_codigos(prefijo, cantidad=1):
+    """
+        Reserva `cantidad` consecutivos del prefijo con un incremento atómico y retorna
+        la lista de códigos formateados. Ejemplo: reservar_codigos("V-", 3) → ["V-00011", "V-00012", "V-00013"]
+
+        Llamada fuera de una transacción, el bloqueo de la fila dura solo el incremento:
+        es lo que usan las ventas, que reservan el código antes de abrir su transacción
+        para no serializarse entre sí. Si la operación que usa el código falla, el
+        consecutivo queda sin usar (hueco).
+        Llamada dentro de una transacción, la fila queda bloqueada hasta su fin y si se
+        revierte el consecutivo no se consume (sin huecos).
+        Reservar bloques (cantidad > 1) para terminales POS puede dejar huecos si no se usan todos.
+    """
+
+    cantidad = int(cantidad)
+    if cantidad < 1:
+        raise ValueError("La cantidad a reservar debe ser mayor a 0.")
+
+    with transaction.atomic():
+        secuencia = _get_secuencia_bloqueada(prefijo)
+        inicio = secuencia.ultimo_valor + 1
+        secuencia.ultimo_valor += cantidad
+        secuencia.save(update_fields=['ultimo_valor', 'updated_at'])
+
+    return [secuencia.formatear(numero) for numero in range(inicio, secuencia.ultimo_valor + 1)]
+
+
+def siguiente_codigo(prefijo):
+    """Reserva y retorna el siguiente código del prefijo (ej: "OP-00042")."""
+    return reservar_codigos(prefijo, 1)[0]
+
+
+def consultar_siguiente_codigo(prefijo):
+    """
+        Retorna (código, número) del siguiente consecutivo SIN reservarlo.
+        Es una sola lectura por índice único.
+    """
+    secuencia = Secuencia.objects.filter(prefijo=prefijo).first() or Secuencia(prefijo=prefijo)
+    numero = secuencia.ultimo_valor + 1
+    return secuencia.formatear(numero), numero
+
+
+def numero_desde_codigo(prefijo, codigo):
+    """
+        Extrae el consecutivo de un código con el prefijo dado.
+        "OP-00005" → 5. Retorna None si el código no sigue el formato.
+    """
+    codigo = str(codigo or "")
+    if not codigo.startswith(prefijo):
+        return None
+    numero = codigo[len(prefijo):]
+    return int(numero) if numero.isdigit() else None
+
+
+def sincronizar_secuencia(prefijo, codigo):
+    """
+        Si se registra un código asignado manualmente (ej: número de orden digitado),
+        adelanta la secuencia para que nunca vuelva a emitirlo.
+    """
+
+    numero = numero_desde_codigo(prefijo, codigo)
+    if numero is None:
+        return
+
+    with transaction.atomic():
+        Secuencia.objects.get_or_create(prefijo=prefijo)
+        Secuencia.objects.filter(prefijo=prefijo, ultimo_valor__lt=numero).update(ultimo_valor=numero)
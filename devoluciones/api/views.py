@@ -4,6 +4,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 from datetime import datetime
 from decimal import Decimal
 from django.db.models import Q
@@ -11,6 +12,9 @@ from user.api.permissions import RolePermission
 from devoluciones.models import Devoluciones
 from ventas.models import Venta, DetalleVenta
 from inventarioproducto.models import InventarioProducto
+from inventarioproducto.api.utils import registrar_movimiento
+from inventarioproducto.api.capas import restaurar_capas
+from ventas.api.utils import acumular_devolucion
 from productos.models import Producto
 
 DEVOLUTION_MANAGER_ROLES = ['admin', 'manager', 'contador']
@@ -52,103 +56,121 @@ def create_devolucion(request):
         return Response({"error": "Cantidad debe ser un número entero positivo."},
                         status=status.HTTP_400_BAD_REQUEST)
 
-    # =============================
-    # 🔍 1. Obtener venta
-    # =============================
-    venta = get_object_or_404(Venta, pk=venta_completa_id)
+    # Devolución, capas de costo, saldo de inventario y resúmenes se
+    # registran juntos o no se registra nada
+    with transaction.atomic():
+        # =============================
+        # 🔍 1. Obtener venta
+        # =============================
+        venta = get_object_or_404(Venta, pk=venta_completa_id)
+
+        # =============================
+        # 🔍 2. Obtener detalle del producto
+        # =============================
+        try:
+            # Bloquear la línea: dos devoluciones simultáneas de la misma línea se aplican una tras otra
+            detalle = DetalleVenta.objects.select_for_update().get(
+                id=detalle_venta_id,
+                venta_id=venta_completa_id,
+                producto_id=producto_id
+            )
+        except DetalleVenta.DoesNotExist:
+            return Response(
+                {"error": "Este producto no pertenece a la venta indicada."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-    # =============================
-    # 🔍 2. Obtener detalle del producto
-    # =============================
-    try:
-        detalle = DetalleVenta.objects.get(
-            id=detalle_venta_id,
-            venta_id=venta_completa_id,
-            producto_id=producto_id
-        )
-    except DetalleVenta.DoesNotExist:
-        return Response(
-            {"error": "Este producto no pertenece a la venta indicada."},
-            status=status.HTTP_400_BAD_REQUEST
-        )
+        # =============================
+        # 🔍 3. Validar cantidad a devolver
+        # =============================
+        if cantidad > detalle.cantidad:
+            return Response(
+                {"error": f"No se pueden devolver más productos ({cantidad}) que los vendidos ({detalle.cantidad})."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-    # =============================
-    # 🔍 3. Validar cantidad a devolver
-    # =============================
-    if cantidad > detalle.cantidad:
-        return Response(
-            {"error": f"No se pueden devolver más productos ({cantidad}) que los vendidos ({detalle.cantidad})."},
-            status=status.HTTP_400_BAD_REQUEST
+        # =============================
+        # 🔥 4. Registrar la devolución
+        # =============================
+        devolucion = Devoluciones.objects.create(
+            codigo_venta=codigo_venta,
+            producto_id=producto_id,
+            cantidad=cantidad
         )
 
-    # =============================
-    # 🔥 4. Registrar la devolución
-    # =============================
-    devolucion = Devoluciones.objects.create(
-        codigo_venta=codigo_venta,
-        producto_id=producto_id,
-        cantidad=cantidad
-    )
-
-    # =============================
-    # 🧮 5. Actualizar o eliminar el detalle de venta
-    # =============================
-    if cantidad == detalle.cantidad:
-        detalle.delete()
-    else:
-        detalle.cantidad -= cantidad
-        detalle.save()
-
-    # =============================
-    # 🔁 6. Recalcular subtotal, impuesto y total
-    # =============================
-
-    detalles_actuales = DetalleVenta.objects.filter(venta_id=venta_completa_id)
+        # Las unidades devueltas regresan a sus capas de costo (y salen del costo de la línea)
+        costo_devuelto = restaurar_capas(detalle, cantidad)
 
-    nuevo_subtotal = Decimal('0.00')
-    nuevo_impuesto = Decimal('0.00')
-
-    for d in detalles_actuales:
-        subtotal_item = d.precio_unitario * d.cantidad
-        nuevo_subtotal += subtotal_item
-        nuevo_impuesto += subtotal_item * Decimal("0.16")  # IVA 16%
-
-    venta.subtotal = nuevo_subtotal
-    venta.impuesto = nuevo_impuesto
-    venta.total = nuevo_subtotal + nuevo_impuesto
-    venta.save()
-
-    # ======================================================
-    # 7️⃣ SUMAR UNIDADES DEVUELTAS AL INVENTARIO (FIFO simple)
-    # ======================================================
-    try:
-        producto = Producto.objects.get(pk=producto_id)
-
-        # Obtener el inventario más reciente (FIFO básico)
-        inventario = InventarioProducto.objects.filter(
-            producto=producto
-        ).order_by('-fecha_ingreso').first()
-
-        if inventario:
-            inventario.cantidad_unidades += cantidad
-            inventario.save()
+        # =============================
+        # 🧮 5. Actualizar o eliminar el detalle de venta
+        # =============================
+        if cantidad == detalle.cantidad:
+            detalle.delete()
         else:
-            # Si no existe inventario, crear una entrada nueva
-            InventarioProducto.objects.create(
-                producto=producto,
-                cantidad_unidades=cantidad,
-                creado_por=request.user
-            )
-
-    except Exception as e:
-        print("⚠ Error al actualizar inventario:", str(e))
+            detalle.cantidad -= cantidad
+            detalle.save()
+
+        # Las unidades devueltas vuelven al saldo de inventario
+        registrar_movimiento(detalle.producto_id, 'devolucion', cantidad, referencia=codigo_venta, usuario=request.user)
+
+        # =============================
+        # 🔁 6. Recalcular subtotal, impuesto y total
+        # =============================
+
+        detalles_actuales = DetalleVenta.objects.filter(venta_id=venta_completa_id)
+
+        nuevo_subtotal = Decimal('0.00')
+        nuevo_impuesto = Decimal('0.00')
+        totales_antes  = (venta.subtotal, venta.descuento, venta.impuesto, venta.total)
+
+        for d in detalles_actuales:
+            subtotal_item = d.precio_unitario * d.cantidad
+            nuevo_subtotal += subtotal_item
+            nuevo_impuesto += subtotal_item * Decimal("0.16")  # IVA 16%
+
+        venta.subtotal = nuevo_subtotal
+        venta.impuesto = nuevo_impuesto
+        venta.total = nuevo_subtotal + nuevo_impuesto
+        venta.save()
+
+        # Descontar la devolución de los resúmenes diarios del día de la venta
+        acumular_devolucion(venta, detalle, cantidad, totales_antes, costo=costo_devuelto)
+
+        # ======================================================
+        # 7️⃣ SUMAR UNIDADES DEVUELTAS AL INVENTARIO (FIFO simple)
+        # ======================================================
+        try:
+            # Punto de guardado propio: un error aquí no debe invalidar la transacción
+            with transaction.atomic():
+                producto = Producto.objects.get(pk=producto_id)
+
+                # Obtener el inventario más reciente (FIFO básico)
+                inventario = InventarioProducto.objects.filter(
+                    producto=producto
+                ).order_by('-fecha_ingreso').first()
+
+                if inventario:
+                    inventario.cantidad_unidades += cantidad
+                    inventario.save()
+                else:
+                    # Si no existe inventario, crear una entrada nueva
+                    InventarioProducto.objects.create(
+                        producto=producto,
+                        cantidad_unidades=cantidad,
+                        creado_por=request.user
+                    )
+
+        except Exception as e:
+            print("⚠ Error al actualizar inventario:", str(e))
+
+        productos_dict = {detalle.producto_id: detalle.producto.nombre}
 
     # =============================
     # 8. Retornar resultado
     # =============================
     return Response({
         "message": "Devolución realizada correctamente.",
-        "devolucion": serialize_devolucion(devolucion),
+        "devolucion": serialize_devolucion(devolucion, productos_dict),
         "venta_actualizada": {
             "subtotal": venta.subtotal,
             "impuesto": venta.impuesto,
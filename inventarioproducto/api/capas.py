@@ -0,0 +1,203 @@
+from collections import defaultdict, deque
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from inventarioproducto.models import CapaCosto, ConsumoCapa
+from proveedores.models import OrdenProveedorDetalle
+from ventas.models import DetalleVenta
+
+
+# ======================================================
+# Capas de costo FIFO y costo de lo vendido
+# ======================================================
+# - Cada línea de una orden recibida es una capa (sincronizar_capas_ordenes).
+# - Cada línea de venta consume las capas más antiguas del producto y guarda
+#   su costo en DetalleVenta.costo_total (consumir_capas).
+# - Una devolución regresa las unidades a las capas de donde salieron
+#   (restaurar_capas).
+# Los bloqueos se toman después de los de SaldoInventario y en orden de
+# producto, igual que reservar_stock.
+
+
+def sincronizar_capas_ordenes(orden_ids):
+    """
+    Deja las capas de las órdenes indicadas de acuerdo con sus líneas:
+    una capa por línea activa de orden 'recibida', con la cantidad y el
+    precio de compra de la línea. Las líneas de órdenes no recibidas (o
+    eliminadas) quedan con la capa en cero.
+
+    Si una línea cambia de cantidad, la diferencia se suma o se resta de lo
+    que la capa tiene disponible (lo ya vendido no se recalcula).
+    Debe llamarse dentro de una transacción.
+    """
+    orden_ids = set(orden_ids)
+    if not orden_ids:
+        return
+
+    lineas = list(
+        OrdenProveedorDetalle.all_objects
+        .filter(orden_proveedor_id__in=orden_ids)
+        .select_related('orden_proveedor')
+        .order_by('producto_id', 'id')
+    )
+    capas = {
+        capa.detalle_orden_id: capa
+        for capa in (
+            CapaCosto.all_objects
+            .select_for_update()
+            .filter(detalle_orden_id__in=[linea.id for linea in lineas])
+            .order_by('producto_id', 'id')
+        )
+    }
+
+    ahora = timezone.now()
+    nuevas = []
+    modificadas = []
+    for linea in lineas:
+        orden = linea.orden_proveedor
+        recibida = orden.estado == 'recibida' and orden.deleted_at is None and linea.deleted_at is None
+        cantidad = linea.cantidad if recibida else 0
+        capa = capas.get(linea.id)
+
+        if capa is None:
+            if cantidad:
+                nuevas.append(CapaCosto(
+                    producto_id         = linea.producto_id,
+                    detalle_orden       = linea,
+                    costo_unitario      = linea.precio_compra,
+                    cantidad_inicial    = cantidad,
+                    cantidad_disponible = cantidad,
+                    fecha_entrada       = orden.fecha_recepcion or ahora,
+                    referencia          = orden.numero_orden,
+                ))
+            continue
+
+        diferencia = cantidad - capa.cantidad_inicial
+        if diferencia == 0 and capa.costo_unitario == linea.precio_compra:
+            continue
+        capa.cantidad_inicial = cantidad
+        capa.cantidad_disponible = min(max(capa.cantidad_disponible + diferencia, 0), cantidad)
+        capa.costo_unitario = linea.precio_compra
+        if recibida and orden.fecha_recepcion and diferencia == cantidad:
+            # La orden volvió a recibirse: la capa entra con la nueva fecha
+            capa.fecha_entrada = orden.fecha_recepcion
+        capa.updated_at = ahora
+        modificadas.append(capa)
+
+    if modificadas:
+        CapaCosto.all_objects.bulk_update(
+            modificadas, ['cantidad_inicial', 'cantidad_disponible', 'costo_unitario', 'fecha_entrada', 'updated_at']
+        )
+    if nuevas:
+        CapaCosto.objects.bulk_create(nuevas)
+
+
+def consumir_capas(detalles):
+    """
+    Asigna a cada línea de venta (ya guardada, con producto cargado) las
+    unidades de las capas más antiguas de su producto y guarda el costo en
+    DetalleVenta.costo_total. Las unidades que no alcanzan a cubrir las capas
+    (stock sin recepciones registradas) se costean con Producto.precio_compra.
+
+    Lee las capas disponibles con una consulta (FOR UPDATE, en orden de
+    producto) y escribe con un bulk_update de capas, un bulk_create de
+    consumos y un bulk_update de detalles. Debe llamarse dentro de la
+    transacción de la venta.
+    """
+    detalles = [d for d in detalles if d.cantidad > 0]
+    if not detalles:
+        return
+
+    disponibles = defaultdict(deque)
+    for capa in (
+        CapaCosto.objects
+        .select_for_update()
+        .filter(producto_id__in={d.producto_id for d in detalles}, cantidad_disponible__gt=0)
+        .order_by('producto_id', 'fecha_entrada', 'id')
+    ):
+        disponibles[capa.producto_id].append(capa)
+
+    ahora = timezone.now()
+    capas_usadas = {}
+    consumos = []
+    for detalle in detalles:
+        restante = detalle.cantidad
+        costo = Decimal('0.00')
+        cola = disponibles[detalle.producto_id]
+
+        while restante and cola:
+            capa = cola[0]
+            tomadas = min(restante, capa.cantidad_disponible)
+            capa.cantidad_disponible -= tomadas
+            capa.updated_at = ahora
+            capas_usadas[capa.id] = capa
+            consumos.append(ConsumoCapa(
+                capa=capa, detalle_venta=detalle, cantidad=tomadas, costo_unitario=capa.costo_unitario
+            ))
+            costo += tomadas * capa.costo_unitario
+            restante -= tomadas
+            if capa.cantidad_disponible == 0:
+                cola.popleft()
+
+        if restante:
+            precio_compra = detalle.producto.precio_compra
+            consumos.append(ConsumoCapa(
+                capa=None, detalle_venta=detalle, cantidad=restante, costo_unitario=precio_compra
+            ))
+            costo += restante * precio_compra
+
+        detalle.costo_total = costo
+
+    if capas_usadas:
+        CapaCosto.objects.bulk_update(capas_usadas.values(), ['cantidad_disponible', 'updated_at'])
+    ConsumoCapa.objects.bulk_create(consumos)
+    DetalleVenta.objects.bulk_update(detalles, ['costo_total'])
+
+
+def restaurar_capas(detalle, cantidad):
+    """
+    Regresa `cantidad` unidades de una línea de venta a las capas de donde
+    salieron (primero las consumidas al final) y descuenta su costo de
+    DetalleVenta.costo_total. Retorna el costo devuelto.
+
+    Las unidades que se habían costeado sin capa solo descuentan su costo.
+    """
+    with transaction.atomic():
+        consumos = list(
+            ConsumoCapa.objects
+            .select_for_update()
+            .select_related('capa')
+            .filter(detalle_venta=detalle, cantidad__gt=0)
+            .order_by('-id')
+        )
+
+        ahora = timezone.now()
+        restante = cantidad
+        costo = Decimal('0.00')
+        capas = {}
+        for consumo in consumos:
+            if not restante:
+                break
+            devueltas = min(restante, consumo.cantidad)
+            consumo.cantidad -= devueltas
+            consumo.updated_at = ahora
+            costo += devueltas * consumo.costo_unitario
+            restante -= devueltas
+
+            if consumo.capa_id is not None:
+                # Varios consumos pueden venir de la misma capa: usar una sola instancia
+                capa = capas.setdefault(consumo.capa_id, consumo.capa)
+                capa.cantidad_disponible = min(capa.cantidad_disponible + devueltas, capa.cantidad_inicial)
+                capa.updated_at = ahora
+
+        if consumos:
+            ConsumoCapa.objects.bulk_update(consumos, ['cantidad', 'updated_at'])
+        if capas:
+            CapaCosto.all_objects.bulk_update(capas.values(), ['cantidad_disponible', 'updated_at'])
+
+        detalle.costo_total = max(detalle.costo_total - costo, Decimal('0.00'))
+        DetalleVenta.all_objects.filter(pk=detalle.pk).update(costo_total=detalle.costo_total)
+
+    return costo
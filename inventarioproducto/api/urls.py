@@ -9,5 +9,7 @@ urlpatterns = [
     path('<int:pk>/delete/',            views.delete_inventario,    name='delete_inventario'),
     path('<int:producto_id>/total/',    views.get_total_unidades_producto, name='get_total_unidades_producto'),
     path('<int:producto_id>/cantidad/', views.get_inventario_by_producto, name='get_inventario_by_producto'),
+    path('<int:producto_id>/movimientos/', views.list_movimientos_producto, name='list_movimientos_producto'),
+    path('ajustes/create/',             views.create_ajuste_stock,  name='create_ajuste_stock'),
 ]
 
@@ -0,0 +1,442 @@
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction, IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from inventarioproducto.models import SaldoInventario, MovimientoInventario, CostoProducto
+from productos.models import Producto
+from proveedores.models import OrdenProveedorDetalle
+from inventarioproducto.api.capas import sincronizar_capas_ordenes
+from combos.api.cache import notificar_cambio_productos
+from productos.api.cache import descartar_productos_cache_codigos
+
+
+def get_stock_producto(producto_id):
+    """
+    Retorna las unidades disponibles de un producto leyendo su saldo materializado.
+    Si el producto aún no tiene movimientos, su saldo es 0.
+    """
+    cantidad = (
+        SaldoInventario.objects
+        .filter(producto_id=producto_id)
+        .values_list('cantidad', flat=True)
+        .first()
+    )
+    return cantidad or 0
+
+
+def get_stock_productos(producto_ids):
+    """
+    Retorna {producto_id: unidades disponibles} para varios productos con una sola consulta.
+    Los productos sin saldo registrado aparecen con 0.
+    """
+    producto_ids = set(producto_ids)
+    if not producto_ids:
+        return {}
+
+    stock = dict.fromkeys(producto_ids, 0)
+    stock.update(
+        SaldoInventario.objects
+        .filter(producto_id__in=producto_ids)
+        .values_list('producto_id', 'cantidad')
+    )
+    return stock
+
+
+def registrar_movimientos(movimientos, usuario=None):
+    """
+    Registra varios movimientos de inventario y actualiza los saldos en una sola transacción.
+
+    Parámetros:
+        movimientos (list[dict]): cada elemento con
+            - producto_id (int)
+            - tipo (str): 'recepcion' | 'venta' | 'devolucion' | 'ajuste'
+            - cantidad (int): positiva para entradas, negativa para salidas
+            - referencia (str | None)
+            - notas (str | None)
+        usuario (User | None): usuario que origina el movimiento.
+
+    Los movimientos con cantidad 0 se ignoran.
+    """
+    movimientos = [m for m in movimientos if int(m['cantidad']) != 0]
+    if not movimientos:
+        return []
+
+    deltas = defaultdict(int)
+    for m in movimientos:
+        deltas[m['producto_id']] += int(m['cantidad'])
+
+    with transaction.atomic():
+        registros = MovimientoInventario.objects.bulk_create([
+            MovimientoInventario(
+                producto_id = m['producto_id'],
+                tipo        = m['tipo'],
+                cantidad    = int(m['cantidad']),
+                referencia  = m.get('referencia'),
+                notas       = m.get('notas'),
+                creado_por  = usuario,
+            )
+            for m in movimientos
+        ])
+
+        # Crear solo los saldos que aún no existen (productos sin movimientos previos).
+        # No se usa INSERT IGNORE sobre filas existentes: tomaría bloqueos compartidos
+        # que luego chocarían con los FOR UPDATE de reservar_stock.
+        existentes = set(
+            SaldoInventario.all_objects
+            .filter(producto_id__in=deltas)
+            .values_list('producto_id', flat=True)
+        )
+        SaldoInventario.objects.bulk_create(
+            [SaldoInventario(producto_id=producto_id, cantidad=0) for producto_id in deltas if producto_id not in existentes],
+            ignore_conflicts=True
+        )
+
+        # Incremento atómico en la base de datos, en orden de producto
+        for producto_id in sorted(deltas):
+            if deltas[producto_id]:
+                SaldoInventario.objects.filter(producto_id=producto_id).update(
+                    cantidad=F('cantidad') + deltas[producto_id]
+                )
+
+        notificar_cambio_productos(deltas)
+        descartar_productos_cache_codigos(deltas)
+
+    return registros
+
+
+def reservar_stock(cantidades, referencia=None, usuario=None):
+    """
+    Descuenta stock para una venta de forma segura ante concurrencia.
+
+    Parámetros:
+        cantidades (dict): {producto_id: unidades a descontar}
+        referencia (str | None): código de la venta.
+        usuario (User | None): usuario que realiza la venta.
+
+    Bloquea los saldos involucrados con SELECT ... FOR UPDATE siempre en orden
+    ascendente de producto_id, así dos ventas con productos en común esperan
+    una a la otra en vez de bloquearse mutuamente (deadlock). Valida todo antes
+    de escribir: si algún producto no alcanza lanza IntegrityError y no se
+    descuenta nada.
+
+    Debe llamarse dentro de la transacción de la venta, para que los bloqueos
+    se mantengan hasta el commit.
+    """
+    cantidades = {producto_id: int(cantidad) for producto_id, cantidad in cantidades.items() if int(cantidad) > 0}
+    if not cantidades:
+        return []
+
+    with transaction.atomic():
+        saldos = {
+            saldo.producto_id: saldo
+            for saldo in (
+                SaldoInventario.objects
+                .select_for_update()
+                .filter(producto_id__in=cantidades)
+                .order_by('producto_id')
+            )
+        }
+
+        for producto_id in sorted(cantidades):
+            saldo = saldos.get(producto_id)
+            disponible = saldo.cantidad if saldo else 0
+            if disponible < cantidades[producto_id]:
+                nombre = Producto.all_objects.filter(pk=producto_id).values_list('nombre', flat=True).first()
+                raise IntegrityError(
+                    f"Stock insuficiente para '{nombre or producto_id}'. "
+                    f"Disponible: {disponible}, Solicitado: {cantidades[producto_id]}"
+                )
+
+        ahora = timezone.now()
+        for producto_id, saldo in saldos.items():
+            saldo.cantidad -= cantidades[producto_id]
+            saldo.updated_at = ahora
+        SaldoInventario.objects.bulk_update(saldos.values(), ['cantidad', 'updated_at'])
+        notificar_cambio_productos(saldos)
+        descartar_productos_cache_codigos(saldos)
+
+        return MovimientoInventario.objects.bulk_create([
+            MovimientoInventario(
+                producto_id = producto_id,
+                tipo        = 'venta',
+                cantidad    = -cantidad,
+                referencia  = referencia,
+                creado_por  = usuario,
+            )
+            for producto_id, cantidad in sorted(cantidades.items())
+        ])
+
+
+def registrar_movimiento(producto_id, tipo, cantidad, referencia=None, notas=None, usuario=None):
+    """Atajo para registrar un único movimiento de inventario."""
+    return registrar_movimientos([{
+        'producto_id': producto_id,
+        'tipo': tipo,
+        'cantidad': cantidad,
+        'referencia': referencia,
+        'notas': notas,
+    }], usuario=usuario)
+
+
+def get_recepcion_orden(orden):
+    """
+    Retorna {producto_id: línea} con lo que la orden aporta al stock y al costo.
+    Cada línea es un dict con id, producto_id, cantidad, importe (subtotal),
+    precio_compra, proveedor_id y fecha (la fecha_recepcion de la orden).
+    Solo las órdenes en estado 'recibida' y no eliminadas aportan unidades.
+    """
+    if orden.estado != 'recibida' or orden.deleted_at is not None:
+        return {}
+
+    return {
+        linea['producto_id']: dict(linea, fecha=orden.fecha_recepcion)
+        for linea in orden.detalles.values(
+            'id', 'producto_id', 'cantidad', 'precio_compra', 'proveedor_id', importe=F('subtotal')
+        )
+    }
+
+
+def registrar_diferencia_recepcion(orden, recepcion_antes, usuario=None):
+    """
+    Compara lo que la orden aportaba al stock antes de un cambio (get_recepcion_orden)
+    con lo que aporta ahora y registra movimientos de 'recepcion' por la diferencia
+    de cada producto. Los costos se ajustan solo con las líneas que cambiaron.
+
+    Cubre cambios de estado (entrar o salir de 'recibida') y ediciones de
+    detalles sobre órdenes ya recibidas.
+    """
+    recepcion_despues = get_recepcion_orden(orden)
+    productos = {
+        producto_id
+        for producto_id in set(recepcion_antes) | set(recepcion_despues)
+        if recepcion_antes.get(producto_id) != recepcion_despues.get(producto_id)
+    }
+
+    # Cualquier cambio en una orden recibida (cantidades o precios) puede mover el costo
+    actualizar_costos_recepcion(
+        salidas=[recepcion_antes[p] for p in productos if p in recepcion_antes],
+        entradas=[recepcion_despues[p] for p in productos if p in recepcion_despues],
+    )
+
+    def cantidad(recepcion, producto_id):
+        return recepcion[producto_id]['cantidad'] if producto_id in recepcion else 0
+
+    movimientos = registrar_movimientos([
+        {
+            'producto_id': producto_id,
+            'tipo': 'recepcion',
+            'cantidad': cantidad(recepcion_despues, producto_id) - cantidad(recepcion_antes, producto_id),
+            'referencia': orden.numero_orden,
+        }
+        for producto_id in sorted(productos)
+    ], usuario=usuario)
+
+    if productos:
+        sincronizar_capas_ordenes([orden.id])
+
+    return movimientos
+
+
+def _costo_promedio(costo):
+    """Costo promedio ponderado de lo recibido, o None si no quedan unidades."""
+    if costo.unidades_compradas <= 0:
+        return None
+    return (costo.importe_comprado / costo.unidades_compradas).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def _asignar_ultima_compra(costo, linea):
+    costo.ultimo_costo = linea['precio_compra'] if linea else None
+    costo.ultimo_proveedor_id = linea['proveedor_id'] if linea else None
+    costo.fecha_ultima_compra = linea['fecha'] if linea else None
+
+
+CAMPOS_COSTO = [
+    'ultimo_costo', 'costo_promedio', 'unidades_compradas', 'importe_comprado', 'ultimo_proveedor_id',
+    'fecha_ultima_compra', 'deleted_at', 'updated_at',
+]
+
+
+def actualizar_costos_recepcion(salidas, entradas):
+    """
+    Aplica a CostoProducto la diferencia de una recepción sin releer el
+    historial de compras de los productos.
+
+    Parámetros:
+        salidas (list[dict]): líneas recibidas que dejan de contar (orden que
+            sale de 'recibida', línea eliminada o valores de antes de editarla).
+        entradas (list[dict]): líneas que pasan a contar (orden recibida, línea
+            nueva o valores nuevos de una línea editada).
+        Cada línea con id, producto_id, cantidad, importe, precio_compra,
+        proveedor_id y fecha, como las de get_recepcion_orden.
+
+    unidades_compradas e importe_comprado se suman o restan y el promedio se
+    calcula con ellos. Una entrada más reciente que la última compra la
+    reemplaza. Solo si sale la línea que era la última compra (o una entrada
+    empata con ella en fecha) se busca la última en las órdenes recibidas de
+    esos productos.
+
+    Bloquea las filas de costo en orden de producto. Debe llamarse dentro de
+    una transacción. El recálculo completo queda en recalcular_costos_productos.
+    """
+    productos = {linea['producto_id'] for linea in salidas} | {linea['producto_id'] for linea in entradas}
+    if not productos:
+        return []
+
+    existentes = set(
+        CostoProducto.all_objects
+        .filter(producto_id__in=productos)
+        .values_list('producto_id', flat=True)
+    )
+    CostoProducto.objects.bulk_create(
+        [CostoProducto(producto_id=producto_id) for producto_id in sorted(productos - existentes)],
+        ignore_conflicts=True
+    )
+    costos = {
+        costo.producto_id: costo
+        for costo in (
+            CostoProducto.all_objects
+            .select_for_update()
+            .filter(producto_id__in=productos)
+            .order_by('producto_id')
+        )
+    }
+
+    sin_ultima_compra = set()
+    for linea in salidas:
+        costo = costos[linea['producto_id']]
+        costo.unidades_compradas -= linea['cantidad']
+        costo.importe_comprado -= linea['importe']
+        if costo.fecha_ultima_compra is not None and linea['fecha'] == costo.fecha_ultima_compra:
+            sin_ultima_compra.add(costo.producto_id)
+
+    asignadas = set()
+    for linea in sorted(entradas, key=lambda l: (l['fecha'], l['id'])):
+        costo = costos[linea['producto_id']]
+        costo.unidades_compradas += linea['cantidad']
+        costo.importe_comprado += linea['importe']
+        if costo.fecha_ultima_compra is None or linea['fecha'] > costo.fecha_ultima_compra:
+            _asignar_ultima_compra(costo, linea)
+            asignadas.add(costo.producto_id)
+            sin_ultima_compra.discard(costo.producto_id)
+        elif linea['fecha'] == costo.fecha_ultima_compra:
+            _asignar_ultima_compra(costo, linea)
+            if costo.producto_id not in asignadas:
+                # Empata con una compra anterior a esta llamada (misma recepción
+                # en bloque): el desempate por id de línea lo resuelve la consulta
+                sin_ultima_compra.add(costo.producto_id)
+
+    if sin_ultima_compra:
+        # Se revirtió la última compra: la nueva última es la recepción más
+        # reciente que sigue vigente (una consulta, solo para estos productos)
+        ultimas = {}
+        for linea in (
+            OrdenProveedorDetalle.objects
+            .filter(
+                producto_id__in=sin_ultima_compra,
+                orden_proveedor__estado='recibida',
+                orden_proveedor__deleted_at__isnull=True,
+            )
+            .order_by('producto_id', 'orden_proveedor__fecha_recepcion', 'id')
+            .values('producto_id', 'precio_compra', 'proveedor_id', fecha=F('orden_proveedor__fecha_recepcion'))
+        ):
+            ultimas[linea['producto_id']] = linea
+        for producto_id in sin_ultima_compra:
+            _asignar_ultima_compra(costos[producto_id], ultimas.get(producto_id))
+
+    ahora = timezone.now()
+    for costo in costos.values():
+        if costo.unidades_compradas <= 0:
+            costo.unidades_compradas = 0
+            costo.importe_comprado = Decimal('0.00')
+        costo.costo_promedio = _costo_promedio(costo)
+        costo.deleted_at = None
+        costo.updated_at = ahora
+
+    CostoProducto.all_objects.bulk_update(costos.values(), CAMPOS_COSTO)
+    return list(costos.values())
+
+
+def recalcular_costos_productos(producto_ids):
+    """
+    Reconstruye CostoProducto para los productos indicados desde todas las
+    líneas de órdenes recibidas. Lo usa el comando recalcular_costos_productos
+    para reparar la tabla; las recepciones la actualizan con
+    actualizar_costos_recepcion.
+
+    - ultimo_costo / ultimo_proveedor / fecha_ultima_compra: línea de la orden
+      recibida más recientemente (fecha_recepcion, luego id).
+    - costo_promedio: promedio ponderado por cantidad de todas las recepciones.
+
+    Los productos que ya no tienen recepciones quedan con costo vacío.
+    """
+    producto_ids = set(producto_ids)
+    if not producto_ids:
+        return []
+
+    lineas = (
+        OrdenProveedorDetalle.objects
+        .filter(
+            producto_id__in=producto_ids,
+            orden_proveedor__estado='recibida',
+            orden_proveedor__deleted_at__isnull=True,
+        )
+        .order_by('producto_id', 'orden_proveedor__fecha_recepcion', 'id')
+        .values('producto_id', 'precio_compra', 'cantidad', 'proveedor_id',
+                importe=F('subtotal'), fecha=F('orden_proveedor__fecha_recepcion'))
+    )
+
+    calculos = {}
+    for linea in lineas:
+        c = calculos.setdefault(linea['producto_id'], {'unidades': 0, 'importe': Decimal('0.00')})
+        c['unidades'] += linea['cantidad']
+        c['importe'] += linea['importe']
+        # Las líneas vienen en orden de recepción: la última pisa a las anteriores
+        c['ultima'] = linea
+
+    existentes = {
+        costo.producto_id: costo
+        for costo in CostoProducto.all_objects.filter(producto_id__in=producto_ids)
+    }
+
+    ahora = timezone.now()
+    nuevos = []
+    for producto_id in sorted(producto_ids):
+        c = calculos.get(producto_id)
+        costo = existentes.get(producto_id)
+        if costo is None:
+            if c is None:
+                continue
+            costo = CostoProducto(producto_id=producto_id)
+            nuevos.append(costo)
+
+        costo.unidades_compradas = max(c['unidades'], 0) if c else 0
+        costo.importe_comprado = c['importe'] if costo.unidades_compradas else Decimal('0.00')
+        costo.costo_promedio = _costo_promedio(costo)
+        _asignar_ultima_compra(costo, c['ultima'] if c else None)
+        costo.deleted_at = None
+        costo.updated_at = ahora
+
+    actualizados = list(existentes.values())
+    if actualizados:
+        CostoProducto.all_objects.bulk_update(actualizados, CAMPOS_COSTO)
+    if nuevos:
+        CostoProducto.objects.bulk_create(nuevos, ignore_conflicts=True)
+
+    return actualizados + nuevos
+
+
+def get_costos_productos(producto_ids):
+    """
+    Retorna {producto_id: CostoProducto} para varios productos con una sola consulta.
+    Los productos sin recepciones no aparecen.
+    """
+    producto_ids = set(producto_ids)
+    if not producto_ids:
+        return {}
+    return {
+        costo.producto_id: costo
+        for costo in CostoProducto.objects.select_related('ultimo_proveedor').filter(producto_id__in=producto_ids)
+    }
@@ -11,8 +11,8 @@ from datetime import datetime, time
 # --- Importaciones del proyecto ---
 from user.api.permissions import RolePermission
 from productos.models import Producto
-from inventarioproducto.models import InventarioProducto
-from proveedores.models import OrdenProveedorDetalle
+from inventarioproducto.models import InventarioProducto, MovimientoInventario
+from inventarioproducto.api.utils import get_stock_producto, registrar_movimiento
 
 # Roles que pueden gestionar inventarios
 INVENTORY_MANAGER_ROLES = ['admin', 'manager', 'almacenista']
@@ -277,43 +277,112 @@ def get_inventario_by_producto(request, producto_id):
 
     return Response(data, status=status.HTTP_200_OK)
   
-def get_total_unidades_producto_call(producto_id):
+# --- Ajuste manual de stock ---
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, RolePermission(INVENTORY_MANAGER_ROLES)])
+def create_ajuste_stock(request):
     """
-    Retorna la cantidad total de unidades disponibles para un producto.
+    Registra un ajuste de stock (conteo físico, merma, etc.).
+    Espera:
+    {
+        "producto_id": 12,
+        "cantidad": -3,
+        "notas": "Producto averiado"
+    }
+    """
+    producto_id  = request.data.get('producto_id')
+    cantidad_str = request.data.get('cantidad')
+    notas        = request.data.get('notas', '')
 
-    Cálculo: Stock Disponible = Cantidad Recibida - Cantidad Vendida
+    if not producto_id or cantidad_str is None:
+        return Response(
+            {"error": "Los campos 'producto_id' y 'cantidad' son obligatorios."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
-    - Cantidad Recibida: Suma de cantidades en órdenes de proveedor con estado 'recibida'
-    - Cantidad Vendida: Suma de cantidades en detalles de ventas
-    """
     try:
-        # Importar aquí para evitar importación circular
-        from ventas.models import DetalleVenta
-
-        # Cantidad recibida desde órdenes de proveedor
-        cantidad_recibida = (
-            OrdenProveedorDetalle.objects
-            .filter(
-                orden_proveedor__estado='recibida',
-                producto_id=producto_id,
-                deleted_at__isnull=True
-            )
-            .aggregate(total=Sum('cantidad'))['total'] or 0
+        cantidad = int(cantidad_str)
+        if cantidad == 0:
+            raise ValueError("La cantidad del ajuste no puede ser 0.")
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        producto = get_object_or_404(Producto, pk=producto_id)
+
+        registrar_movimiento(
+            producto_id=producto.id,
+            tipo='ajuste',
+            cantidad=cantidad,
+            notas=notas,
+            usuario=request.user
         )
 
-        # Cantidad vendida desde ventas
-        cantidad_vendida = (
-            DetalleVenta.objects
-            .filter(
-                producto_id=producto_id,
-                deleted_at__isnull=True
-            )
-            .aggregate(total=Sum('cantidad'))['total'] or 0
+        return Response({
+            "producto_id": producto.id,
+            "ajuste": cantidad,
+            "stock_disponible": get_stock_producto(producto.id),
+        }, status=status.HTTP_201_CREATED)
+
+    except Exception as e:
+        return Response(
+            {"error": f"Error al registrar el ajuste de stock: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
-        # Stock disponible = recibido - vendido
-        stock_disponible = cantidad_recibida - cantidad_vendida
 
-        return stock_disponible
+# --- Movimientos de stock de un producto ---
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, RolePermission(INVENTORY_MANAGER_ROLES)])
+def list_movimientos_producto(request, producto_id):
+    try:
+        movimientos = (
+            MovimientoInventario.objects
+            .select_related('creado_por')
+            .filter(producto_id=producto_id)
+            .order_by('-created_at', '-id')
+        )
+
+        tipo = request.query_params.get('tipo')
+        if tipo:
+            movimientos = movimientos.filter(tipo=tipo)
+
+        paginator = PageNumberPagination()
+        paginator.page_size_query_param = 'page_size'
+        paginator.page_size = 20
+        paginator.max_page_size = 200
+        page = paginator.paginate_queryset(movimientos, request)
+
+        data = [{
+            "id": m.id,
+            "tipo": m.tipo,
+            "cantidad": m.cantidad,
+            "referencia": m.referencia,
+            "notas": m.notas,
+            "creado_por_username": m.creado_por.username if m.creado_por else None,
+            "created_at": m.created_at,
+        } for m in page]
+
+        return paginator.get_paginated_response({
+            "producto_id": producto_id,
+            "stock_disponible": get_stock_producto(producto_id),
+            "movimientos": data,
+        })
+
+    except Exception as e:
+        return Response(
+            {"error": f"Error al obtener los movimientos del producto: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+def get_total_unidades_producto_call(producto_id):
+    """
+    Retorna la cantidad total de unidades disponibles para un producto.
+
+    El stock se lee del saldo materializado (SaldoInventario), que se mantiene
+    con cada recepción de orden, venta, devolución y ajuste.
+    """
+    try:
+        return get_stock_producto(producto_id)
     except Exception as e:
-        return 0
\ No newline at end of file
+        return 0
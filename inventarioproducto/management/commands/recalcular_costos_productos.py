@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from productos.models import Producto
+from inventarioproducto.api.utils import recalcular_costos_productos
+
+
+PRODUCTOS_POR_BLOQUE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye la tabla de costos por producto (último costo, costo promedio y "
+        "último proveedor) desde las órdenes de proveedor recibidas."
+    )
+
+    def handle(self, *args, **options):
+        producto_ids = list(Producto.all_objects.order_by('id').values_list('id', flat=True))
+
+        for i in range(0, len(producto_ids), PRODUCTOS_POR_BLOQUE):
+            with transaction.atomic():
+                recalcular_costos_productos(producto_ids[i:i + PRODUCTOS_POR_BLOQUE])
+
+        self.stdout.write(self.style.SUCCESS(f"Costos recalculados para {len(producto_ids)} producto(s)."))
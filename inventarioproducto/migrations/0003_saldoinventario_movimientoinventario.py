@@ -0,0 +1,63 @@
+# Generated by Django 4.2 on 2026-10-16 23:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('productos', '0004_producto_proveedor'),
+        ('inventarioproducto', '0002_alter_inventarioproducto_producto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Eliminación Lógica')),
+                ('cantidad', models.IntegerField(default=0, verbose_name='Unidades disponibles')),
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='saldo_inventario', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Saldo de Inventario',
+                'verbose_name_plural': 'Saldos de Inventario',
+                'db_table': 'saldo_inventario',
+                'ordering': ['producto'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Eliminación Lógica')),
+                ('tipo', models.CharField(choices=[('recepcion', 'Recepción de Orden'), ('venta', 'Venta'), ('devolucion', 'Devolución'), ('ajuste', 'Ajuste')], max_length=20, verbose_name='Tipo de movimiento')),
+                ('cantidad', models.IntegerField(verbose_name='Cantidad (+ entrada / - salida)')),
+                ('referencia', models.CharField(blank=True, max_length=50, null=True, verbose_name='Referencia (venta / orden)')),
+                ('notas', models.CharField(blank=True, max_length=255, null=True, verbose_name='Notas')),
+                ('creado_por', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_inventario_creados', to=settings.AUTH_USER_MODEL)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimientos_inventario', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Inventario',
+                'verbose_name_plural': 'Movimientos de Inventario',
+                'db_table': 'movimientos_inventario',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['producto', 'created_at'], name='movimientos_product_70c5a9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['tipo', 'created_at'], name='movimientos_tipo_aeac52_idx'),
+        ),
+    ]
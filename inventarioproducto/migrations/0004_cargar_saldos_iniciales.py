@@ -0,0 +1,64 @@
+from django.db import migrations
+from django.db.models import Sum
+
+
+def cargar_saldos_iniciales(apps, schema_editor):
+    """
+    Calcula el stock actual de cada producto con la fórmula anterior
+    (recibido en órdenes 'recibida' - vendido) y lo deja como saldo inicial,
+    con un movimiento de ajuste que lo respalda en el libro.
+    """
+    Producto              = apps.get_model('productos', 'Producto')
+    OrdenProveedorDetalle = apps.get_model('proveedores', 'OrdenProveedorDetalle')
+    DetalleVenta          = apps.get_model('ventas', 'DetalleVenta')
+    SaldoInventario       = apps.get_model('inventarioproducto', 'SaldoInventario')
+    MovimientoInventario  = apps.get_model('inventarioproducto', 'MovimientoInventario')
+
+    recibido = dict(
+        OrdenProveedorDetalle.objects
+        .filter(orden_proveedor__estado='recibida', deleted_at__isnull=True)
+        .values('producto_id')
+        .annotate(total=Sum('cantidad'))
+        .values_list('producto_id', 'total')
+    )
+    vendido = dict(
+        DetalleVenta.objects
+        .filter(deleted_at__isnull=True)
+        .values('producto_id')
+        .annotate(total=Sum('cantidad'))
+        .values_list('producto_id', 'total')
+    )
+
+    saldos = []
+    movimientos = []
+    for producto_id in Producto.objects.values_list('id', flat=True).iterator():
+        cantidad = (recibido.get(producto_id) or 0) - (vendido.get(producto_id) or 0)
+        saldos.append(SaldoInventario(producto_id=producto_id, cantidad=cantidad))
+        if cantidad:
+            movimientos.append(MovimientoInventario(
+                producto_id=producto_id,
+                tipo='ajuste',
+                cantidad=cantidad,
+                notas='Saldo inicial calculado desde órdenes recibidas y ventas',
+            ))
+
+    SaldoInventario.objects.bulk_create(saldos, batch_size=1000)
+    MovimientoInventario.objects.bulk_create(movimientos, batch_size=1000)
+
+
+def eliminar_saldos(apps, schema_editor):
+    apps.get_model('inventarioproducto', 'MovimientoInventario').objects.all().delete()
+    apps.get_model('inventarioproducto', 'SaldoInventario').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventarioproducto', '0003_saldoinventario_movimientoinventario'),
+        ('proveedores', '0004_ordenproveedor_tarjeta_alter_ordenproveedor_estado'),
+        ('ventas', '0006_alter_venta_tarjeta'),
+    ]
+
+    operations = [
+        migrations.RunPython(cargar_saldos_iniciales, eliminar_saldos),
+    ]
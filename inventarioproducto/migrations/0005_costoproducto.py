@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-16 23:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0004_producto_proveedor'),
+        ('proveedores', '0006_ordenproveedor_fecha_recepcion'),
+        ('inventarioproducto', '0004_cargar_saldos_iniciales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CostoProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Eliminación Lógica')),
+                ('ultimo_costo', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Último costo de compra')),
+                ('costo_promedio', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Costo promedio ponderado')),
+                ('unidades_compradas', models.PositiveIntegerField(default=0, verbose_name='Unidades recibidas')),
+                ('fecha_ultima_compra', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de la última recepción')),
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='costo', to='productos.producto')),
+                ('ultimo_proveedor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='costos_productos', to='proveedores.proveedor')),
+            ],
+            options={
+                'verbose_name': 'Costo de Producto',
+                'verbose_name_plural': 'Costos de Productos',
+                'db_table': 'costo_producto',
+                'ordering': ['producto'],
+            },
+        ),
+    ]
@@ -0,0 +1,140 @@
+# Generated by Django 4.2 on 2026-10-16 23:41
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def cargar_capas_iniciales(apps, schema_editor):
+    """
+    El stock que ya existe no tiene capas. Cada línea de orden ya recibida
+    abre su propia capa (como lo haría sincronizar_capas_ordenes), así
+    editarla, revertirla o eliminarla después ajusta esa capa y no crea otra.
+    Lo ya vendido se descuenta de las capas más antiguas (FIFO) hasta que lo
+    disponible en capas sea el saldo actual del producto. Si el saldo es mayor
+    que lo recibido en órdenes, la diferencia queda en una capa de
+    'Saldo inicial' costeada con el precio de compra del producto.
+    """
+    Producto = apps.get_model('productos', 'Producto')
+    SaldoInventario = apps.get_model('inventarioproducto', 'SaldoInventario')
+    OrdenProveedorDetalle = apps.get_model('proveedores', 'OrdenProveedorDetalle')
+    CapaCosto = apps.get_model('inventarioproducto', 'CapaCosto')
+
+    precios = dict(Producto.objects.values_list('id', 'precio_compra').iterator())
+    saldos = dict(
+        SaldoInventario.objects
+        .filter(deleted_at__isnull=True)
+        .values_list('producto_id', 'cantidad')
+        .iterator()
+    )
+    lineas = defaultdict(list)
+    for linea in (
+        OrdenProveedorDetalle.objects
+        .filter(
+            deleted_at__isnull=True,
+            cantidad__gt=0,
+            orden_proveedor__estado='recibida',
+            orden_proveedor__deleted_at__isnull=True,
+        )
+        .order_by('producto_id', 'orden_proveedor__fecha_recepcion', 'id')
+        .values_list('id', 'producto_id', 'cantidad', 'precio_compra',
+                     'orden_proveedor__fecha_recepcion', 'orden_proveedor__numero_orden')
+        .iterator()
+    ):
+        if linea[1] in precios:
+            lineas[linea[1]].append(linea)
+
+    ahora = timezone.now()
+    capas = []
+    for producto_id in sorted(set(lineas) | {p for p, cantidad in saldos.items() if cantidad > 0}):
+        if producto_id not in precios:
+            continue
+        saldo = max(saldos.get(producto_id, 0), 0)
+        recibido = sum(linea[2] for linea in lineas[producto_id])
+        vendido = max(recibido - saldo, 0)
+
+        for detalle_id, _, cantidad, precio, fecha, numero_orden in lineas[producto_id]:
+            consumidas = min(vendido, cantidad)
+            vendido -= consumidas
+            capas.append(CapaCosto(
+                producto_id=producto_id,
+                detalle_orden_id=detalle_id,
+                costo_unitario=precio,
+                cantidad_inicial=cantidad,
+                cantidad_disponible=cantidad - consumidas,
+                fecha_entrada=fecha or ahora,
+                referencia=numero_orden,
+            ))
+
+        if saldo > recibido:
+            capas.append(CapaCosto(
+                producto_id=producto_id,
+                costo_unitario=precios[producto_id],
+                cantidad_inicial=saldo - recibido,
+                cantidad_disponible=saldo - recibido,
+                fecha_entrada=ahora,
+                referencia='Saldo inicial',
+            ))
+
+    CapaCosto.objects.bulk_create(capas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proveedores', '0006_ordenproveedor_fecha_recepcion'),
+        ('ventas', '0011_detalleventa_costo_total'),
+        ('productos', '0004_producto_proveedor'),
+        ('inventarioproducto', '0005_costoproducto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CapaCosto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Eliminación Lógica')),
+                ('costo_unitario', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Costo unitario')),
+                ('cantidad_inicial', models.PositiveIntegerField(default=0, verbose_name='Unidades que entraron')),
+                ('cantidad_disponible', models.PositiveIntegerField(default=0, verbose_name='Unidades sin consumir')),
+                ('fecha_entrada', models.DateTimeField(verbose_name='Fecha de entrada')),
+                ('referencia', models.CharField(blank=True, max_length=50, null=True, verbose_name='Referencia (orden)')),
+                ('detalle_orden', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='capa_costo', to='proveedores.ordenproveedordetalle')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='capas_costo', to='productos.producto')),
+            ],
+            options={
+                'verbose_name': 'Capa de Costo',
+                'verbose_name_plural': 'Capas de Costo',
+                'db_table': 'capas_costo',
+                'ordering': ['producto', 'fecha_entrada', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ConsumoCapa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Eliminación Lógica')),
+                ('cantidad', models.PositiveIntegerField(verbose_name='Unidades consumidas (netas de devoluciones)')),
+                ('costo_unitario', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Costo unitario')),
+                ('capa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='consumos', to='inventarioproducto.capacosto')),
+                ('detalle_venta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumos_capa', to='ventas.detalleventa')),
+            ],
+            options={
+                'verbose_name': 'Consumo de Capa',
+                'verbose_name_plural': 'Consumos de Capas',
+                'db_table': 'consumos_capa',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='capacosto',
+            index=models.Index(fields=['producto', 'cantidad_disponible', 'fecha_entrada'], name='capas_costo_product_41a429_idx'),
+        ),
+        migrations.RunPython(cargar_capas_iniciales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2 on 2026-10-17 00:27
+
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def cargar_costos(apps, schema_editor):
+    """
+    Las recepciones ahora solo suman o restan su diferencia al costo, así que
+    la tabla debe partir completa: se reconstruye una vez desde las líneas de
+    órdenes recibidas (mismo cálculo que recalcular_costos_productos).
+    """
+    OrdenProveedorDetalle = apps.get_model('proveedores', 'OrdenProveedorDetalle')
+    CostoProducto = apps.get_model('inventarioproducto', 'CostoProducto')
+
+    calculos = {}
+    for producto_id, precio, cantidad, subtotal, proveedor_id, fecha in (
+        OrdenProveedorDetalle.objects
+        .filter(
+            deleted_at__isnull=True,
+            orden_proveedor__estado='recibida',
+            orden_proveedor__deleted_at__isnull=True,
+        )
+        .order_by('producto_id', 'orden_proveedor__fecha_recepcion', 'id')
+        .values_list('producto_id', 'precio_compra', 'cantidad', 'subtotal',
+                     'proveedor_id', 'orden_proveedor__fecha_recepcion')
+        .iterator()
+    ):
+        c = calculos.setdefault(producto_id, {'unidades': 0, 'importe': Decimal('0.00')})
+        c['unidades'] += cantidad
+        c['importe'] += subtotal
+        c['ultima'] = (precio, proveedor_id, fecha)
+
+    CostoProducto.objects.all().delete()
+    ahora = timezone.now()
+    costos = []
+    for producto_id, c in calculos.items():
+        unidades = max(c['unidades'], 0)
+        precio, proveedor_id, fecha = c['ultima']
+        costos.append(CostoProducto(
+            producto_id=producto_id,
+            ultimo_costo=precio,
+            costo_promedio=(
+                (c['importe'] / unidades).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP) if unidades else None
+            ),
+            unidades_compradas=unidades,
+            importe_comprado=c['importe'] if unidades else Decimal('0.00'),
+            ultimo_proveedor_id=proveedor_id,
+            fecha_ultima_compra=fecha,
+            updated_at=ahora,
+        ))
+    CostoProducto.objects.bulk_create(costos, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventarioproducto', '0006_capas_costo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='costoproducto',
+            name='importe_comprado',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Importe recibido'),
+        ),
+        migrations.RunPython(cargar_costos, migrations.RunPython.noop),
+    ]
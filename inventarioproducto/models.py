@@ -2,6 +2,7 @@ from django.db import models
 from user.models import User
 from user.base.models import BaseModel
 from productos.models import Producto
+from proveedores.models import Proveedor, OrdenProveedorDetalle
 
 
 class InventarioProducto(BaseModel):
@@ -32,3 +33,174 @@ class InventarioProducto(BaseModel):
 
     def __str__(self):
         return f"Inventario de {self.producto.nombre} ({self.cantidad_unidades} unidades)"
+
+
+class SaldoInventario(BaseModel):
+    """
+    Saldo vigente de unidades por producto.
+    Se actualiza en la misma transacción que cada MovimientoInventario,
+    así leer el stock de un producto es una sola búsqueda por índice.
+    """
+    producto = models.OneToOneField(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name='saldo_inventario'
+    )
+    cantidad = models.IntegerField(default=0, verbose_name="Unidades disponibles")
+
+    class Meta:
+        verbose_name = "Saldo de Inventario"
+        verbose_name_plural = "Saldos de Inventario"
+        db_table = "saldo_inventario"
+        ordering = ['producto']
+
+    def __str__(self):
+        return f"Saldo de {self.producto_id}: {self.cantidad} unidades"
+
+
+class MovimientoInventario(BaseModel):
+    """
+    Libro de movimientos de stock (solo inserción).
+    La cantidad es positiva para entradas (recepciones, devoluciones)
+    y negativa para salidas (ventas); los ajustes pueden ir en ambos sentidos.
+    """
+
+    TIPO_CHOICES = [
+        ('recepcion', 'Recepción de Orden'),
+        ('venta', 'Venta'),
+        ('devolucion', 'Devolución'),
+        ('ajuste', 'Ajuste'),
+    ]
+
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.PROTECT,
+        related_name='movimientos_inventario'
+    )
+    tipo       = models.CharField(max_length=20, choices=TIPO_CHOICES, verbose_name="Tipo de movimiento")
+    cantidad   = models.IntegerField(verbose_name="Cantidad (+ entrada / - salida)")
+    referencia = models.CharField(max_length=50, blank=True, null=True, verbose_name="Referencia (venta / orden)")
+    notas      = models.CharField(max_length=255, blank=True, null=True, verbose_name="Notas")
+    creado_por = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='movimientos_inventario_creados'
+    )
+
+    class Meta:
+        verbose_name = "Movimiento de Inventario"
+        verbose_name_plural = "Movimientos de Inventario"
+        db_table = "movimientos_inventario"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['producto', 'created_at']),
+            models.Index(fields=['tipo', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.cantidad:+d} ({self.producto_id})"
+
+
+class CostoProducto(BaseModel):
+    """
+    Costo de compra vigente por producto, calculado desde las líneas de
+    órdenes de proveedor recibidas. Cada recepción suma o resta su diferencia
+    (unidades e importe), así consultar el costo de un producto es una sola
+    búsqueda por índice y recibir no relee el historial de compras.
+    """
+    producto = models.OneToOneField(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name='costo'
+    )
+    ultimo_costo        = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name="Último costo de compra")
+    costo_promedio      = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name="Costo promedio ponderado")
+    unidades_compradas  = models.PositiveIntegerField(default=0, verbose_name="Unidades recibidas")
+    importe_comprado    = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Importe recibido")
+    ultimo_proveedor    = models.ForeignKey(
+        Proveedor,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='costos_productos'
+    )
+    fecha_ultima_compra = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de la última recepción")
+
+    class Meta:
+        verbose_name = "Costo de Producto"
+        verbose_name_plural = "Costos de Productos"
+        db_table = "costo_producto"
+        ordering = ['producto']
+
+    def __str__(self):
+        return f"Costo de {self.producto_id}: {self.ultimo_costo}"
+
+
+class CapaCosto(BaseModel):
+    """
+    Capa de costo FIFO: unidades que entraron al inventario a un mismo costo
+    unitario (una por línea de orden recibida, más las capas de saldo inicial).
+    Las ventas consumen primero las capas más antiguas con unidades disponibles.
+    """
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.PROTECT,
+        related_name='capas_costo'
+    )
+    detalle_orden = models.OneToOneField(
+        OrdenProveedorDetalle,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='capa_costo'
+    )
+    costo_unitario      = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Costo unitario")
+    cantidad_inicial    = models.PositiveIntegerField(default=0, verbose_name="Unidades que entraron")
+    cantidad_disponible = models.PositiveIntegerField(default=0, verbose_name="Unidades sin consumir")
+    fecha_entrada       = models.DateTimeField(verbose_name="Fecha de entrada")
+    referencia          = models.CharField(max_length=50, blank=True, null=True, verbose_name="Referencia (orden)")
+
+    class Meta:
+        verbose_name = "Capa de Costo"
+        verbose_name_plural = "Capas de Costo"
+        db_table = "capas_costo"
+        ordering = ['producto', 'fecha_entrada', 'id']
+        indexes = [
+            models.Index(fields=['producto', 'cantidad_disponible', 'fecha_entrada']),
+        ]
+
+    def __str__(self):
+        return f"Capa {self.producto_id}: {self.cantidad_disponible}/{self.cantidad_inicial} a {self.costo_unitario}"
+
+
+class ConsumoCapa(BaseModel):
+    """
+    Unidades de una capa asignadas a una línea de venta, con su costo.
+    Permite devolver las unidades a la misma capa cuando hay devoluciones.
+    Sin capa cuando la venta no tenía capas disponibles y se costeó con
+    el precio de compra del producto.
+    """
+    capa = models.ForeignKey(
+        CapaCosto,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='consumos'
+    )
+    detalle_venta = models.ForeignKey(
+        'ventas.DetalleVenta',
+        on_delete=models.CASCADE,
+        related_name='consumos_capa'
+    )
+    cantidad       = models.PositiveIntegerField(verbose_name="Unidades consumidas (netas de devoluciones)")
+    costo_unitario = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Costo unitario")
+
+    class Meta:
+        verbose_name = "Consumo de Capa"
+        verbose_name_plural = "Consumos de Capas"
+        db_table = "consumos_capa"
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.cantidad} de capa {self.capa_id} para detalle {self.detalle_venta_id}"
@@ -1,3 +1,343 @@
+from decimal import Decimal
+from importlib import import_module
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Sum
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from categoria.models import Categoria
+from inventarioproducto.api.utils import recalcular_costos_productos
+from inventarioproducto.models import CostoProducto, CapaCosto, MovimientoInventario, SaldoInventario
+from productos.models import Producto
+from proveedores.models import Proveedor, OrdenProveedor, OrdenProveedorDetalle
+from tarjetabancaria.models import TarjetaBancaria
+from user.models import User
+from ventas.models import DetalleVenta
+
+
+class CostosRecepcionTests(TestCase):
+    """
+    Las recepciones ajustan CostoProducto con su diferencia; después de cada
+    operación la tabla debe quedar igual que un recálculo completo.
+    """
+
+    CAMPOS = [
+        'ultimo_costo', 'costo_promedio', 'unidades_compradas', 'importe_comprado',
+        'ultimo_proveedor_id', 'fecha_ultima_compra',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='compras', role='admin')
+        categoria = Categoria.objects.create(nombre='Cat')
+        cls.proveedor = Proveedor.objects.create(nombre_empresa='Prov', ciudad='X')
+        cls.tarjeta = TarjetaBancaria.objects.create(nombre='Caja')
+        cls.productos = [
+            Producto.objects.create(
+                nombre=f'P{i}', categoria=categoria, proveedor=cls.proveedor, precio_compra=10,
+                porcentaje_ganancia=10, precio_final=11, codigo_busqueda=f'C{i}',
+            )
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def _crear_orden(self, estado, precio, cantidad):
+        respuesta = self.client.post('/api/suppliers/ordenes/create/', {
+            'proveedor_id': self.proveedor.id,
+            'tarjeta_id': self.tarjeta.id,
+            'estado': estado,
+            'detalles': [
+                {'producto_id': p.id, 'nombre': p.nombre, 'precio_compra': precio, 'cantidad': cantidad}
+                for p in self.productos
+            ],
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        return respuesta.json()
+
+    def _costos(self):
+        return {
+            costo.producto_id: tuple(getattr(costo, campo) for campo in self.CAMPOS)
+            for costo in CostoProducto.objects.filter(producto__in=self.productos)
+        }
+
+    def assertCostosIgualRecalculo(self):
+        incrementales = self._costos()
+        with transaction.atomic():
+            recalcular_costos_productos(p.id for p in self.productos)
+            recalculados = self._costos()
+            transaction.set_rollback(True)
+        self.assertEqual(incrementales, recalculados)
+
+    def test_costos_incrementales_igualan_recalculo(self):
+        o1 = self._crear_orden('recibida', '3.00', 4)['id']
+        self.assertCostosIgualRecalculo()
+
+        o2 = self._crear_orden('en_transito', '5.00', 2)['id']
+        self.client.patch(f'/api/suppliers/ordenes/{o2}/update-estado/', {'estado': 'recibida'}, format='json')
+        self.assertCostosIgualRecalculo()
+        costo = CostoProducto.objects.get(producto=self.productos[0])
+        self.assertEqual(costo.ultimo_costo, Decimal('5.00'))
+        self.assertEqual(costo.unidades_compradas, 6)
+        self.assertEqual(costo.costo_promedio, Decimal('3.67'))
+
+        # Editar y luego revertir la última compra
+        self.client.put(f'/api/suppliers/ordenes/{o2}/update/', {'detalles': [
+            {'producto_id': p.id, 'nombre': p.nombre, 'precio_compra': '7.00', 'cantidad': 3}
+            for p in self.productos
+        ]}, format='json')
+        self.assertCostosIgualRecalculo()
+        self.client.patch(f'/api/suppliers/ordenes/{o2}/update-estado/', {'estado': 'en_transito'}, format='json')
+        self.assertCostosIgualRecalculo()
+        self.assertEqual(CostoProducto.objects.get(producto=self.productos[0]).ultimo_costo, Decimal('3.00'))
+
+        # Recepción en bloque: las dos órdenes con la misma fecha, desempate por línea
+        self.client.post('/api/suppliers/ordenes/update-estado/', {'orden_ids': [o1, o2], 'estado': 'en_transito'}, format='json')
+        self.assertCostosIgualRecalculo()
+        self.client.post('/api/suppliers/ordenes/update-estado/', {'orden_ids': [o1, o2], 'estado': 'recibida'}, format='json')
+        self.assertCostosIgualRecalculo()
+
+        detalle = OrdenProveedorDetalle.objects.get(orden_proveedor_id=o1, producto=self.productos[0])
+        self.client.put(f'/api/suppliers/detalles/{detalle.id}/update/', {'cantidad': 9, 'precio_compra': '1.50'}, format='json')
+        self.assertCostosIgualRecalculo()
+        self.client.delete(f'/api/suppliers/detalles/{detalle.id}/delete/')
+        self.assertCostosIgualRecalculo()
+
+        self.client.delete(f'/api/suppliers/ordenes/{o2}/delete/')
+        self.client.delete(f'/api/suppliers/ordenes/{o1}/delete/')
+        self.assertCostosIgualRecalculo()
+        costo = CostoProducto.objects.get(producto=self.productos[0])
+        self.assertEqual(costo.unidades_compradas, 0)
+        self.assertIsNone(costo.costo_promedio)
+        self.assertIsNone(costo.ultimo_costo)
+
+    def test_rechaza_cantidades_no_positivas(self):
+        respuesta = self.client.post('/api/suppliers/ordenes/create/', {
+            'proveedor_id': self.proveedor.id,
+            'tarjeta_id': self.tarjeta.id,
+            'estado': 'recibida',
+            'detalles': [{'producto_id': self.productos[0].id, 'nombre': 'P0', 'precio_compra': '2.00', 'cantidad': -3}],
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+
+        detalle_id = self._crear_orden('pendiente', '2.00', 1)['detalles'][0]['id']
+        respuesta = self.client.put(f'/api/suppliers/detalles/{detalle_id}/update/', {'cantidad': -1}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(OrdenProveedor.objects.filter(estado='recibida').exists())
+
+    def test_recalculo_sin_unidades_no_divide_por_cero(self):
+        producto = self.productos[0]
+        for i in range(2):
+            orden = OrdenProveedor.objects.create(
+                proveedor=self.proveedor, tarjeta=self.tarjeta, numero_orden=f'OP-Z{i}', estado='recibida',
+            )
+            OrdenProveedorDetalle.objects.bulk_create([OrdenProveedorDetalle(
+                orden_proveedor=orden, proveedor=self.proveedor, producto=producto,
+                nombre='P0', precio_compra=Decimal('2.00'), cantidad=0, subtotal=Decimal('0.00'),
+            )])
+
+        recalcular_costos_productos([producto.id])
+
+        costo = CostoProducto.objects.get(producto=producto)
+        self.assertEqual(costo.unidades_compradas, 0)
+        self.assertIsNone(costo.costo_promedio)
+        self.assertEqual(costo.ultimo_costo, Decimal('2.00'))
+
+
+class CapasInicialesTests(TestCase):
+    """
+    La migración de capas FIFO parte de órdenes ya recibidas y de saldos que
+    no tienen capas; editar esas órdenes después no debe duplicar unidades.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='compras', role='admin')
+        categoria = Categoria.objects.create(nombre='Cat')
+        cls.proveedor = Proveedor.objects.create(nombre_empresa='Prov', ciudad='X')
+        tarjeta = TarjetaBancaria.objects.create(nombre='Caja')
+        cls.producto, cls.sin_ordenes = [
+            Producto.objects.create(
+                nombre=f'P{i}', categoria=categoria, proveedor=cls.proveedor, precio_compra=10,
+                porcentaje_ganancia=10, precio_final=11, codigo_busqueda=f'C{i}',
+            )
+            for i in range(2)
+        ]
+
+        # Datos como estaban antes de la migración: líneas recibidas sin capas
+        # y un saldo que ya descontó 4 unidades vendidas
+        cls.ordenes = []
+        for numero, cantidad, precio in (('OP-A', 10, '2.00'), ('OP-B', 5, '3.00')):
+            orden = OrdenProveedor.objects.create(
+                proveedor=cls.proveedor, tarjeta=tarjeta, numero_orden=numero, estado='recibida',
+            )
+            OrdenProveedorDetalle.objects.bulk_create([OrdenProveedorDetalle(
+                orden_proveedor=orden, proveedor=cls.proveedor, producto=cls.producto, nombre='P0',
+                precio_compra=Decimal(precio), cantidad=cantidad, subtotal=Decimal(precio) * cantidad,
+            )])
+            cls.ordenes.append(orden)
+        SaldoInventario.objects.update_or_create(producto=cls.producto, defaults={'cantidad': 11})
+        SaldoInventario.objects.update_or_create(producto=cls.sin_ordenes, defaults={'cantidad': 7})
+
+        import_module('inventarioproducto.migrations.0006_capas_costo').cargar_capas_iniciales(apps, None)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def assertCapasIgualSaldo(self, producto):
+        disponible = CapaCosto.objects.filter(producto=producto).aggregate(total=Sum('cantidad_disponible'))['total']
+        self.assertEqual(disponible, SaldoInventario.objects.get(producto=producto).cantidad)
+
+    def test_capas_iniciales_por_linea_recibida(self):
+        capas = {capa.referencia: capa for capa in CapaCosto.objects.filter(producto=self.producto)}
+        self.assertEqual(set(capas), {'OP-A', 'OP-B'})
+        self.assertEqual((capas['OP-A'].cantidad_inicial, capas['OP-A'].cantidad_disponible), (10, 6))
+        self.assertEqual((capas['OP-B'].cantidad_inicial, capas['OP-B'].cantidad_disponible), (5, 5))
+        self.assertCapasIgualSaldo(self.producto)
+
+        capa = CapaCosto.objects.get(producto=self.sin_ordenes)
+        self.assertEqual((capa.referencia, capa.cantidad_disponible, capa.costo_unitario), ('Saldo inicial', 7, Decimal('10.00')))
+
+    def test_editar_orden_recibida_existente_mantiene_capas_y_saldo(self):
+        a, b = self.ordenes
+        respuesta = self.client.put(f'/api/suppliers/ordenes/{b.id}/update/', {'detalles': [
+            {'producto_id': self.producto.id, 'nombre': 'P0', 'precio_compra': '3.00', 'cantidad': 8},
+        ]}, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(SaldoInventario.objects.get(producto=self.producto).cantidad, 14)
+        self.assertEqual(CapaCosto.objects.filter(producto=self.producto).count(), 2)
+        self.assertCapasIgualSaldo(self.producto)
+
+        self.client.patch(f'/api/suppliers/ordenes/{b.id}/update-estado/', {'estado': 'en_transito'}, format='json')
+        self.assertCapasIgualSaldo(self.producto)
+
+        detalle = a.detalles.get()
+        self.client.put(f'/api/suppliers/detalles/{detalle.id}/update/', {'cantidad': 7}, format='json')
+        self.assertEqual(SaldoInventario.objects.get(producto=self.producto).cantidad, 3)
+        self.assertCapasIgualSaldo(self.producto)
+
+
+class SaldoMovimientosTests(TestCase):
+    """
+    SaldoInventario es la suma materializada de MovimientoInventario: después
+    de recepciones, ventas, devoluciones y ajustes deben coincidir.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='inventario', role='admin')
+        categoria = Categoria.objects.create(nombre='Cat')
+        cls.proveedor = Proveedor.objects.create(nombre_empresa='Prov', ciudad='X')
+        cls.tarjeta = TarjetaBancaria.objects.create(nombre='Caja')
+        cls.productos = [
+            Producto.objects.create(
+                nombre=f'P{i}', categoria=categoria, proveedor=cls.proveedor, precio_compra=10,
+                porcentaje_ganancia=10, precio_final=11, codigo_busqueda=f'C{i}',
+            )
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def _crear_orden(self, estado, cantidad):
+        respuesta = self.client.post('/api/suppliers/ordenes/create/', {
+            'proveedor_id': self.proveedor.id,
+            'tarjeta_id': self.tarjeta.id,
+            'estado': estado,
+            'detalles': [
+                {'producto_id': p.id, 'nombre': p.nombre, 'precio_compra': '4.00', 'cantidad': cantidad}
+                for p in self.productos
+            ],
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        return respuesta.json()['id']
+
+    def assertSaldos(self, *esperados, productos=None):
+        for producto, esperado in zip(productos or self.productos, esperados):
+            saldo = SaldoInventario.objects.get(producto=producto).cantidad
+            movimientos = MovimientoInventario.objects.filter(producto=producto).aggregate(total=Sum('cantidad'))['total']
+            self.assertEqual((saldo, movimientos), (esperado, esperado), producto.nombre)
+            self.assertEqual(self.client.get(f'/api/inventory/{producto.id}/total/').status_code, 200)
+
+    def test_saldo_igual_a_la_suma_de_movimientos(self):
+        a, b = self.productos
+        orden_a = self._crear_orden('recibida', 10)
+        self.assertSaldos(10, 10)
+
+        orden_b = self._crear_orden('en_transito', 5)
+        self.assertSaldos(10, 10)
+        self.client.patch(f'/api/suppliers/ordenes/{orden_b}/update-estado/', {'estado': 'recibida'}, format='json')
+        self.assertSaldos(15, 15)
+
+        respuesta = self.client.put(f'/api/suppliers/ordenes/{orden_a}/update/', {'detalles': [
+            {'producto_id': p.id, 'nombre': p.nombre, 'precio_compra': '4.00', 'cantidad': 12}
+            for p in self.productos
+        ]}, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertSaldos(17, 17)
+
+        respuesta = self.client.post('/api/ventas/create/', {
+            'tarjeta_id': self.tarjeta.id,
+            'subtotal': '44.00',
+            'total': '44.00',
+            'items': [
+                {'id': a.id, 'quantity': 3, 'precio_final': '11.00'},
+                {'id': b.id, 'quantity': 1, 'precio_final': '11.00'},
+            ],
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        self.assertSaldos(14, 16)
+
+        # Una venta sin stock suficiente no deja movimientos
+        respuesta = self.client.post('/api/ventas/create/', {
+            'tarjeta_id': self.tarjeta.id,
+            'total': '11.00',
+            'items': [{'id': b.id, 'quantity': 1}, {'id': a.id, 'quantity': 99}],
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 400, respuesta.content)
+        self.assertSaldos(14, 16)
+
+        detalle = DetalleVenta.objects.get(producto=a)
+        respuesta = self.client.post('/api/devoluciones/create/', {
+            'venta_completa_id': detalle.venta_id,
+            'detalle_venta_id': detalle.id,
+            'codigo_venta': detalle.venta.codigo,
+            'producto_id': a.id,
+            'cantidad': 1,
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        self.assertSaldos(15, 16)
+
+        respuesta = self.client.post('/api/inventory/ajustes/create/', {'producto_id': b.id, 'cantidad': -2}, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        self.assertEqual(respuesta.json()['stock_disponible'], 14)
+        self.assertSaldos(15, 14)
+
+        self.client.delete(f'/api/suppliers/ordenes/{orden_b}/delete/')
+        self.assertSaldos(10, 9)
+
+        detalle = OrdenProveedorDetalle.objects.get(orden_proveedor_id=orden_a, producto=b)
+        self.client.put(f'/api/suppliers/detalles/{detalle.id}/update/', {'cantidad': 8}, format='json')
+        self.assertSaldos(10, 5)
 
-# Create your tests here.
+        # Línea nueva en una orden recibida, y luego eliminada
+        extra = Producto.objects.create(
+            nombre='Extra', categoria=a.categoria, proveedor=self.proveedor, precio_compra=10,
+            porcentaje_ganancia=10, precio_final=11, codigo_busqueda='EXTRA',
+        )
+        respuesta = self.client.post('/api/suppliers/detalles/create/', {
+            'orden_proveedor_id': orden_a, 'producto_id': extra.id, 'nombre': extra.nombre,
+            'precio_compra': '4.00', 'cantidad': 6,
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        self.assertSaldos(6, productos=[extra])
+        self.client.delete(f"/api/suppliers/detalles/{respuesta.json()['id']}/delete/")
+        self.assertSaldos(0, productos=[extra])
+        self.assertSaldos(10, 5)
@@ -0,0 +1,223 @@
+import math
+import re
+import unicodedata
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from productos.models import Producto, TrigramaProducto
+
+
+# ======================================================
+# Búsqueda de productos por trigramas
+# ======================================================
+# Cada producto se indexa en TrigramaProducto con los trigramas de su texto
+# normalizado (minúsculas, sin tildes ni signos). Las palabras se rellenan
+# con '#' ("cafe" → ##c, #ca, caf, afe, fe#), así una búsqueda de una o dos
+# letras ya encuentra las palabras que empiezan por ellas. La última
+# palabra de la búsqueda se toma como prefijo: se omite su trigrama final.
+#
+# Un producto califica si tiene al menos `minimo` de los n trigramas de la
+# búsqueda; entonces tiene por fuerza alguno de los n - minimo + 1 trigramas
+# menos frecuentes. La consulta parte solo de esos (listas cortas), cuenta
+# las coincidencias de cada candidato por el índice único (producto,
+# trigrama) y el orden final se decide en memoria sobre los mejores. La
+# frecuencia de cada trigrama se cachea: si está desactualizada la búsqueda
+# sigue siendo exacta, solo elige peor por dónde empezar. Los trigramas sin
+# productos no se cachean, para que un producto nuevo que los tenga se
+# encuentre de inmediato.
+
+# Campo → peso. Si un trigrama aparece en varios campos queda el peso mayor.
+PESOS_CAMPOS = (
+    ('codigo_busqueda', 4),
+    ('nombre', 3),
+    ('categoria', 1),
+    ('subcategoria', 1),
+    ('descripcion', 1),
+)
+
+CAMPOS_INDEXADOS = {'codigo_busqueda', 'nombre', 'descripcion', 'categoria', 'subcategoria', 'deleted_at'}
+
+# Fracción mínima de trigramas de la búsqueda que debe tener un producto
+# (tolera errores de digitación). Las búsquedas de 3 trigramas o menos los
+# exigen todos.
+COINCIDENCIA_MINIMA = 0.6
+
+CANDIDATOS_BUSQUEDA = 200
+
+MAX_RESULTADOS_BUSQUEDA = 50
+
+PRODUCTOS_POR_BLOQUE = 500
+
+SEGUNDOS_CACHE_FRECUENCIAS = 3600
+
+_NO_ALFANUMERICO = re.compile(r'[^a-z0-9]+')
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sin tildes (ñ → n) y con cualquier signo como separador. Retorna la lista de palabras."""
+    if not texto:
+        return []
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return _NO_ALFANUMERICO.sub(' ', texto).split()
+
+
+def trigramas_palabra(palabra, prefijo=False):
+    relleno = f'##{palabra}#'
+    trigramas = {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+    if prefijo:
+        trigramas.discard(relleno[-3:])
+    return trigramas
+
+
+def trigramas_busqueda(palabras):
+    """Trigramas de una búsqueda; la última palabra cuenta como prefijo."""
+    trigramas = set()
+    for i, palabra in enumerate(palabras):
+        trigramas |= trigramas_palabra(palabra, prefijo=i == len(palabras) - 1)
+    return trigramas
+
+
+def trigramas_producto(textos):
+    """
+    {trigrama: peso} para los textos de un producto, dados como
+    {campo: texto} con los campos de PESOS_CAMPOS.
+    """
+    pesos = {}
+    for campo, peso in PESOS_CAMPOS:
+        for palabra in normalizar_texto(textos.get(campo)):
+            for trigrama in trigramas_palabra(palabra):
+                if pesos.get(trigrama, 0) < peso:
+                    pesos[trigrama] = peso
+    return pesos
+
+
+def _textos_producto(producto):
+    return {
+        'codigo_busqueda': producto.codigo_busqueda,
+        'nombre': producto.nombre,
+        'categoria': producto.categoria.nombre if producto.categoria else None,
+        'subcategoria': producto.subcategoria.nombre if producto.subcategoria else None,
+        'descripcion': producto.descripcion,
+    }
+
+
+def reindexar_productos(producto_ids):
+    """
+    Reemplaza los trigramas de los productos indicados: un DELETE y un
+    INSERT masivo. Los productos eliminados lógicamente quedan sin trigramas.
+    """
+    producto_ids = set(producto_ids)
+    if not producto_ids:
+        return 0
+
+    productos = Producto.objects.select_related('categoria', 'subcategoria').filter(pk__in=producto_ids)
+    registros = [
+        TrigramaProducto(producto_id=producto.id, trigrama=trigrama, peso=peso)
+        for producto in productos
+        for trigrama, peso in trigramas_producto(_textos_producto(producto)).items()
+    ]
+
+    with transaction.atomic():
+        TrigramaProducto.objects.filter(producto_id__in=producto_ids).delete()
+        TrigramaProducto.objects.bulk_create(registros, batch_size=2000)
+
+    return len(registros)
+
+
+def reconstruir_indice_busqueda():
+    """Reindexa todos los productos en bloques. Retorna (productos, trigramas)."""
+    producto_ids = list(Producto.all_objects.order_by('id').values_list('id', flat=True))
+    total = 0
+    for i in range(0, len(producto_ids), PRODUCTOS_POR_BLOQUE):
+        total += reindexar_productos(producto_ids[i:i + PRODUCTOS_POR_BLOQUE])
+    return len(producto_ids), total
+
+
+def _get_frecuencias(trigramas):
+    """{trigrama: número de productos que lo tienen}, desde la caché o con una consulta para los que falten."""
+    llaves = {f'productos:busqueda:frecuencia:{t}': t for t in trigramas}
+    frecuencias = {llaves[llave]: n for llave, n in cache.get_many(llaves).items()}
+
+    faltantes = set(trigramas) - set(frecuencias)
+    if faltantes:
+        contadas = dict(
+            TrigramaProducto.objects
+            .filter(trigrama__in=faltantes)
+            .values('trigrama')
+            .annotate(n=Count('id'))
+            .order_by()
+            .values_list('trigrama', 'n')
+        )
+        cache.set_many(
+            {f'productos:busqueda:frecuencia:{t}': n for t, n in contadas.items()},
+            SEGUNDOS_CACHE_FRECUENCIAS
+        )
+        frecuencias.update({t: contadas.get(t, 0) for t in faltantes})
+
+    return frecuencias
+
+
+def _orden_texto(producto, palabras, frase):
+    """
+    Grupo de orden (menor es mejor): código exacto, código o nombre que
+    empiezan por la búsqueda, todas las palabras como prefijo de palabras del
+    nombre, y el resto.
+    """
+    codigo = ' '.join(normalizar_texto(producto.codigo_busqueda))
+    if codigo == frase:
+        return 0
+    nombre = normalizar_texto(producto.nombre)
+    if codigo.startswith(frase) or ' '.join(nombre).startswith(frase):
+        return 1
+    if all(any(n.startswith(p) for n in nombre) for p in palabras):
+        return 2
+    return 3
+
+
+def buscar_productos(texto, limite=20):
+    """
+    Productos que coinciden con `texto`, ordenados por relevancia. Dos
+    consultas (más la de frecuencias de trigramas no cacheados): candidatos
+    agrupados desde el índice de trigramas y los productos de esos candidatos.
+    """
+    palabras = normalizar_texto(texto)
+    if not palabras:
+        return []
+
+    trigramas = trigramas_busqueda(palabras)
+    minimo = len(trigramas) if len(trigramas) <= 3 else math.ceil(len(trigramas) * COINCIDENCIA_MINIMA)
+
+    frecuencias = _get_frecuencias(trigramas)
+    raros = sorted(trigramas, key=lambda t: (frecuencias[t], t))[:len(trigramas) - minimo + 1]
+
+    candidatos = {
+        fila['producto_id']: (fila['coincidencias'], fila['puntaje'])
+        for fila in (
+            TrigramaProducto.objects
+            .filter(
+                trigrama__in=trigramas,
+                producto_id__in=TrigramaProducto.objects.filter(trigrama__in=raros).values('producto_id'),
+            )
+            .values('producto_id')
+            .annotate(coincidencias=Count('id'), puntaje=Sum('peso'))
+            .filter(coincidencias__gte=minimo)
+            .order_by('-coincidencias', '-puntaje', 'producto_id')[:CANDIDATOS_BUSQUEDA]
+        )
+    }
+    if not candidatos:
+        return []
+
+    frase = ' '.join(palabras)
+    productos = Producto.objects.select_related('categoria').filter(pk__in=candidatos)
+    return sorted(
+        productos,
+        key=lambda p: (
+            _orden_texto(p, palabras, frase),
+            -candidatos[p.id][0],
+            -candidatos[p.id][1],
+            p.nombre.lower(),
+        )
+    )[:limite]
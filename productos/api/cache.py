@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.db import transaction
+
+
+# ======================================================
+# Caché en proceso para el escaneo de códigos de barras
+# ======================================================
+# LRU con vencimiento, por código de búsqueda. Vive en memoria de cada
+# proceso: las señales de productos y los movimientos de inventario
+# descartan las entradas del proceso que hizo el cambio; en los demás
+# procesos la entrada dura a lo sumo SEGUNDOS_CACHE_CODIGOS. La venta
+# siempre valida el stock real al reservarlo.
+#
+# Este módulo no importa inventario: lo usan registrar_movimientos y
+# reservar_stock sin crear importaciones circulares.
+
+CAPACIDAD_CACHE_CODIGOS = 2000
+
+SEGUNDOS_CACHE_CODIGOS = 30
+
+
+class CacheCodigos:
+    """LRU {codigo: datos del producto} con vencimiento y descarte por producto_id."""
+
+    def __init__(self, capacidad, segundos):
+        self.capacidad = capacidad
+        self.segundos = segundos
+        self._entradas = OrderedDict()   # codigo → (vence, datos)
+        self._codigos = {}               # producto_id → codigo
+        self._lock = threading.Lock()
+
+    def get(self, codigo):
+        with self._lock:
+            entrada = self._entradas.get(codigo)
+            if entrada is None:
+                return None
+            vence, datos = entrada
+            if vence < time.monotonic():
+                self._quitar(codigo)
+                return None
+            self._entradas.move_to_end(codigo)
+            return datos
+
+    def set(self, codigo, datos):
+        with self._lock:
+            anterior = self._codigos.get(datos['id'])
+            if anterior is not None and anterior != codigo:
+                self._quitar(anterior)
+            self._entradas[codigo] = (time.monotonic() + self.segundos, datos)
+            self._entradas.move_to_end(codigo)
+            self._codigos[datos['id']] = codigo
+            while len(self._entradas) > self.capacidad:
+                self._quitar(next(iter(self._entradas)))
+
+    def descartar_productos(self, producto_ids):
+        with self._lock:
+            for producto_id in producto_ids:
+                codigo = self._codigos.get(producto_id)
+                if codigo is not None:
+                    self._quitar(codigo)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._codigos.clear()
+
+    def _quitar(self, codigo):
+        _, datos = self._entradas.pop(codigo)
+        if self._codigos.get(datos['id']) == codigo:
+            del self._codigos[datos['id']]
+
+
+cache_codigos = CacheCodigos(CAPACIDAD_CACHE_CODIGOS, SEGUNDOS_CACHE_CODIGOS)
+
+
+def descartar_productos_cache_codigos(producto_ids):
+    """Descarta de la caché de códigos los productos indicados al confirmar la transacción en curso."""
+    producto_ids = set(producto_ids)
+    if producto_ids:
+        transaction.on_commit(lambda: cache_codigos.descartar_productos(producto_ids))
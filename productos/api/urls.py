@@ -4,8 +4,15 @@ from . import views
 urlpatterns = [
     path('create/',             views.create_product,    name='create_product'), 
     path('list/',               views.list_products,     name='list_products'), 
+    path('search/',             views.search_products,   name='search_products'),
+    path('by-code/<str:codigo_busqueda>/', views.get_product_by_code, name='get_product_by_code'),
     path('<int:pk>/',           views.get_product,       name='get_product'), 
     path('<int:pk>/update/',    views.update_product,    name='update_product'),
     path('<int:pk>/delete/',    views.delete_product,    name='delete_product'),
+
+    # === COSTOS DE COMPRA ===
+    path('<int:pk>/costo/',     views.get_product_costo,     name='get_product_costo'),
+    path('costos/',             views.list_product_costos,   name='list_product_costos'),
+    path('costos/repreciar/',   views.repreciar_productos,   name='repreciar_productos'),
 ]
 
@@ -8,12 +8,16 @@ from django.shortcuts import get_object_or_404
 from django.db import IntegrityError
 from django.db.models import Q
 from django.db import DatabaseError
+from django.utils import timezone
 from decimal import Decimal
 
 from user.api.permissions import RolePermission
 from productos.models import Producto
 from inventarioproducto.models import InventarioProducto
-from inventarioproducto.api.views import get_total_unidades_producto_call
+from inventarioproducto.api.utils import get_stock_producto, get_stock_productos, get_costos_productos
+from combos.api.cache import notificar_cambio_productos
+from productos.api.busqueda import buscar_productos, MAX_RESULTADOS_BUSQUEDA
+from productos.api.cache import cache_codigos, descartar_productos_cache_codigos
 from categoria.models import Categoria
 from subcategoria.models import SubCategoria
 from proveedores.models import Proveedor
@@ -21,6 +25,7 @@ from proveedores.models import Proveedor
 from core.utils import remove_thousand_separators
 
 PRODUCT_MANAGER_ROLES = ['admin']
+POS_ROLES = ['admin', 'vendedor']  # Consultas rápidas desde la caja
 
 
 # ======================================================
@@ -107,7 +112,7 @@ def create_product(request):
 @permission_classes([IsAuthenticated, RolePermission(PRODUCT_MANAGER_ROLES)])
 def list_products(request):
     try:
-        productos = Producto.objects.select_related('categoria', 'subcategoria', 'creado_por').all()
+        productos = Producto.objects.select_related('categoria', 'subcategoria', 'proveedor', 'creado_por').all()
         print("===== Productos encontrados =====", productos.query)
         search          = request.query_params.get('search')
         categoria_id    = request.query_params.get('categoria_id')
@@ -131,7 +136,10 @@ def list_products(request):
         paginator.page_size = 20
         paginator.max_page_size = 200
         page = paginator.paginate_queryset(productos, request)
-        
+
+        # Stock de toda la página en una sola consulta
+        stock = get_stock_productos(p.id for p in page)
+
         data = [{
             'id'                : p.id,
             'categoria'         : p.categoria.nombre if p.categoria else None,
@@ -148,7 +156,7 @@ def list_products(request):
             'genero'            : p.genero,
             'creado_por'        : p.creado_por.username if p.creado_por else None,
             'created_at'        : p.created_at,
-            'cantidad'          : get_total_unidades_producto_call(p.id)
+            'cantidad'          : stock[p.id]
         } for p in page]
 
         return paginator.get_paginated_response(data)
@@ -157,6 +165,80 @@ def list_products(request):
         return Response({"error": f"Error al listar los productos: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# ======================================================
+# Buscar Productos para el POS (GET /search/?q=)
+# ======================================================
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, RolePermission(POS_ROLES)])
+def search_products(request):
+    """
+    Búsqueda por texto sobre el índice de trigramas (código, nombre,
+    categoría, subcategoría y descripción), sin tildes y tolerante a
+    errores, ordenada por relevancia. Pensada para cada tecla del buscador
+    del POS: tres consultas (candidatos, productos y stock).
+    """
+    try:
+        texto = request.query_params.get('q', '').strip()
+        if not texto:
+            return Response({"error": "Debe indicar el texto a buscar en q."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limite = int(request.query_params.get('limit', 20))
+        except ValueError:
+            return Response({"error": "limit debe ser un número entero."}, status=status.HTTP_400_BAD_REQUEST)
+        limite = min(max(limite, 1), MAX_RESULTADOS_BUSQUEDA)
+
+        productos = buscar_productos(texto, limite)
+        stock = get_stock_productos(p.id for p in productos)
+
+        data = [{
+            'id'             : p.id,
+            'nombre'         : p.nombre,
+            'codigo_busqueda': p.codigo_busqueda,
+            'categoria'      : p.categoria.nombre if p.categoria else None,
+            'precio_final'   : p.precio_final,
+            'imagen_url'     : p.imagen.url if p.imagen else None,
+            'cantidad'       : stock[p.id],
+        } for p in productos]
+
+        return Response(data, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        return Response({"error": f"Error al buscar productos: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# ======================================================
+# Producto por Código de Barras (GET /by-code/<codigo>/)
+# ======================================================
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, RolePermission(POS_ROLES)])
+def get_product_by_code(request, codigo_busqueda):
+    """
+    Camino rápido del escáner: búsqueda exacta por el índice único de
+    codigo_busqueda con una respuesta mínima. Los escaneos repetidos se
+    sirven desde la caché en proceso (productos.api.cache) sin consultas.
+    """
+    try:
+        codigo = codigo_busqueda.strip()
+        data = cache_codigos.get(codigo)
+        if data is None:
+            data = (
+                Producto.objects
+                .filter(codigo_busqueda=codigo)
+                .values('id', 'nombre', 'precio_final')
+                .first()
+            )
+            if data is None:
+                return Response({"error": f"No existe un producto con el código '{codigo}'."}, status=status.HTTP_404_NOT_FOUND)
+            data['cantidad'] = get_stock_producto(data['id'])
+            cache_codigos.set(codigo, data)
+
+        return Response(data, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        return Response({"error": f"Error al buscar el producto por código: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 # ======================================================
 # Obtener Producto por ID (GET /<id>/)
 # ======================================================
@@ -178,7 +260,7 @@ def get_product(request, pk):
         "subcategoria_id"       : producto.subcategoria.id if producto.subcategoria else None,
         "unidad_medida"         : producto.unidad_medida,
         "genero"                : producto.genero,
-        "inventario"            : producto.inventario.cantidad_unidades if hasattr(producto, 'inventario') else 0,
+        "inventario"            : get_stock_productos([producto.id])[producto.id],
         "creado_por"            : producto.creado_por.username if producto.creado_por else None,
     }
     return Response(data, status=status.HTTP_200_OK)
@@ -244,7 +326,7 @@ def update_product(request, pk):
             "genero": producto.genero,
             "creado_por": producto.creado_por.username if producto.creado_por else None,
             "created_at": producto.created_at,
-            "cantidad": get_total_unidades_producto_call(producto.id),
+            "cantidad": get_stock_productos([producto.id])[producto.id],
         }
         return Response(data, status=status.HTTP_200_OK)
 
@@ -266,3 +348,143 @@ def delete_product(request, pk):
         return Response({"error": "Error de base de datos al eliminar el producto."}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({"error": f"Error al eliminar el producto: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# ======================================================
+# Costos de compra por producto
+# ======================================================
+BASES_COSTO = {
+    'ultimo': 'ultimo_costo',
+    'promedio': 'costo_promedio',
+}
+
+MAX_PRODUCTOS_COSTO = 200
+
+
+def serialize_costo(producto_id, costo):
+    """Serializa el costo de un producto (None si aún no tiene recepciones)."""
+    return {
+        'producto_id'         : producto_id,
+        'ultimo_costo'        : costo.ultimo_costo if costo else None,
+        'costo_promedio'      : costo.costo_promedio if costo else None,
+        'unidades_compradas'  : costo.unidades_compradas if costo else 0,
+        'ultimo_proveedor_id' : costo.ultimo_proveedor_id if costo else None,
+        'ultimo_proveedor'    : costo.ultimo_proveedor.nombre_empresa if costo and costo.ultimo_proveedor else None,
+        'fecha_ultima_compra' : costo.fecha_ultima_compra if costo else None,
+    }
+
+
+def _leer_producto_ids(valor):
+    """Convierte una lista (o texto separado por comas) de IDs en una lista de enteros."""
+    if isinstance(valor, str):
+        valor = [v for v in valor.split(',') if v.strip()]
+    return [int(v) for v in valor]
+
+
+# ======================================================
+# Costo de un Producto (GET /<id>/costo/)
+# ======================================================
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, RolePermission(PRODUCT_MANAGER_ROLES)])
+def get_product_costo(request, pk):
+    producto = get_object_or_404(Producto, pk=pk)
+    costo = get_costos_productos([producto.id]).get(producto.id)
+    data = serialize_costo(producto.id, costo)
+    data['precio_compra'] = producto.precio_compra
+    data['precio_final'] = producto.precio_final
+    return Response(data, status=status.HTTP_200_OK)
+
+
+# ======================================================
+# Costos de varios Productos (GET /costos/?producto_ids=1,2,3)
+# ======================================================
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, RolePermission(PRODUCT_MANAGER_ROLES)])
+def list_product_costos(request):
+    try:
+        producto_ids = _leer_producto_ids(request.query_params.get('producto_ids', ''))
+    except ValueError:
+        return Response({"error": "producto_ids debe ser una lista de enteros separados por coma."}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not producto_ids:
+        return Response({"error": "Debe indicar al menos un producto en producto_ids."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(producto_ids) > MAX_PRODUCTOS_COSTO:
+        return Response({"error": f"Se pueden consultar máximo {MAX_PRODUCTOS_COSTO} productos por solicitud."}, status=status.HTTP_400_BAD_REQUEST)
+
+    costos = get_costos_productos(producto_ids)
+    data = [serialize_costo(producto_id, costos.get(producto_id)) for producto_id in producto_ids]
+    return Response(data, status=status.HTTP_200_OK)
+
+
+# ======================================================
+# Actualizar precios desde el costo (POST /costos/repreciar/)
+# ======================================================
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, RolePermission(PRODUCT_MANAGER_ROLES)])
+def repreciar_productos(request):
+    """
+    Toma como precio_compra el costo registrado de cada producto y recalcula
+    su precio_final con calcular_precio_final (mismo porcentaje de ganancia).
+    Espera:
+    {
+        "producto_ids": [1, 2, 3],
+        "base": "ultimo"        # o "promedio"
+    }
+    Los productos sin recepciones se omiten y se informan en "sin_costo".
+    """
+    try:
+        base = request.data.get('base', 'ultimo')
+        if base not in BASES_COSTO:
+            return Response({"error": f"Base inválida. Use: {', '.join(BASES_COSTO)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            producto_ids = _leer_producto_ids(request.data.get('producto_ids') or [])
+        except (TypeError, ValueError):
+            return Response({"error": "producto_ids debe ser una lista de enteros."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not producto_ids:
+            return Response({"error": "Debe indicar al menos un producto en producto_ids."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(producto_ids) > MAX_PRODUCTOS_COSTO:
+            return Response({"error": f"Se pueden repreciar máximo {MAX_PRODUCTOS_COSTO} productos por solicitud."}, status=status.HTTP_400_BAD_REQUEST)
+
+        costos = get_costos_productos(producto_ids)
+        productos = list(Producto.objects.filter(pk__in=producto_ids))
+
+        ahora = timezone.now()
+        actualizados = []
+        sin_costo = []
+        for producto in productos:
+            costo = costos.get(producto.id)
+            valor = getattr(costo, BASES_COSTO[base]) if costo else None
+            if valor is None:
+                sin_costo.append(producto.id)
+                continue
+            producto.precio_compra = valor
+            producto.calcular_precio_final()
+            producto.updated_at = ahora
+            actualizados.append(producto)
+
+        if actualizados:
+            Producto.objects.bulk_update(actualizados, ['precio_compra', 'precio_final', 'updated_at'])
+            # bulk_update no dispara señales: actualizar precios en las cachés de combos
+            notificar_cambio_productos([p.id for p in actualizados], cambio_stock=False)
+            descartar_productos_cache_codigos([p.id for p in actualizados])
+
+        data = {
+            "base": base,
+            "actualizados": [{
+                "id": p.id,
+                "nombre": p.nombre,
+                "precio_compra": p.precio_compra,
+                "porcentaje_ganancia": p.porcentaje_ganancia,
+                "precio_final": p.precio_final,
+            } for p in actualizados],
+            "sin_costo": sin_costo,
+            "no_encontrados": sorted(set(producto_ids) - {p.id for p in productos}),
+        }
+        return Response(data, status=status.HTTP_200_OK)
+
+    except DatabaseError as e:
+        return Response({"error": f"Error de base de datos al repreciar: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    except Exception as e:
+        return Response({"error": f"Error inesperado al repreciar: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from productos.api.busqueda import reconstruir_indice_busqueda
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye el índice de trigramas de la búsqueda de productos (/api/products/search/) "
+        "desde la tabla de productos."
+    )
+
+    def handle(self, *args, **options):
+        productos, trigramas = reconstruir_indice_busqueda()
+        self.stdout.write(self.style.SUCCESS(
+            f"Índice de búsqueda reconstruido: {productos} producto(s), {trigramas} trigrama(s)."
+        ))
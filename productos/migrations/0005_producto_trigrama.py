@@ -0,0 +1,72 @@
+# Generated by Django 4.2 on 2026-10-16 23:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def indexar_productos(apps, schema_editor):
+    """Llena el índice de búsqueda con los productos activos existentes."""
+    from productos.api.busqueda import trigramas_producto
+
+    Producto = apps.get_model('productos', 'Producto')
+    TrigramaProducto = apps.get_model('productos', 'TrigramaProducto')
+
+    productos = (
+        Producto.objects
+        .filter(deleted_at__isnull=True)
+        .select_related('categoria', 'subcategoria')
+        .order_by('id')
+    )
+    registros = []
+    for producto in productos.iterator(chunk_size=500):
+        textos = {
+            'codigo_busqueda': producto.codigo_busqueda,
+            'nombre': producto.nombre,
+            'categoria': producto.categoria.nombre if producto.categoria else None,
+            'subcategoria': producto.subcategoria.nombre if producto.subcategoria else None,
+            'descripcion': producto.descripcion,
+        }
+        registros.extend(
+            TrigramaProducto(producto_id=producto.id, trigrama=trigrama, peso=peso)
+            for trigrama, peso in trigramas_producto(textos).items()
+        )
+        if len(registros) >= 5000:
+            TrigramaProducto.objects.bulk_create(registros)
+            registros = []
+    TrigramaProducto.objects.bulk_create(registros)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0004_producto_proveedor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrigramaProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Eliminación Lógica')),
+                ('trigrama', models.CharField(max_length=3, verbose_name='Trigrama')),
+                ('peso', models.PositiveSmallIntegerField(default=1, verbose_name='Peso')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigramas', to='productos.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Trigrama de Producto',
+                'verbose_name_plural': 'Trigramas de Productos',
+                'db_table': 'producto_trigrama',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trigramaproducto',
+            index=models.Index(fields=['trigrama', 'producto', 'peso'], name='prod_trigrama_busq_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='trigramaproducto',
+            unique_together={('producto', 'trigrama')},
+        ),
+        migrations.RunPython(indexar_productos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 00:35
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0005_producto_trigrama'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='trigramaproducto',
+            name='created_at',
+        ),
+        migrations.RemoveField(
+            model_name='trigramaproducto',
+            name='deleted_at',
+        ),
+        migrations.RemoveField(
+            model_name='trigramaproducto',
+            name='updated_at',
+        ),
+    ]
@@ -74,3 +74,37 @@ class Producto(BaseModel):
         precio = Decimal(self.precio_compra)
         ganancia = Decimal(self.porcentaje_ganancia)
         self.precio_final = precio + (precio * ganancia / Decimal(100))
+
+
+class TrigramaProducto(models.Model):
+    """
+    Índice invertido de búsqueda: un trigrama del texto normalizado de un
+    producto (código, nombre, categoría, subcategoría y descripción) con el
+    peso del campo más importante donde aparece. Lo mantiene
+    productos.api.busqueda; no se edita a mano.
+
+    No hereda de BaseModel: los trigramas se borran y se vuelven a crear, y
+    sin deleted_at las consultas no filtran por una columna que dejaría de
+    cubrir el índice prod_trigrama_busq_idx.
+    """
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name='trigramas',
+        verbose_name="Producto"
+    )
+    trigrama = models.CharField(max_length=3, verbose_name="Trigrama")
+    peso     = models.PositiveSmallIntegerField(default=1, verbose_name="Peso")
+
+    class Meta:
+        verbose_name = "Trigrama de Producto"
+        verbose_name_plural = "Trigramas de Productos"
+        db_table = "producto_trigrama"
+        unique_together = ('producto', 'trigrama')
+        indexes = [
+            # Cubre la búsqueda: trigrama → (producto, peso) sin leer la tabla
+            models.Index(fields=['trigrama', 'producto', 'peso'], name='prod_trigrama_busq_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.trigrama} → {self.producto_id}"
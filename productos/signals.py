@@ -0,0 +1,60 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from productos.models import Producto
+from categoria.models import Categoria
+from subcategoria.models import SubCategoria
+from productos.api.busqueda import reindexar_productos, CAMPOS_INDEXADOS
+from productos.api.cache import descartar_productos_cache_codigos
+
+
+# Índice de búsqueda: se reindexa el producto cuando cambia un campo
+# indexado (la eliminación lógica pasa por save con update_fields). Borrar
+# el producto de verdad borra sus trigramas en cascada.
+@receiver(post_save, sender=Producto)
+def reindexar_producto(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not CAMPOS_INDEXADOS & set(update_fields):
+        return
+    reindexar_productos([instance.pk])
+
+
+# Caché de escaneo por código: cualquier cambio del producto la descarta
+@receiver([post_save, post_delete], sender=Producto)
+def descartar_producto_cache_codigos(sender, instance, **kwargs):
+    descartar_productos_cache_codigos([instance.pk])
+
+
+# Renombrar una categoría o subcategoría cambia el texto de sus productos.
+# Se guarda el nombre con que se cargó la instancia para reindexar solo si
+# cambió, y la reindexación corre al confirmar la transacción: no alarga la
+# del guardado ni se hace si esta se revierte.
+@receiver(post_init, sender=Categoria)
+@receiver(post_init, sender=SubCategoria)
+def guardar_nombre_indexado(sender, instance, **kwargs):
+    instance._nombre_indexado = instance.__dict__.get('nombre')
+
+
+def _nombre_cambio(instance, created, update_fields):
+    if created or (update_fields is not None and 'nombre' not in update_fields):
+        return False
+    if instance.nombre == instance._nombre_indexado:
+        return False
+    instance._nombre_indexado = instance.nombre
+    return True
+
+
+@receiver(post_save, sender=Categoria)
+def reindexar_productos_categoria(sender, instance, created, update_fields=None, **kwargs):
+    if _nombre_cambio(instance, created, update_fields):
+        transaction.on_commit(lambda: reindexar_productos(
+            Producto.objects.filter(categoria_id=instance.pk).values_list('id', flat=True)
+        ))
+
+
+@receiver(post_save, sender=SubCategoria)
+def reindexar_productos_subcategoria(sender, instance, created, update_fields=None, **kwargs):
+    if _nombre_cambio(instance, created, update_fields):
+        transaction.on_commit(lambda: reindexar_productos(
+            Producto.objects.filter(subcategoria_id=instance.pk).values_list('id', flat=True)
+        ))
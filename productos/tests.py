@@ -1,3 +1,184 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from categoria.models import Categoria
+from inventarioproducto.api.utils import reservar_stock
+from inventarioproducto.models import SaldoInventario
+from productos.api.busqueda import buscar_productos
+from productos.api.cache import CacheCodigos, cache_codigos
+from productos.models import Producto
+from proveedores.models import Proveedor
+from subcategoria.models import SubCategoria
+from tarjetabancaria.models import TarjetaBancaria
+from user.models import User
+
+
+class BusquedaProductosTests(TestCase):
+    """
+    Búsqueda por trigramas: orden por relevancia, tolerancia a errores y
+    reindexación cuando cambian los textos de los productos.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.proveedor = Proveedor.objects.create(nombre_empresa='Prov', ciudad='X')
+        cls.categoria = Categoria.objects.create(nombre='Desayuno')
+        cls.subcategoria = SubCategoria.objects.create(nombre='Granos', categoria=cls.categoria)
+
+        def crear(nombre, codigo, **extra):
+            return Producto.objects.create(
+                nombre=nombre, categoria=cls.categoria, proveedor=cls.proveedor, precio_compra=10,
+                porcentaje_ganancia=10, precio_final=11, codigo_busqueda=codigo, **extra
+            )
+
+        cls.cafe_molido = crear('Café molido', 'CM-01', subcategoria=cls.subcategoria)
+        cls.cafetera = crear('Cafetera italiana', 'CAFE')
+        cls.azucar = crear('Azúcar para café', 'AZ-01')
+        cls.te = crear('Té verde', 'TE-01')
+
+    def _nombres(self, texto):
+        return [p.nombre for p in buscar_productos(texto)]
+
+    def test_orden_por_relevancia(self):
+        # Código exacto, luego nombre que empieza por la búsqueda, luego palabra del nombre
+        self.assertEqual(self._nombres('cafe'), ['Cafetera italiana', 'Café molido', 'Azúcar para café'])
+        self.assertEqual(self._nombres('molido caf'), ['Café molido'])
+
+    def test_tolera_errores_de_digitacion(self):
+        self.assertEqual(self._nombres('cafetrea italiana')[0], 'Cafetera italiana')
+        self.assertEqual(self._nombres('xyz'), [])
+
+    def test_productos_eliminados_no_aparecen(self):
+        self.te.delete()
+        self.assertEqual(self._nombres('verde'), [])
+
+    def test_consultas_del_indice_no_filtran_eliminacion_logica(self):
+        with CaptureQueriesContext(connection) as consultas:
+            buscar_productos('cafe')
+        sql_indice = [q['sql'] for q in consultas.captured_queries if 'producto_trigrama' in q['sql']]
+        self.assertTrue(sql_indice)
+        self.assertFalse([sql for sql in sql_indice if '"producto_trigrama"."deleted_at"' in sql])
+
+    def test_renombrar_categoria_reindexa_al_confirmar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.categoria.nombre = 'Despensa'
+            self.categoria.save()
+            self.assertEqual(self._nombres('despensa'), [])
+        self.assertEqual(len(self._nombres('despensa')), 4)
+        self.assertEqual(self._nombres('desayuno'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.subcategoria.nombre = 'Molidos'
+            self.subcategoria.save()
+        self.assertEqual(self._nombres('molidos'), ['Café molido'])
+
+    def test_guardar_categoria_sin_cambiar_nombre_no_reindexa(self):
+        categoria = Categoria.objects.get(pk=self.categoria.pk)
+        with CaptureQueriesContext(connection) as consultas:
+            with self.captureOnCommitCallbacks(execute=True):
+                categoria.save()
+                categoria.delete()
+        self.assertFalse([q['sql'] for q in consultas.captured_queries if 'producto_trigrama' in q['sql']])
+
+
+class CacheCodigosTests(TestCase):
+    """
+    Escaneo por código: los escaneos repetidos salen de la caché en proceso
+    y cualquier cambio del producto o de su stock la descarta al confirmar.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='cajero', role='admin')
+        categoria = Categoria.objects.create(nombre='Cat')
+        cls.proveedor = Proveedor.objects.create(nombre_empresa='Prov', ciudad='X')
+        cls.tarjeta = TarjetaBancaria.objects.create(nombre='Caja')
+        cls.producto = Producto.objects.create(
+            nombre='Leche', categoria=categoria, proveedor=cls.proveedor, precio_compra=10,
+            porcentaje_ganancia=10, precio_final=11, codigo_busqueda='7701',
+        )
+        SaldoInventario.objects.update_or_create(producto=cls.producto, defaults={'cantidad': 8})
+
+    def setUp(self):
+        cache_codigos.limpiar()
+        self.addCleanup(cache_codigos.limpiar)
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def _escanear(self, codigo='7701'):
+        return self.client.get(f'/api/products/by-code/{codigo}/')
+
+    def _confirmar(self, metodo, url, data=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = getattr(self.client, metodo)(url, data, format='json')
+        self.assertLess(respuesta.status_code, 300, respuesta.content)
+        return respuesta
+
+    def test_escaneo_repetido_sin_consultas(self):
+        self.assertEqual(self._escanear().json()['cantidad'], 8)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._escanear().json()['cantidad'], 8)
+        self.assertEqual(self._escanear('0000').status_code, 404)
+
+    def test_cambios_de_stock_descartan_la_entrada(self):
+        self._escanear()
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                reservar_stock({self.producto.id: 3}, referencia='TEST')
+        self.assertEqual(self._escanear().json()['cantidad'], 5)
+
+        self._confirmar('post', '/api/inventory/ajustes/create/', {'producto_id': self.producto.id, 'cantidad': 4})
+        self.assertEqual(self._escanear().json()['cantidad'], 9)
+
+        self._confirmar('post', '/api/suppliers/ordenes/create/', {
+            'proveedor_id': self.proveedor.id,
+            'tarjeta_id': self.tarjeta.id,
+            'estado': 'recibida',
+            'detalles': [{'producto_id': self.producto.id, 'nombre': 'Leche', 'precio_compra': '20.00', 'cantidad': 1}],
+        })
+        self.assertEqual(self._escanear().json()['cantidad'], 10)
+
+        # Repreciar usa bulk_update, sin señales
+        self._confirmar('post', '/api/products/costos/repreciar/', {'producto_ids': [self.producto.id]})
+        self.assertEqual(Decimal(str(self._escanear().json()['precio_final'])), Decimal('22.00'))
+
+    def test_editar_o_eliminar_el_producto_descarta_la_entrada(self):
+        self._escanear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto.codigo_busqueda = '7702'
+            self.producto.save()
+        self.assertEqual(self._escanear().status_code, 404)
+        self.assertEqual(self._escanear('7702').json()['id'], self.producto.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto.delete()
+        self.assertEqual(self._escanear('7702').status_code, 404)
+
+
+class CacheCodigosLRUTests(SimpleTestCase):
+    """Capacidad, vencimiento y descarte por producto de CacheCodigos."""
+
+    def test_descarta_la_entrada_menos_usada(self):
+        cache = CacheCodigos(capacidad=2, segundos=60)
+        cache.set('A', {'id': 1})
+        cache.set('B', {'id': 2})
+        cache.get('A')
+        cache.set('C', {'id': 3})
+        self.assertIsNone(cache.get('B'))
+        self.assertEqual([cache.get('A'), cache.get('C')], [{'id': 1}, {'id': 3}])
+
+    def test_vencimiento_y_descarte_por_producto(self):
+        vencida = CacheCodigos(capacidad=10, segundos=-1)
+        vencida.set('A', {'id': 1})
+        self.assertIsNone(vencida.get('A'))
+
+        cache = CacheCodigos(capacidad=10, segundos=60)
+        cache.set('A', {'id': 1})
+        cache.set('A2', {'id': 1})   # el producto cambió de código
+        self.assertIsNone(cache.get('A'))
+        cache.descartar_productos([1])
+        self.assertIsNone(cache.get('A2'))
@@ -0,0 +1,196 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Q, Sum, Count
+from django.utils import timezone
+
+from proveedores.models import Proveedor, OrdenProveedor, HistorialEstadoOrden
+from ventas.api.utils import rango_dia_local
+
+
+# ======================================================
+# Historial de estados de órdenes y analítica sobre él
+# ======================================================
+# Cada cambio de estado (creación, edición, cambio individual o masivo)
+# inserta una fila en HistorialEstadoOrden. Los reportes de tiempos de
+# entrega y valor en tránsito leen esa tabla, por sus índices de
+# (estado, fecha) y (proveedor, estado, fecha); el de valor en tránsito
+# además descuenta las órdenes eliminadas mientras estaban en tránsito.
+
+PERCENTILES_ENTREGA = (50, 90, 95)
+
+SEGUNDOS_POR_DIA = 86400
+
+
+def registrar_cambios_estado(cambios, usuario=None):
+    """
+    Inserta en el historial un cambio por cada (orden, estado_anterior) de `cambios`.
+    El estado nuevo, el total y la fecha se toman de la orden ya actualizada
+    (updated_at). estado_anterior es None cuando la orden se acaba de crear.
+
+    valor_transito guarda cuánto cambia el valor en tránsito: el total de la
+    orden al entrar a 'en_transito' y, al salir, el total de esa última entrada
+    en negativo (se lee en una consulta para todas las órdenes que salen).
+    Un solo INSERT para todos.
+    """
+    salen = [orden.id for orden, estado_anterior in cambios
+             if estado_anterior == 'en_transito' and orden.estado != 'en_transito']
+    entradas = dict(
+        HistorialEstadoOrden.objects
+        .filter(orden_id__in=salen, estado_nuevo='en_transito')
+        .order_by('orden_id', 'id')
+        .values_list('orden_id', 'total')
+    ) if salen else {}
+
+    registros = []
+    for orden, estado_anterior in cambios:
+        fecha = orden.updated_at or timezone.now()
+        if orden.estado == 'en_transito' and estado_anterior != 'en_transito':
+            valor_transito = orden.total
+        elif estado_anterior == 'en_transito' and orden.estado != 'en_transito':
+            valor_transito = -entradas.get(orden.id, Decimal('0.00'))
+        else:
+            valor_transito = Decimal('0.00')
+        registros.append(HistorialEstadoOrden(
+            orden                = orden,
+            proveedor_id         = orden.proveedor_id,
+            estado_anterior      = estado_anterior,
+            estado_nuevo         = orden.estado,
+            fecha                = fecha,
+            segundos_desde_orden = max(int((fecha - orden.fecha_orden).total_seconds()), 0),
+            total                = orden.total,
+            valor_transito       = valor_transito,
+            usuario              = usuario,
+        ))
+    return HistorialEstadoOrden.objects.bulk_create(registros)
+
+
+def _percentil(valores, p):
+    """Percentil p (0-100) de una lista ordenada, con interpolación lineal."""
+    if not valores:
+        return None
+    posicion = (len(valores) - 1) * p / 100
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(valores) - 1)
+    return valores[inferior] + (valores[superior] - valores[inferior]) * (posicion - inferior)
+
+
+def _en_dias(segundos):
+    return round(segundos / SEGUNDOS_POR_DIA, 2) if segundos is not None else None
+
+
+def get_tiempos_entrega(fecha_inicio, fecha_fin, proveedor_id=None):
+    """
+    Tiempo de entrega (creación → 'recibida') por proveedor, de las órdenes
+    recibidas entre fecha_inicio y fecha_fin (días locales, ambos incluidos).
+
+    Si una orden se recibió más de una vez en el rango (se revirtió y se volvió
+    a recibir) cuenta solo la primera recepción. Retorna una lista, ordenada por
+    nombre de proveedor, con número de órdenes, promedio, mínimo, máximo y
+    percentiles 50/90/95, en días.
+    """
+    inicio, fin = rango_dia_local(fecha_inicio, fecha_fin)
+    recepciones = HistorialEstadoOrden.objects.filter(estado_nuevo='recibida', fecha__range=(inicio, fin))
+    if proveedor_id:
+        recepciones = recepciones.filter(proveedor_id=proveedor_id)
+
+    vistas = set()
+    segundos = defaultdict(list)
+    for orden_id, prov_id, valor in (
+        recepciones.order_by('fecha', 'id').values_list('orden_id', 'proveedor_id', 'segundos_desde_orden')
+    ):
+        if orden_id in vistas:
+            continue
+        vistas.add(orden_id)
+        segundos[prov_id].append(valor)
+
+    nombres = dict(Proveedor.all_objects.filter(pk__in=segundos).values_list('id', 'nombre_empresa'))
+
+    resultado = []
+    for prov_id, valores in segundos.items():
+        valores.sort()
+        fila = {
+            "proveedor_id": prov_id,
+            "proveedor": nombres.get(prov_id),
+            "ordenes_recibidas": len(valores),
+            "promedio_dias": _en_dias(sum(valores) / len(valores)),
+            "minimo_dias": _en_dias(valores[0]),
+            "maximo_dias": _en_dias(valores[-1]),
+        }
+        for p in PERCENTILES_ENTREGA:
+            fila[f"p{p}_dias"] = _en_dias(_percentil(valores, p))
+        resultado.append(fila)
+
+    return sorted(resultado, key=lambda f: ((f["proveedor"] or "").lower(), f["proveedor_id"]))
+
+
+def get_valor_en_transito(fecha_inicio, fecha_fin):
+    """
+    Valor (suma de totales) y número de órdenes en 'en_transito' al cierre de
+    cada día local entre fecha_inicio y fecha_fin.
+
+    Cada cambio del historial guarda en valor_transito cuánto mueve el valor:
+    la entrada suma el total de la orden y la salida resta ese mismo total de
+    entrada (no el vigente al salir), así editar una orden en tránsito no deja
+    saldo pendiente. Eliminar una orden en tránsito cuenta como salida en la
+    fecha de eliminación.
+
+    El saldo al inicio del rango es un solo SUM sobre el historial anterior;
+    dentro del rango solo se leen los cambios que entran o salen de tránsito,
+    más una consulta agrupada de las órdenes eliminadas en tránsito.
+    """
+    inicio, fin = rango_dia_local(fecha_inicio, fecha_fin)
+    entra = Q(estado_nuevo='en_transito')
+    sale = Q(estado_anterior='en_transito')
+    historial = HistorialEstadoOrden.objects.filter(entra | sale)
+
+    previo = historial.filter(fecha__lt=inicio).aggregate(
+        valor=Sum('valor_transito'),
+        ordenes_entra=Count('id', filter=entra),
+        ordenes_sale=Count('id', filter=sale),
+    )
+    valor = previo['valor'] or Decimal('0.00')
+    ordenes = previo['ordenes_entra'] - previo['ordenes_sale']
+
+    movimientos = defaultdict(lambda: [Decimal('0.00'), 0])
+    for fecha, estado_nuevo, valor_transito in (
+        historial
+        .filter(fecha__range=(inicio, fin))
+        .values_list('fecha', 'estado_nuevo', 'valor_transito')
+    ):
+        dia = timezone.localdate(fecha)
+        movimientos[dia][0] += valor_transito
+        movimientos[dia][1] += 1 if estado_nuevo == 'en_transito' else -1
+
+    # Órdenes eliminadas mientras estaban en tránsito (las que llegaron a
+    # registrarse como entrada): lo que aún aportan es la suma de su historial
+    for eliminada, pendiente in (
+        OrdenProveedor.all_objects
+        .filter(estado='en_transito', deleted_at__lte=fin)
+        .values('id', 'deleted_at')
+        .annotate(
+            pendiente=Sum('historial_estados__valor_transito'),
+            entradas=Count('historial_estados', filter=Q(historial_estados__estado_nuevo='en_transito')),
+        )
+        .filter(entradas__gt=0)
+        .values_list('deleted_at', 'pendiente')
+    ):
+        if eliminada < inicio:
+            valor -= pendiente
+            ordenes -= 1
+        else:
+            dia = timezone.localdate(eliminada)
+            movimientos[dia][0] -= pendiente
+            movimientos[dia][1] -= 1
+
+    dias = []
+    dia = fecha_inicio
+    while dia <= fecha_fin:
+        delta_valor, delta_ordenes = movimientos.get(dia, (Decimal('0.00'), 0))
+        valor += delta_valor
+        ordenes += delta_ordenes
+        dias.append({"fecha": dia, "valor_en_transito": valor, "ordenes_en_transito": ordenes})
+        dia += timedelta(days=1)
+
+    return dias
@@ -0,0 +1,438 @@
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, connections, transaction
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.enums import TA_CENTER
+
+# Este módulo no importa modelos al cargarse: los procesos del pool de PDFs
+# (spawn) lo importan antes de tener Django configurado.
+
+logger = logging.getLogger(__name__)
+
+
+# ========================================
+# Estilos (se construyen una vez por proceso)
+# ========================================
+_styles = getSampleStyleSheet()
+
+TITULO_STYLE = ParagraphStyle(
+    'TituloPersonalizado',
+    parent=_styles['Heading1'],
+    fontSize=24,
+    textColor=colors.HexColor('#F7C548'),
+    spaceAfter=30,
+    alignment=TA_CENTER,
+    fontName='Helvetica-Bold'
+)
+
+SUBTITULO_STYLE = ParagraphStyle(
+    'SubtituloPersonalizado',
+    parent=_styles['Heading2'],
+    fontSize=14,
+    textColor=colors.HexColor('#333333'),
+    spaceAfter=12,
+    fontName='Helvetica-Bold'
+)
+
+NORMAL_STYLE = ParagraphStyle(
+    'NormalPersonalizado',
+    parent=_styles['Normal'],
+    fontSize=10,
+    textColor=colors.HexColor('#333333'),
+)
+
+PIE_STYLE = _styles['Normal']
+
+TABLA_INFO_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F7C548')),
+    ('BACKGROUND', (2, 0), (2, -1), colors.HexColor('#F7C548')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+])
+
+TABLA_PROVEEDOR_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#FFF7E6')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+])
+
+TABLA_PRODUCTOS_STYLE = TableStyle([
+    # Encabezado
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#F7C548')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 11),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+    ('TOPPADDING', (0, 0), (-1, 0), 10),
+
+    # Cuerpo
+    ('TEXTCOLOR', (0, 1), (-1, -2), colors.black),
+    ('ALIGN', (0, 1), (0, -1), 'CENTER'),  # Columna #
+    ('ALIGN', (2, 1), (2, -1), 'RIGHT'),   # Precio
+    ('ALIGN', (3, 1), (3, -1), 'CENTER'),  # Cantidad
+    ('ALIGN', (4, 1), (4, -1), 'RIGHT'),   # Subtotal
+    ('FONTNAME', (0, 1), (-1, -2), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -2), 9),
+    ('BOTTOMPADDING', (0, 1), (-1, -2), 6),
+    ('TOPPADDING', (0, 1), (-1, -2), 6),
+
+    # Fila de total
+    ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#FFF7E6')),
+    ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#155724')),
+    ('ALIGN', (3, -1), (3, -1), 'RIGHT'),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, -1), (-1, -1), 12),
+    ('BOTTOMPADDING', (0, -1), (-1, -1), 10),
+    ('TOPPADDING', (0, -1), (-1, -1), 10),
+
+    # Bordes
+    ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ('LINEBELOW', (0, 0), (-1, 0), 2, colors.HexColor('#F7C548')),
+])
+
+ESTADO_PDF_MAP = {
+    'pendiente': 'PENDIENTE',
+    'confirmada': 'CONFIRMADA',
+    'en_transito': 'EN TRÁNSITO',
+    'recibida': 'ENTREGADO',
+    'cancelada': 'CANCELADA',
+}
+
+
+# ========================================
+# Renderizado
+# ========================================
+def datos_orden_pdf(orden):
+    """
+    Copia en un dict simple (serializable con pickle) todo lo que el PDF necesita
+    de la orden. Espera la orden con proveedor, creado_por y detalles precargados.
+    """
+    return {
+        "id": orden.id,
+        "numero_orden": orden.numero_orden,
+        "estado": orden.estado,
+        "fecha": orden.fecha_orden.strftime('%d/%m/%Y %H:%M'),
+        "creado_por": orden.creado_por.username if orden.creado_por else 'N/A',
+        "total": orden.total,
+        "notas": orden.notas or "",
+        "proveedor": {
+            "nombre_empresa": orden.proveedor.nombre_empresa,
+            "ciudad": orden.proveedor.ciudad,
+            "descripcion": orden.proveedor.descripcion,
+            "email": orden.proveedor.email,
+            "telefono": orden.proveedor.telefono,
+        },
+        "detalles": [
+            (d.nombre, d.precio_compra, d.cantidad, d.subtotal)
+            for d in orden.detalles.all()
+        ],
+    }
+
+
+def renderizar_orden_pdf(datos):
+    """Genera el PDF de una orden a partir de datos_orden_pdf() y retorna los bytes."""
+    buffer = io.BytesIO()
+
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        rightMargin=40,
+        leftMargin=40,
+        topMargin=60,
+        bottomMargin=40,
+    )
+
+    elementos = []
+
+    # ===== ENCABEZADO =====
+    elementos.append(Paragraph("ORDEN DE COMPRA", TITULO_STYLE))
+    elementos.append(Spacer(1, 20))
+
+    # ===== INFORMACIÓN DE LA ORDEN =====
+    info_orden = [
+        ['Número de Orden:', datos["numero_orden"], 'Estado:', ESTADO_PDF_MAP.get(datos["estado"], datos["estado"])],
+        ['Fecha:', datos["fecha"], 'Creado por:', datos["creado_por"]],
+    ]
+    tabla_info = Table(info_orden, colWidths=[2*inch, 2*inch, 1.5*inch, 1.5*inch])
+    tabla_info.setStyle(TABLA_INFO_STYLE)
+    elementos.append(tabla_info)
+    elementos.append(Spacer(1, 20))
+
+    # ===== INFORMACIÓN DEL PROVEEDOR =====
+    elementos.append(Paragraph("INFORMACIÓN DEL PROVEEDOR", SUBTITULO_STYLE))
+
+    proveedor = datos["proveedor"]
+    info_proveedor = [
+        ['Proveedor:', proveedor["nombre_empresa"]],
+        ['Ciudad:', proveedor["ciudad"] or 'N/A'],
+        ['Descripción:', proveedor["descripcion"] or 'N/A'],
+    ]
+    if proveedor["email"]:
+        info_proveedor.append(['Email:', proveedor["email"]])
+    if proveedor["telefono"]:
+        info_proveedor.append(['Teléfono:', proveedor["telefono"]])
+
+    tabla_proveedor = Table(info_proveedor, colWidths=[2*inch, 5*inch])
+    tabla_proveedor.setStyle(TABLA_PROVEEDOR_STYLE)
+    elementos.append(tabla_proveedor)
+    elementos.append(Spacer(1, 20))
+
+    # ===== DETALLE DE PRODUCTOS =====
+    elementos.append(Paragraph("DETALLE DE PRODUCTOS", SUBTITULO_STYLE))
+
+    datos_productos = [
+        ['#', 'Producto', 'Precio Unit.', 'Cantidad', 'Subtotal']
+    ]
+    for idx, (nombre, precio_compra, cantidad, subtotal) in enumerate(datos["detalles"], 1):
+        datos_productos.append([
+            str(idx),
+            nombre,
+            f"${precio_compra:,.2f}",
+            str(cantidad),
+            f"${subtotal:,.2f}"
+        ])
+    datos_productos.append(['', '', '', 'TOTAL:', f"${datos['total']:,.2f}"])
+
+    tabla_productos = Table(datos_productos, colWidths=[0.5*inch, 3*inch, 1.3*inch, 1*inch, 1.5*inch])
+    tabla_productos.setStyle(TABLA_PRODUCTOS_STYLE)
+    elementos.append(tabla_productos)
+    elementos.append(Spacer(1, 20))
+
+    # ===== NOTAS =====
+    if datos["notas"]:
+        elementos.append(Paragraph("NOTAS / OBSERVACIONES", SUBTITULO_STYLE))
+        elementos.append(Paragraph(datos["notas"], NORMAL_STYLE))
+        elementos.append(Spacer(1, 20))
+
+    # ===== PIE DE PÁGINA =====
+    elementos.append(Spacer(1, 30))
+
+    pie_texto = f"""
+    <para align=center>
+    <font size=8 color=#666666>
+    Documento generado el {datetime.now().strftime('%d/%m/%Y a las %H:%M')}<br/>
+    Sistema de Gestión de Órdenes de Compra
+    </font>
+    </para>
+    """
+    elementos.append(Paragraph(pie_texto, PIE_STYLE))
+
+    doc.build(elementos)
+    return buffer.getvalue()
+
+
+# ========================================
+# Caché de PDFs en el almacenamiento configurado
+# ========================================
+CARPETA_PDF_ORDENES = 'ordenes_pdf'
+
+
+def _firma_relacionados_pdf(orden):
+    """
+    Huella corta de las filas relacionadas que se imprimen en el PDF: el
+    proveedor (por su updated_at) y el usuario que creó la orden.
+    Los detalles ya se reflejan en updated_at de la orden.
+    """
+    proveedor = orden.proveedor
+    partes = [
+        str(proveedor.pk),
+        proveedor.updated_at.isoformat() if proveedor.updated_at else '',
+        orden.creado_por.username if orden.creado_por else '',
+    ]
+    return hashlib.sha1('|'.join(partes).encode()).hexdigest()[:12]
+
+
+def ruta_pdf_orden(orden):
+    """
+    Ruta del PDF en caché: cambia cada vez que cambia updated_at de la orden
+    o alguna de las filas relacionadas que se imprimen (proveedor, creado_por).
+    """
+    return (
+        f"{CARPETA_PDF_ORDENES}/{orden.id}/"
+        f"{orden.updated_at.strftime('%Y%m%d%H%M%S%f')}-{_firma_relacionados_pdf(orden)}.pdf"
+    )
+
+
+def _guardar_pdf_orden(orden, contenido):
+    """Guarda el PDF en caché y borra las versiones anteriores de la misma orden."""
+    ruta = ruta_pdf_orden(orden)
+    carpeta = f"{CARPETA_PDF_ORDENES}/{orden.id}"
+    try:
+        _, archivos = default_storage.listdir(carpeta)
+    except FileNotFoundError:
+        archivos = []
+    for archivo in archivos:
+        if f"{carpeta}/{archivo}" != ruta:
+            default_storage.delete(f"{carpeta}/{archivo}")
+    if not default_storage.exists(ruta):
+        default_storage.save(ruta, ContentFile(contenido))
+
+
+def obtener_pdf_orden(orden):
+    """
+    Retorna los bytes del PDF de la orden. Si ya hay uno en caché para la
+    ruta actual (ruta_pdf_orden) se sirve ese; si no, se genera y se guarda.
+    """
+    ruta = ruta_pdf_orden(orden)
+    try:
+        if default_storage.exists(ruta):
+            with default_storage.open(ruta, 'rb') as archivo:
+                return archivo.read()
+    except Exception:
+        # Si el almacenamiento falla la descarga sigue funcionando: se genera
+        logger.exception("No se pudo leer de caché el PDF de la orden %s", orden.id)
+
+    contenido = renderizar_orden_pdf(datos_orden_pdf(orden))
+    try:
+        _guardar_pdf_orden(orden, contenido)
+    except Exception:
+        # Sin caché la descarga sigue funcionando
+        logger.exception("No se pudo guardar en caché el PDF de la orden %s", orden.id)
+    return contenido
+
+
+# ========================================
+# Pre-generación en segundo plano
+# ========================================
+_ejecutor_pdf = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pdf-ordenes')
+
+
+def _pregenerar_pdf_orden(orden_id):
+    from proveedores.models import OrdenProveedor
+
+    try:
+        orden = (
+            OrdenProveedor.objects
+            .select_related('proveedor', 'creado_por')
+            .prefetch_related('detalles')
+            .filter(pk=orden_id)
+            .first()
+        )
+        if orden and not default_storage.exists(ruta_pdf_orden(orden)):
+            _guardar_pdf_orden(orden, renderizar_orden_pdf(datos_orden_pdf(orden)))
+    except Exception:
+        logger.exception("Error al pre-generar el PDF de la orden %s", orden_id)
+    finally:
+        # El hilo no pasa por el ciclo de request: cerrar su conexión
+        connection.close()
+
+
+def programar_pdf_orden(orden_id):
+    """
+    Encola la generación del PDF de la orden en un hilo de fondo, después del
+    commit de la transacción actual, para que la primera descarga ya lo encuentre en caché.
+    """
+    transaction.on_commit(lambda: _ejecutor_pdf.submit(_pregenerar_pdf_orden, orden_id))
+
+
+# ========================================
+# Exportación de varias órdenes en un ZIP (pool de procesos)
+# ========================================
+MAX_ORDENES_ZIP = 500
+PROCESOS_PDF = min(4, os.cpu_count() or 1)
+_pool_pdf = None
+
+
+def _inicializar_proceso_pdf():
+    """
+    Configura Django en cada proceso del pool. Los procesos solo renderizan
+    datos ya leídos y no usan la base de datos: se cierra cualquier conexión.
+    """
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def _get_pool_pdf():
+    """
+    Pool de procesos compartido (se crea en la primera exportación).
+
+    Usa 'spawn': un fork copiaría las conexiones a la base de datos y los
+    hilos (el de pre-generación de PDFs, los del servidor) del worker web, y
+    un proceso hijo podría usar una conexión ajena o heredar un lock tomado.
+    """
+    global _pool_pdf
+    if _pool_pdf is None:
+        _pool_pdf = ProcessPoolExecutor(
+            max_workers=PROCESOS_PDF,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_inicializar_proceso_pdf,
+        )
+    return _pool_pdf
+
+
+class _BufferZip(io.RawIOBase):
+    """Destino no posicionable para ZipFile: acumula lo escrito hasta que se consume."""
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def vaciar(self):
+        contenido = b''.join(self._partes)
+        self._partes = []
+        return contenido
+
+
+def generar_zip_ordenes(datos_ordenes):
+    """
+    Genera (en streaming) un ZIP con el PDF de cada orden.
+
+    `datos_ordenes` es una lista de datos_orden_pdf(). Los PDFs se renderizan en
+    paralelo en el pool de procesos, por tandas, y cada uno se escribe al ZIP
+    en cuanto está listo, en el mismo orden recibido.
+    """
+    global _pool_pdf
+    buffer = _BufferZip()
+    pool = _get_pool_pdf()
+    tanda = PROCESOS_PDF * 2
+
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_DEFLATED) as zip_ordenes:
+        for inicio in range(0, len(datos_ordenes), tanda):
+            bloque = datos_ordenes[inicio:inicio + tanda]
+            try:
+                pdfs = list(pool.map(renderizar_orden_pdf, bloque))
+            except BrokenProcessPool:
+                # Un proceso murió: se recrea el pool y se reintenta la tanda
+                _pool_pdf = None
+                pool = _get_pool_pdf()
+                pdfs = list(pool.map(renderizar_orden_pdf, bloque))
+
+            for datos, contenido in zip(bloque, pdfs):
+                zip_ordenes.writestr(f"Orden_{datos['numero_orden']}.pdf", contenido)
+                yield buffer.vaciar()
+
+    yield buffer.vaciar()
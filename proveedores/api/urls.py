@@ -15,10 +15,15 @@ urlpatterns = [
     path('ordenes/',                    views.list_ordenes_proveedor,       name='list_ordenes_proveedor'),
     path('ordenes/by-proveedor/',       views.list_proveedores_con_ordenes, name='list_ordenes_by_proveedor'),
     path('ordenes/<int:orden_id>/pdf/', views.descargar_orden_pdf,          name='descargar_orden_pdf'),
+    path('ordenes/pdf/zip/',            views.descargar_ordenes_zip,        name='descargar_ordenes_zip'),
     path('ordenes/create/',             views.create_orden_proveedor,       name='create_orden_proveedor'),
     path('ordenes/<int:pk>/',           views.get_orden_proveedor,          name='get_orden_proveedor'),
     path('ordenes/<int:pk>/update/',    views.update_orden_proveedor,       name='update_orden_proveedor'),
     path('ordenes/<int:pk>/update-estado/', views.update_orden_estado,      name='update_orden_estado'),
+    path('ordenes/<int:pk>/historial/', views.list_historial_orden,         name='list_historial_orden'),
+    path('ordenes/tiempos-entrega/',    views.reporte_tiempos_entrega,      name='reporte_tiempos_entrega'),
+    path('ordenes/en-transito/',        views.reporte_valor_en_transito,    name='reporte_valor_en_transito'),
+    path('ordenes/update-estado/',      views.update_ordenes_estado_bulk,   name='update_ordenes_estado_bulk'),
     path('ordenes/<int:pk>/delete/',    views.delete_orden_proveedor,       name='delete_orden_proveedor'),
     
     # === DETALLES DE ORDEN ===
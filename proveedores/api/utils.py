@@ -0,0 +1,317 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import F
+from django.utils import timezone
+
+from inventarioproducto.api.utils import registrar_movimientos, actualizar_costos_recepcion
+from inventarioproducto.api.capas import sincronizar_capas_ordenes
+from proveedores.models import OrdenProveedor, OrdenProveedorDetalle
+from proveedores.api.historial import registrar_cambios_estado
+from productos.models import Producto
+
+
+class DetalleOrdenInvalidoError(Exception):
+    """Los detalles enviados para una orden de proveedor no son válidos."""
+
+
+class TransicionEstadoInvalidaError(Exception):
+    """Alguna de las órdenes no puede pasar al estado pedido."""
+
+    def __init__(self, mensaje, errores=None):
+        super().__init__(mensaje)
+        self.errores = errores or []
+
+
+def validar_transicion_estado(orden, nuevo_estado):
+    """
+    Verifica que `orden` pueda pasar a `nuevo_estado` según
+    OrdenProveedor.TRANSICIONES_ESTADO. Quedarse en el mismo estado siempre
+    es válido. Lanza TransicionEstadoInvalidaError (con el detalle de la orden
+    en `errores`) si el estado no existe o la transición no está permitida.
+    """
+    if nuevo_estado == orden.estado:
+        return
+
+    if nuevo_estado not in dict(OrdenProveedor.ESTADO_CHOICES):
+        mensaje = f"Estado inválido: '{nuevo_estado}'."
+    elif nuevo_estado not in OrdenProveedor.TRANSICIONES_ESTADO.get(orden.estado, []):
+        mensaje = f"No se puede pasar de '{orden.estado}' a '{nuevo_estado}'."
+    else:
+        return
+
+    raise TransicionEstadoInvalidaError(mensaje, [{
+        "orden_id": orden.id,
+        "numero_orden": orden.numero_orden,
+        "error": mensaje,
+    }])
+
+
+def validar_detalles_orden(detalles_data):
+    """
+    Valida y normaliza los detalles recibidos para una orden.
+
+    Retorna una lista de dicts con producto_id (int), nombre, precio_compra (Decimal),
+    cantidad (int) y notas. Lanza DetalleOrdenInvalidoError si alguno es inválido
+    (incluye cantidad o precio_compra menores o iguales a cero),
+    si un producto se repite (la orden admite una línea por producto) o si algún
+    producto no existe (una sola consulta para todos).
+    """
+    detalles = []
+    productos_vistos = set()
+
+    for detalle_data in detalles_data:
+        producto_id = detalle_data.get('producto_id')
+        nombre = detalle_data.get('nombre')
+        precio_compra = detalle_data.get('precio_compra')
+        cantidad = detalle_data.get('cantidad')
+
+        if not producto_id or not nombre or not precio_compra or not cantidad:
+            raise DetalleOrdenInvalidoError(
+                "Cada detalle debe incluir producto_id, nombre, precio_compra y cantidad."
+            )
+
+        try:
+            producto_id = int(producto_id)
+            precio_compra = Decimal(str(precio_compra))
+            cantidad = int(cantidad)
+        except (TypeError, ValueError, InvalidOperation):
+            raise DetalleOrdenInvalidoError(
+                "producto_id y cantidad deben ser enteros y precio_compra un número."
+            )
+
+        if cantidad <= 0 or not precio_compra.is_finite() or precio_compra <= 0:
+            raise DetalleOrdenInvalidoError(
+                f"La cantidad y el precio de compra del producto {producto_id} deben ser mayores que cero."
+            )
+
+        if producto_id in productos_vistos:
+            raise DetalleOrdenInvalidoError(f"El producto {producto_id} está repetido en la orden.")
+        productos_vistos.add(producto_id)
+
+        detalles.append({
+            "producto_id": producto_id,
+            "nombre": nombre,
+            "precio_compra": precio_compra,
+            "cantidad": cantidad,
+            "notas": detalle_data.get('notas', ''),
+        })
+
+    inexistentes = productos_vistos - set(
+        Producto.all_objects.filter(pk__in=productos_vistos).values_list('id', flat=True)
+    )
+    if inexistentes:
+        raise DetalleOrdenInvalidoError(
+            f"Los productos {', '.join(str(p) for p in sorted(inexistentes))} no existen."
+        )
+
+    return detalles
+
+
+def actualizar_total_orden(orden, detalles):
+    """Guarda como total de la orden la suma de los subtotales ya calculados de `detalles`."""
+    orden.total = sum((d.subtotal for d in detalles), Decimal('0.00'))
+    orden.updated_at = timezone.now()
+    orden.save(update_fields=['total', 'updated_at'])
+
+
+def crear_detalles_orden(orden, detalles):
+    """
+    Inserta los detalles (ya validados) de una orden con un solo bulk_create
+    y actualiza el total de la orden una sola vez.
+
+    No pasa por OrdenProveedorDetalle.save(): el subtotal se calcula en memoria
+    y no se recalcula el total por cada línea. Debe llamarse dentro de una transacción.
+    Retorna los detalles creados.
+    """
+    registros = [
+        OrdenProveedorDetalle(
+            orden_proveedor=orden,
+            proveedor_id=orden.proveedor_id,
+            producto_id=d['producto_id'],
+            nombre=d['nombre'],
+            precio_compra=d['precio_compra'],
+            cantidad=d['cantidad'],
+            subtotal=d['precio_compra'] * d['cantidad'],
+            notas=d['notas'],
+        )
+        for d in detalles
+    ]
+    registros = OrdenProveedorDetalle.objects.bulk_create(registros)
+
+    # MySQL no devuelve los IDs generados en un bulk_create
+    if any(r.pk is None for r in registros):
+        registros = list(orden.detalles.all())
+
+    actualizar_total_orden(orden, registros)
+    return registros
+
+
+CAMPOS_DETALLE_EDITABLES = ['nombre', 'precio_compra', 'cantidad', 'notas']
+
+
+def sincronizar_detalles_orden(orden, detalles):
+    """
+    Deja los detalles de la orden iguales a `detalles` (ya validados) con el
+    mínimo de escrituras, comparando por producto_id:
+
+    - producto nuevo en la orden          → INSERT (un solo bulk_create)
+    - producto existente con cambios      → UPDATE (un solo bulk_update)
+    - producto que ya no viene            → eliminación lógica (un solo UPDATE)
+    - producto eliminado lógicamente antes → se reactiva la misma fila, sin
+      insertar otra que choque con el índice único (orden_proveedor, producto_id)
+
+    Las líneas sin cambios no se tocan. El total de la orden se guarda una vez.
+    Debe llamarse dentro de una transacción. Retorna los detalles activos resultantes.
+    """
+    ahora = timezone.now()
+    existentes = {d.producto_id: d for d in OrdenProveedorDetalle.all_objects.filter(orden_proveedor=orden)}
+
+    nuevos = []
+    modificados = []
+    resultado = []
+
+    for d in detalles:
+        subtotal = d['precio_compra'] * d['cantidad']
+        detalle = existentes.pop(d['producto_id'], None)
+
+        if detalle is None:
+            detalle = OrdenProveedorDetalle(
+                orden_proveedor=orden,
+                proveedor_id=orden.proveedor_id,
+                producto_id=d['producto_id'],
+                nombre=d['nombre'],
+                precio_compra=d['precio_compra'],
+                cantidad=d['cantidad'],
+                subtotal=subtotal,
+                notas=d['notas'],
+            )
+            nuevos.append(detalle)
+        else:
+            cambios = detalle.deleted_at is not None or detalle.subtotal != subtotal or any(
+                getattr(detalle, campo) != d[campo] for campo in CAMPOS_DETALLE_EDITABLES
+            )
+            if cambios:
+                for campo in CAMPOS_DETALLE_EDITABLES:
+                    setattr(detalle, campo, d[campo])
+                detalle.subtotal = subtotal
+                detalle.deleted_at = None
+                detalle.updated_at = ahora
+                modificados.append(detalle)
+
+        resultado.append(detalle)
+
+    # Lo que queda en `existentes` y sigue activo ya no viene en la orden
+    eliminados = [d.pk for d in existentes.values() if d.deleted_at is None]
+
+    if eliminados:
+        OrdenProveedorDetalle.objects.filter(pk__in=eliminados).update(deleted_at=ahora, updated_at=ahora)
+    if modificados:
+        OrdenProveedorDetalle.all_objects.bulk_update(
+            modificados, CAMPOS_DETALLE_EDITABLES + ['subtotal', 'deleted_at', 'updated_at']
+        )
+    if nuevos:
+        OrdenProveedorDetalle.objects.bulk_create(nuevos)
+
+    actualizar_total_orden(orden, resultado)
+    return resultado
+
+
+def cambiar_estado_ordenes(orden_ids, nuevo_estado, usuario=None):
+    """
+    Pasa varias órdenes a `nuevo_estado` y refleja en el stock las que entran
+    o salen de 'recibida'. Debe llamarse dentro de una transacción.
+
+    Bloquea las órdenes (en orden de id) y valida todas antes de escribir:
+    si alguna no existe o su transición no está en OrdenProveedor.TRANSICIONES_ESTADO
+    (validar_transicion_estado) lanza TransicionEstadoInvalidaError y no cambia nada. Las órdenes que ya
+    están en `nuevo_estado` se dejan igual.
+
+    Escribe con un solo UPDATE de cabeceras, lee los detalles de todas las
+    órdenes afectadas en una consulta, registra los movimientos de
+    'recepcion' en bloque y agrega los cambios al historial de estados con
+    un solo INSERT. Retorna (ordenes cambiadas, ordenes sin cambios).
+    """
+    orden_ids = sorted(set(orden_ids))
+    ordenes = list(
+        OrdenProveedor.objects
+        .select_for_update()
+        .filter(pk__in=orden_ids)
+        .order_by('id')
+    )
+
+    errores = []
+    encontradas = {orden.id for orden in ordenes}
+    for orden_id in orden_ids:
+        if orden_id not in encontradas:
+            errores.append({"orden_id": orden_id, "error": "La orden no existe."})
+
+    cambiadas = []
+    sin_cambios = []
+    for orden in ordenes:
+        if orden.estado == nuevo_estado:
+            sin_cambios.append(orden)
+            continue
+        try:
+            validar_transicion_estado(orden, nuevo_estado)
+        except TransicionEstadoInvalidaError as e:
+            errores.extend(e.errores)
+        else:
+            cambiadas.append(orden)
+
+    if errores:
+        raise TransicionEstadoInvalidaError(
+            "Algunas órdenes no pueden cambiar de estado; no se modificó ninguna.", errores
+        )
+    if not cambiadas:
+        return cambiadas, sin_cambios
+
+    # Entrar a 'recibida' suma las unidades al stock; salir de 'recibida' las resta
+    signos = {}
+    for orden in cambiadas:
+        if nuevo_estado == 'recibida':
+            signos[orden.id] = 1
+        elif orden.estado == 'recibida':
+            signos[orden.id] = -1
+
+    ahora = timezone.now()
+    fecha_recepcion = ahora if nuevo_estado == 'recibida' else None
+    fechas_anteriores = {orden.id: orden.fecha_recepcion for orden in cambiadas}
+    OrdenProveedor.objects.filter(pk__in=[orden.id for orden in cambiadas]).update(
+        estado=nuevo_estado, fecha_recepcion=fecha_recepcion, updated_at=ahora
+    )
+    estados_anteriores = [(orden, orden.estado) for orden in cambiadas]
+    for orden in cambiadas:
+        orden.estado = nuevo_estado
+        orden.fecha_recepcion = fecha_recepcion
+        orden.updated_at = ahora
+
+    if signos:
+        numeros = {orden.id: orden.numero_orden for orden in cambiadas}
+        detalles = list(
+            OrdenProveedorDetalle.objects
+            .filter(orden_proveedor_id__in=signos)
+            .order_by('orden_proveedor_id', 'producto_id')
+            .values('id', 'orden_proveedor_id', 'producto_id', 'cantidad', 'precio_compra', 'proveedor_id',
+                    importe=F('subtotal'))
+        )
+        for detalle in detalles:
+            orden_id = detalle['orden_proveedor_id']
+            detalle['fecha'] = fecha_recepcion if signos[orden_id] > 0 else fechas_anteriores[orden_id]
+        actualizar_costos_recepcion(
+            salidas=[d for d in detalles if signos[d['orden_proveedor_id']] < 0],
+            entradas=[d for d in detalles if signos[d['orden_proveedor_id']] > 0],
+        )
+        registrar_movimientos([
+            {
+                'producto_id': d['producto_id'],
+                'tipo': 'recepcion',
+                'cantidad': signos[d['orden_proveedor_id']] * d['cantidad'],
+                'referencia': numeros[d['orden_proveedor_id']],
+            }
+            for d in detalles
+        ], usuario=usuario)
+        sincronizar_capas_ordenes(signos)
+
+    registrar_cambios_estado(estados_anteriores, usuario=usuario)
+
+    return cambiadas, sin_cambios
@@ -1,7 +1,8 @@
 # proveedor/views.py
 from tarjetabancaria.models import TarjetaBancaria
 from rest_framework.response import Response
-from django.db.models import Sum, Count
+from django.db.models import Sum, Count, Exists, OuterRef, Subquery, Prefetch, DecimalField, IntegerField
+from django.db.models.functions import Coalesce
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
@@ -10,20 +11,26 @@ from django.shortcuts import get_object_or_404
 from django.db import DatabaseError, transaction
 from proveedores.models import Proveedor, OrdenProveedor, OrdenProveedorDetalle
 from user.api.permissions import RolePermission 
+from inventarioproducto.api.utils import get_recepcion_orden, registrar_diferencia_recepcion
+from proveedores.api.utils import (
+    validar_detalles_orden, crear_detalles_orden, sincronizar_detalles_orden, DetalleOrdenInvalidoError,
+    cambiar_estado_ordenes, validar_transicion_estado, TransicionEstadoInvalidaError,
+)
+from core.utils import siguiente_codigo, consultar_siguiente_codigo, sincronizar_secuencia
 
 from django.db.models import Q      # Necesario para el buscador
-from datetime import datetime, time # Necesario para el manejo de fechas
+from datetime import datetime, time, timedelta # Necesario para el manejo de fechas
+from django.utils import timezone
 from decimal import Decimal
 
-# ReportLab para generación de PDF
-from django.http import HttpResponse
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
-import io
+# PDF de órdenes (ReportLab, con caché)
+from django.http import HttpResponse, StreamingHttpResponse
+from proveedores.api.historial import (
+    registrar_cambios_estado, get_tiempos_entrega, get_valor_en_transito, PERCENTILES_ENTREGA,
+)
+from proveedores.api.pdf import (
+    obtener_pdf_orden, programar_pdf_orden, datos_orden_pdf, generar_zip_ordenes, MAX_ORDENES_ZIP,
+)
 # ========================================
 
 # Roles permitidos para gestionar proveedores (admin y contador/manager)
@@ -335,27 +342,12 @@ def delete_supplier(request, pk):
 @permission_classes([IsAuthenticated, RolePermission(SUPPLIER_MANAGER_ROLES)])
 def get_siguiente_numero_orden(request):
     """
-    Genera el siguiente número de orden consecutivo.
+    Retorna el siguiente número de orden consecutivo sin reservarlo.
+    Se lee de la secuencia 'OP-' (una fila por índice único).
     Formato: OP-00001, OP-00002, etc.
     """
     try:
-        # Obtener la última orden creada
-        ultima_orden = OrdenProveedor.objects.all().order_by('-id').first()
-        
-        if ultima_orden and ultima_orden.numero_orden:
-            # Extraer el número de la última orden (ej: "OP-00005" -> 5)
-            try:
-                ultimo_numero = int(ultima_orden.numero_orden.split('-')[-1])
-                siguiente_numero = ultimo_numero + 1
-            except (ValueError, IndexError):
-                # Si no se puede parsear, empezar desde 1
-                siguiente_numero = 1
-        else:
-            # Primera orden
-            siguiente_numero = 1
-        
-        # Formatear con ceros a la izquierda (5 dígitos)
-        numero_orden_formateado = f"OP-{str(siguiente_numero).zfill(5)}"
+        numero_orden_formateado, _ = consultar_siguiente_codigo(OrdenProveedor.PREFIJO_NUMERO)
         
         return Response({
             "siguiente_numero": numero_orden_formateado
@@ -396,23 +388,20 @@ def create_orden_proveedor(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        if not numero_orden:
-            return Response(
-                {"error": "El número de orden es obligatorio."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
         if not detalles_data or len(detalles_data) == 0:
             return Response(
                 {"error": "Debe incluir al menos un producto en la orden."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Validar todos los detalles antes de escribir nada
+        detalles = validar_detalles_orden(detalles_data)
+
         # Verificar que el proveedor existe
         proveedor = get_object_or_404(Proveedor, pk=proveedor_id)
 
-        # Verificar unicidad del número de orden
-        if OrdenProveedor.objects.filter(numero_orden=numero_orden).exists():
+        # Verificar unicidad del número de orden (si no se envía, se toma de la secuencia)
+        if numero_orden and OrdenProveedor.all_objects.filter(numero_orden=numero_orden).exists():
             return Response(
                 {"error": "Ya existe una orden con ese número."},
                 status=status.HTTP_400_BAD_REQUEST
@@ -428,6 +417,11 @@ def create_orden_proveedor(request):
 
         # Transacción para crear orden y detalles
         with transaction.atomic():
+            if numero_orden:
+                sincronizar_secuencia(OrdenProveedor.PREFIJO_NUMERO, numero_orden)
+            else:
+                numero_orden = siguiente_codigo(OrdenProveedor.PREFIJO_NUMERO)
+
             # Crear la orden
             orden = OrdenProveedor.objects.create(
                 proveedor=proveedor,
@@ -438,50 +432,21 @@ def create_orden_proveedor(request):
                 creado_por=request.user
             )
 
-            # Crear los detalles y calcular total
-            detalles_creados = []
-            total_orden = Decimal('0.00')
-            
-            for detalle_data in detalles_data:
-                producto_id = detalle_data.get('producto_id')
-                nombre = detalle_data.get('nombre')
-                precio_compra = detalle_data.get('precio_compra')
-                cantidad = detalle_data.get('cantidad')
-                notas_detalle = detalle_data.get('notas', '')
-
-                # Validaciones de detalle
-                if not producto_id or not nombre or not precio_compra or not cantidad:
-                    return Response(
-                        {"error": "Cada detalle debe incluir producto_id, nombre, precio_compra y cantidad."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-                detalle = OrdenProveedorDetalle.objects.create(
-                    orden_proveedor=orden,
-                    proveedor=proveedor,
-                    producto_id=producto_id,
-                    nombre=nombre,
-                    precio_compra=Decimal(str(precio_compra)),
-                    cantidad=int(cantidad),
-                    notas=notas_detalle
-                )
-                
-                # 🔥 Sumar al total
-                total_orden += detalle.subtotal
-                
-                detalles_creados.append({
-                    "id": detalle.id,
-                    "producto_id": detalle.producto_id,
-                    "nombre": detalle.nombre,
-                    "precio_compra": str(detalle.precio_compra),
-                    "cantidad": detalle.cantidad,
-                    "subtotal": str(detalle.subtotal),
-                    "notas": detalle.notas
-                })
+            # Crear los detalles en bloque y calcular el total una sola vez
+            detalles_creados = [{
+                "id": detalle.id,
+                "producto_id": detalle.producto_id,
+                "nombre": detalle.nombre,
+                "precio_compra": str(detalle.precio_compra),
+                "cantidad": detalle.cantidad,
+                "subtotal": str(detalle.subtotal),
+                "notas": detalle.notas
+            } for detalle in crear_detalles_orden(orden, detalles)]
 
-            # 🔥 Actualizar el total de la orden
-            orden.total = total_orden
-            orden.save(update_fields=['total'])
+            # Si la orden se crea ya recibida, sus unidades entran al stock
+            registrar_diferencia_recepcion(orden, {}, usuario=request.user)
+
+            registrar_cambios_estado([(orden, None)], usuario=request.user)
 
         data = {
             "id": orden.id,
@@ -503,6 +468,8 @@ def create_orden_proveedor(request):
         }
         return Response(data, status=status.HTTP_201_CREATED)
 
+    except DetalleOrdenInvalidoError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except DatabaseError as e:
         return Response(
             {"error": f"Error de base de datos al crear la orden: {str(e)}"},
@@ -610,13 +577,61 @@ def list_proveedores_con_ordenes(request):
     Retorna estructura: proveedor -> ordenes[] -> detalles[]
     """
     try:
-        # Obtener todos los proveedores con órdenes
-        proveedores = Proveedor.objects.prefetch_related(
-            'ordenes__detalles'
+        # Filtros de fecha para las órdenes (un valor inválido se ignora)
+        start_date_str = request.query_params.get('start_date', None)
+        end_date_str = request.query_params.get('end_date', None)
+
+        filtro_ordenes = Q()
+        if start_date_str:
+            try:
+                start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+                filtro_ordenes &= Q(fecha_orden__gte=datetime.combine(start_date, time.min))
+            except ValueError:
+                pass
+
+        if end_date_str:
+            try:
+                end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+                filtro_ordenes &= Q(fecha_orden__lte=datetime.combine(end_date, time.max))
+            except ValueError:
+                pass
+
+        ordenes_filtradas = OrdenProveedor.objects.filter(filtro_ordenes)
+
+        # Totales por proveedor en subconsultas (sin JOIN + DISTINCT sobre órdenes)
+        totales_ordenes = (
+            ordenes_filtradas
+            .filter(proveedor=OuterRef('pk'))
+            .order_by()
+            .values('proveedor')
+        )
+
+        # Proveedores con al menos una orden, con sus órdenes del rango precargadas
+        proveedores = Proveedor.objects.filter(
+            Exists(OrdenProveedor.objects.filter(proveedor=OuterRef('pk')))
         ).annotate(
-            total_ordenes=Sum('ordenes__total'),
-            cantidad_ordenes=Count('ordenes')
-        ).filter(ordenes__isnull=False).distinct()
+            total_ordenes=Coalesce(
+                Subquery(totales_ordenes.annotate(total=Sum('total')).values('total'),
+                         output_field=DecimalField(max_digits=14, decimal_places=2)),
+                Decimal('0.00')
+            ),
+            cantidad_ordenes=Coalesce(
+                Subquery(totales_ordenes.annotate(cantidad=Count('id')).values('cantidad'),
+                         output_field=IntegerField()),
+                0
+            ),
+        ).prefetch_related(
+            Prefetch(
+                'ordenes',
+                queryset=(
+                    ordenes_filtradas
+                    .select_related('tarjeta')
+                    .prefetch_related('detalles')
+                    .order_by('-fecha_orden')
+                ),
+                to_attr='ordenes_rango'
+            )
+        )
         
         # Filtro de búsqueda
         search_query = request.query_params.get('search', None)
@@ -632,10 +647,6 @@ def list_proveedores_con_ordenes(request):
         if ciudad_filter:
             proveedores = proveedores.filter(ciudad__icontains=ciudad_filter)
 
-        # Filtros de fecha para las órdenes
-        start_date_str = request.query_params.get('start_date', None)
-        end_date_str = request.query_params.get('end_date', None)
-
         # Ordenación
         proveedores = proveedores.order_by('nombre_empresa')
         
@@ -646,36 +657,22 @@ def list_proveedores_con_ordenes(request):
         paginator.max_page_size = 200
         paginated_proveedores = paginator.paginate_queryset(proveedores, request)
 
-        # Serialización
+        # Mapear estado al formato del frontend
+        estado_map = {
+            'pendiente': 'pendiente',
+            'confirmada': 'confirmada',
+            'en_transito': 'en_transito',
+            'recibida':    'recibida',
+            'cancelada': 'cancelada',
+        }
+
+        # Serialización (todo en memoria sobre lo precargado)
         data = []
         for proveedor in paginated_proveedores:
-            # Obtener órdenes del proveedor
-            ordenes_query = proveedor.ordenes.all()
-            
-            # Aplicar filtros de fecha a las órdenes si existen
-            if start_date_str:
-                try:
-                    start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-                    start_datetime = datetime.combine(start_date, time.min)
-                    ordenes_query = ordenes_query.filter(fecha_orden__gte=start_datetime)
-                except ValueError:
-                    pass
-            
-            if end_date_str:
-                try:
-                    end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-                    end_datetime = datetime.combine(end_date, time.max)
-                    ordenes_query = ordenes_query.filter(fecha_orden__lte=end_datetime)
-                except ValueError:
-                    pass
-            
-            # Serializar órdenes
             ordenes_pedido = []
-            total_proveedor = 0
-            
-            for orden in ordenes_query.order_by('-fecha_orden'):
-                # Obtener detalles de la orden
-                detalles = orden.detalles.all()
+
+            for orden in proveedor.ordenes_rango:
+                detalles = list(orden.detalles.all())
                 
                 # 🔥 Serializar cada producto de la orden
                 productos_detalle = []
@@ -695,17 +692,8 @@ def list_proveedores_con_ordenes(request):
                 
                 # Construir resumen de productos para vista rápida
                 productos_resumen = ", ".join([d.nombre for d in detalles[:2]])  # Primeros 2 productos
-                if detalles.count() > 2:
-                    productos_resumen += f" (+{detalles.count() - 2} más)"
-                
-                # Mapear estado al formato del frontend
-                estado_map = {
-                    'pendiente': 'pendiente',
-                    'confirmada': 'confirmada',
-                    'en_transito': 'en_transito',
-                    'recibida':    'recibida',
-                    'cancelada': 'cancelada',
-                }
+                if len(detalles) > 2:
+                    productos_resumen += f" (+{len(detalles) - 2} más)"
                 
                 ordenes_pedido.append({
                     "id": orden.id,
@@ -714,22 +702,20 @@ def list_proveedores_con_ordenes(request):
                     "estado": estado_map.get(orden.estado, orden.estado),
                     "total": float(orden.total),
                     "notas": orden.notas or "",
-                    "cantidad_productos": detalles.count(),
+                    "cantidad_productos": len(detalles),
                     "cantidad_total": cantidad_total,
                     "productos_resumen": productos_resumen,
                     "productos": productos_detalle,  # 🔥 Lista completa de productos
                     "tarjeta_bancaria": orden.tarjeta.nombre if orden.tarjeta else ""  # 🔥 Nombre de la tarjeta usada
                 })
-                
-                total_proveedor += float(orden.total)
             
             data.append({
                 "id": proveedor.id,
                 "nombre_proveedor": proveedor.nombre_empresa,
                 "ciudad": proveedor.ciudad,
                 "descripcion": proveedor.descripcion or "",
-                "total": total_proveedor,
-                "cantidad_ordenes": len(ordenes_pedido),
+                "total": float(proveedor.total_ordenes),
+                "cantidad_ordenes": proveedor.cantidad_ordenes,
                 "ordenesPedido": ordenes_pedido
             })
 
@@ -774,6 +760,7 @@ def get_orden_proveedor(request, pk):
             "estado": orden.estado,
             "total": str(orden.total),
             "notas": orden.notas,
+            "fecha_recepcion": orden.fecha_recepcion,
             "detalles": detalles_data,
             "creado_por": orden.creado_por.username if orden.creado_por else None,
             "created_at": orden.created_at,
@@ -794,7 +781,8 @@ def get_orden_proveedor(request, pk):
 def update_orden_proveedor(request, pk):
     """
     Actualiza la orden y sus detalles.
-    Los detalles se reemplazan completamente con los nuevos enviados.
+    Los detalles enviados reemplazan a los actuales: se comparan por producto_id
+    y solo se escriben las líneas nuevas, modificadas o eliminadas.
     """
     try:
         orden = get_object_or_404(OrdenProveedor, pk=pk)
@@ -805,50 +793,43 @@ def update_orden_proveedor(request, pk):
         detalles_data = request.data.get('detalles', None)
 
         # Validación de número de orden único
-        if numero_orden != orden.numero_orden and OrdenProveedor.objects.filter(numero_orden=numero_orden).exists():
+        if numero_orden != orden.numero_orden and OrdenProveedor.all_objects.filter(numero_orden=numero_orden).exists():
             return Response(
                 {"error": "Ya existe otra orden con ese número."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Validar todos los detalles antes de escribir nada
+        detalles = validar_detalles_orden(detalles_data) if detalles_data is not None else None
+
         with transaction.atomic():
+            # Bloquear la orden antes de leer lo que aporta al stock: dos ediciones
+            # simultáneas no deben partir del mismo estado anterior
+            orden = OrdenProveedor.objects.select_for_update().get(pk=orden.pk)
+            validar_transicion_estado(orden, estado)
+            recepcion_anterior = get_recepcion_orden(orden)
+            estado_anterior = orden.estado
+            cambio_estado = estado != orden.estado
+            if numero_orden != orden.numero_orden:
+                sincronizar_secuencia(OrdenProveedor.PREFIJO_NUMERO, numero_orden)
+
             # Actualizar la orden
             orden.numero_orden = numero_orden
             orden.estado = estado
             orden.notas = notas
             orden.save()
 
-            # Si se enviaron detalles, reemplazarlos
-            if detalles_data is not None:
-                # Eliminar detalles anteriores
-                orden.detalles.all().delete()
-
-                # Crear nuevos detalles
-                for detalle_data in detalles_data:
-                    producto_id = detalle_data.get('producto_id')
-                    nombre = detalle_data.get('nombre')
-                    precio_compra = detalle_data.get('precio_compra')
-                    cantidad = detalle_data.get('cantidad')
-                    notas_detalle = detalle_data.get('notas', '')
-
-                    if not producto_id or not nombre or not precio_compra or not cantidad:
-                        return Response(
-                            {"error": "Cada detalle debe incluir producto_id, nombre, precio_compra y cantidad."},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-
-                    OrdenProveedorDetalle.objects.create(
-                        orden_proveedor=orden,
-                        proveedor=orden.proveedor,
-                        producto_id=producto_id,
-                        nombre=nombre,
-                        precio_compra=Decimal(str(precio_compra)),
-                        cantidad=int(cantidad),
-                        notas=notas_detalle
-                    )
-
-                # Recalcular el total
-                orden.calcular_total()
+            # Si se enviaron detalles, aplicar solo las diferencias por producto
+            # (inserta, actualiza o elimina lógicamente lo necesario)
+            if detalles is not None:
+                sincronizar_detalles_orden(orden, detalles)
+
+            # Reflejar en el stock el cambio de estado y/o de detalles
+            registrar_diferencia_recepcion(orden, recepcion_anterior, usuario=request.user)
+
+            if cambio_estado:
+                registrar_cambios_estado([(orden, estado_anterior)], usuario=request.user)
+                programar_pdf_orden(orden.id)
 
         # Recargar la orden con detalles
         orden.refresh_from_db()
@@ -873,6 +854,8 @@ def update_orden_proveedor(request, pk):
         }
         return Response(data, status=status.HTTP_200_OK)
 
+    except (DetalleOrdenInvalidoError, TransicionEstadoInvalidaError) as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except DatabaseError as e:
         return Response(
             {"error": f"Error de base de datos al actualizar la orden: {str(e)}"},
@@ -891,10 +874,18 @@ def update_orden_proveedor(request, pk):
 def delete_orden_proveedor(request, pk):
     try:
         orden = get_object_or_404(OrdenProveedor, pk=pk)
-        
-        # Soft delete
-        orden.delete()
-        
+
+        with transaction.atomic():
+            # Bloquear la orden antes de leer lo que aporta al stock
+            orden = OrdenProveedor.objects.select_for_update().get(pk=orden.pk)
+            recepcion_anterior = get_recepcion_orden(orden)
+
+            # Soft delete: una orden eliminada ya no aporta unidades, así que
+            # si estaba recibida se descuentan del stock y se recalculan sus
+            # costos y capas
+            orden.delete()
+            registrar_diferencia_recepcion(orden, recepcion_anterior, usuario=request.user)
+
         return Response(
             {"message": "Orden eliminada lógicamente exitosamente", "deleted_at": orden.deleted_at}, 
             status=status.HTTP_200_OK
@@ -944,23 +935,39 @@ def create_orden_detalle(request):
         # Verificar que la orden existe
         orden = get_object_or_404(OrdenProveedor, pk=orden_proveedor_id)
 
-        # Verificar que no exista el mismo producto en la orden
-        if OrdenProveedorDetalle.objects.filter(orden_proveedor=orden, producto_id=producto_id).exists():
-            return Response(
-                {"error": "Este producto ya existe en la orden."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        # Mismas reglas que los detalles de una orden completa (producto existente,
+        # cantidad y precio mayores que cero)
+        d = validar_detalles_orden([{
+            "producto_id": producto_id,
+            "nombre": nombre,
+            "precio_compra": precio_compra,
+            "cantidad": cantidad,
+            "notas": notas,
+        }])[0]
 
-        # Crear el detalle
-        detalle = OrdenProveedorDetalle.objects.create(
-            orden_proveedor=orden,
-            proveedor=orden.proveedor,
-            producto_id=producto_id,
-            nombre=nombre,
-            precio_compra=Decimal(str(precio_compra)),
-            cantidad=int(cantidad),
-            notas=notas
-        )
+        with transaction.atomic():
+            # Bloquear la orden antes de leer lo que aporta al stock
+            orden = OrdenProveedor.objects.select_for_update().get(pk=orden.pk)
+
+            # Verificar que no exista el mismo producto en la orden
+            if OrdenProveedorDetalle.objects.filter(orden_proveedor=orden, producto_id=d['producto_id']).exists():
+                return Response(
+                    {"error": "Este producto ya existe en la orden."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # Crear el detalle
+            recepcion_anterior = get_recepcion_orden(orden)
+            detalle = OrdenProveedorDetalle.objects.create(
+                orden_proveedor=orden,
+                proveedor=orden.proveedor,
+                producto_id=d['producto_id'],
+                nombre=d['nombre'],
+                precio_compra=d['precio_compra'],
+                cantidad=d['cantidad'],
+                notas=d['notas']
+            )
+            registrar_diferencia_recepcion(orden, recepcion_anterior, usuario=request.user)
 
         data = {
             "id": detalle.id,
@@ -974,6 +981,8 @@ def create_orden_detalle(request):
         }
         return Response(data, status=status.HTTP_201_CREATED)
 
+    except DetalleOrdenInvalidoError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response(
             {"error": f"Error al crear el detalle: {str(e)}"},
@@ -1049,12 +1058,25 @@ def update_orden_detalle(request, pk):
         cantidad      = request.data.get('cantidad', detalle.cantidad)
         notas         = request.data.get('notas', detalle.notas)
 
+        d = validar_detalles_orden([{
+            "producto_id": detalle.producto_id,
+            "nombre": nombre,
+            "precio_compra": precio_compra,
+            "cantidad": cantidad,
+            "notas": notas,
+        }])[0]
+
         # Actualizar campos
-        detalle.nombre = nombre
-        detalle.precio_compra = Decimal(str(precio_compra))
-        detalle.cantidad = int(cantidad)
-        detalle.notas = notas
-        detalle.save()  # El save() ya recalcula el subtotal y el total de la orden
+        detalle.nombre = d['nombre']
+        detalle.precio_compra = d['precio_compra']
+        detalle.cantidad = d['cantidad']
+        detalle.notas = d['notas']
+        with transaction.atomic():
+            # Bloquear la orden antes de leer lo que aporta al stock
+            detalle.orden_proveedor = OrdenProveedor.objects.select_for_update().get(pk=detalle.orden_proveedor_id)
+            recepcion_anterior = get_recepcion_orden(detalle.orden_proveedor)
+            detalle.save()  # El save() ya recalcula el subtotal y el total de la orden
+            registrar_diferencia_recepcion(detalle.orden_proveedor, recepcion_anterior, usuario=request.user)
 
         data = {
             "id": detalle.id,
@@ -1067,6 +1089,8 @@ def update_orden_detalle(request, pk):
         }
         return Response(data, status=status.HTTP_200_OK)
 
+    except DetalleOrdenInvalidoError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response(
             {"error": f"Error al actualizar el detalle: {str(e)}"},
@@ -1082,7 +1106,13 @@ def delete_orden_detalle(request, pk):
         detalle = get_object_or_404(OrdenProveedorDetalle, pk=pk)
         
         # Soft delete (el método delete() ya actualiza el total de la orden)
-        detalle.delete()
+        with transaction.atomic():
+            # Bloquear la orden antes de leer lo que aporta al stock
+            orden = OrdenProveedor.objects.select_for_update().get(pk=detalle.orden_proveedor_id)
+            detalle.orden_proveedor = orden
+            recepcion_anterior = get_recepcion_orden(orden)
+            detalle.delete()
+            registrar_diferencia_recepcion(orden, recepcion_anterior, usuario=request.user)
         
         return Response(
             {"message": "Detalle eliminado lógicamente exitosamente", "deleted_at": detalle.deleted_at}, 
@@ -1098,224 +1128,20 @@ def delete_orden_detalle(request, pk):
 @permission_classes([IsAuthenticated, RolePermission(SUPPLIER_MANAGER_ROLES)])
 def descargar_orden_pdf(request, orden_id):
     """
-    Genera y descarga un PDF detallado de la orden de proveedor.
+    Descarga el PDF detallado de la orden de proveedor.
+    Se sirve desde la caché si ni la orden ni su proveedor cambiaron desde la última generación.
     """
     try:
         # Obtener la orden
         orden = get_object_or_404(
-            OrdenProveedor.objects.select_related('proveedor', 'creado_por')
-                                  .prefetch_related('detalles'),
+            OrdenProveedor.objects.select_related('proveedor', 'creado_por'),
             pk=orden_id
         )
         
-        # Crear el buffer para el PDF
-        buffer = io.BytesIO()
-        
-        # Crear el documento PDF
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=letter,
-            rightMargin=40,
-            leftMargin=40,
-            topMargin=60,
-            bottomMargin=40,
-        )
-        
-        # Contenedor para los elementos del PDF
-        elementos = []
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        
-        # Estilo para el título
-        titulo_style = ParagraphStyle(
-            'TituloPersonalizado',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#F7C548'),
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
-        
-        # Estilo para subtítulos
-        subtitulo_style = ParagraphStyle(
-            'SubtituloPersonalizado',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#333333'),
-            spaceAfter=12,
-            fontName='Helvetica-Bold'
-        )
-        
-        # Estilo normal
-        normal_style = ParagraphStyle(
-            'NormalPersonalizado',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor=colors.HexColor('#333333'),
-        )
-        
-        # ===== ENCABEZADO =====
-        titulo = Paragraph("ORDEN DE COMPRA", titulo_style)
-        elementos.append(titulo)
-        elementos.append(Spacer(1, 20))
-        
-        # ===== INFORMACIÓN DE LA ORDEN =====
-        estado_map = {
-            'pendiente': 'PENDIENTE',
-            'confirmada': 'CONFIRMADA',
-            'en_transito': 'EN TRÁNSITO',
-            'recibida': 'ENTREGADO',
-            'cancelada': 'CANCELADA',
-        }
-        
-        info_orden = [
-            ['Número de Orden:', orden.numero_orden, 'Estado:', estado_map.get(orden.estado, orden.estado)],
-            ['Fecha:', orden.fecha_orden.strftime('%d/%m/%Y %H:%M'), 'Creado por:', orden.creado_por.username if orden.creado_por else 'N/A'],
-        ]
-        
-        tabla_info = Table(info_orden, colWidths=[2*inch, 2*inch, 1.5*inch, 1.5*inch])
-        tabla_info.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F7C548')),
-            ('BACKGROUND', (2, 0), (2, -1), colors.HexColor('#F7C548')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ]))
-        elementos.append(tabla_info)
-        elementos.append(Spacer(1, 20))
-        
-        # ===== INFORMACIÓN DEL PROVEEDOR =====
-        subtitulo_proveedor = Paragraph("INFORMACIÓN DEL PROVEEDOR", subtitulo_style)
-        elementos.append(subtitulo_proveedor)
-        
-        info_proveedor = [
-            ['Proveedor:', orden.proveedor.nombre_empresa],
-            ['Ciudad:', orden.proveedor.ciudad or 'N/A'],
-            ['Descripción:', orden.proveedor.descripcion or 'N/A'],
-        ]
-        
-        if orden.proveedor.email:
-            info_proveedor.append(['Email:', orden.proveedor.email])
-        if orden.proveedor.telefono:
-            info_proveedor.append(['Teléfono:', orden.proveedor.telefono])
-        
-        tabla_proveedor = Table(info_proveedor, colWidths=[2*inch, 5*inch])
-        tabla_proveedor.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#FFF7E6')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ]))
-        elementos.append(tabla_proveedor)
-        elementos.append(Spacer(1, 20))
-        
-        # ===== DETALLE DE PRODUCTOS =====
-        subtitulo_productos = Paragraph("DETALLE DE PRODUCTOS", subtitulo_style)
-        elementos.append(subtitulo_productos)
-        
-        # Encabezados de la tabla de productos
-        datos_productos = [
-            ['#', 'Producto', 'Precio Unit.', 'Cantidad', 'Subtotal']
-        ]
-        
-        # Agregar cada producto
-        detalles = orden.detalles.all()
-        for idx, detalle in enumerate(detalles, 1):
-            datos_productos.append([
-                str(idx),
-                detalle.nombre,
-                f"${detalle.precio_compra:,.2f}",
-                str(detalle.cantidad),
-                f"${detalle.subtotal:,.2f}"
-            ])
-        
-        # Fila de total
-        datos_productos.append([
-            '',
-            '',
-            '',
-            'TOTAL:',
-            f"${orden.total:,.2f}"
-        ])
-        
-        tabla_productos = Table(datos_productos, colWidths=[0.5*inch, 3*inch, 1.3*inch, 1*inch, 1.5*inch])
-        tabla_productos.setStyle(TableStyle([
-            # Encabezado
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#F7C548')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('TOPPADDING', (0, 0), (-1, 0), 10),
-            
-            # Cuerpo
-            ('TEXTCOLOR', (0, 1), (-1, -2), colors.black),
-            ('ALIGN', (0, 1), (0, -1), 'CENTER'),  # Columna #
-            ('ALIGN', (2, 1), (2, -1), 'RIGHT'),   # Precio
-            ('ALIGN', (3, 1), (3, -1), 'CENTER'),  # Cantidad
-            ('ALIGN', (4, 1), (4, -1), 'RIGHT'),   # Subtotal
-            ('FONTNAME', (0, 1), (-1, -2), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -2), 9),
-            ('BOTTOMPADDING', (0, 1), (-1, -2), 6),
-            ('TOPPADDING', (0, 1), (-1, -2), 6),
-            
-            # Fila de total
-            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#FFF7E6')),
-            ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#155724')),
-            ('ALIGN', (3, -1), (3, -1), 'RIGHT'),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, -1), (-1, -1), 12),
-            ('BOTTOMPADDING', (0, -1), (-1, -1), 10),
-            ('TOPPADDING', (0, -1), (-1, -1), 10),
-            
-            # Bordes
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('LINEBELOW', (0, 0), (-1, 0), 2, colors.HexColor('#F7C548')),
-        ]))
-        elementos.append(tabla_productos)
-        elementos.append(Spacer(1, 20))
-        
-        # ===== NOTAS =====
-        if orden.notas:
-            subtitulo_notas = Paragraph("NOTAS / OBSERVACIONES", subtitulo_style)
-            elementos.append(subtitulo_notas)
-            
-            notas_texto = Paragraph(orden.notas, normal_style)
-            elementos.append(notas_texto)
-            elementos.append(Spacer(1, 20))
-        
-        # ===== PIE DE PÁGINA =====
-        elementos.append(Spacer(1, 30))
-        
-        pie_texto = f"""
-        <para align=center>
-        <font size=8 color=#666666>
-        Documento generado el {datetime.now().strftime('%d/%m/%Y a las %H:%M')}<br/>
-        Sistema de Gestión de Órdenes de Compra
-        </font>
-        </para>
-        """
-        pie = Paragraph(pie_texto, styles['Normal'])
-        elementos.append(pie)
-        
-        # Construir el PDF
-        doc.build(elementos)
-        
-        # Preparar la respuesta
-        buffer.seek(0)
-        response = HttpResponse(buffer.read(), content_type='application/pdf')
+        # PDF en caché por (orden, updated_at, proveedor); solo se genera si algo impreso cambió
+        contenido = obtener_pdf_orden(orden)
+
+        response = HttpResponse(contenido, content_type='application/pdf')
         response['Content-Disposition'] = f'attachment; filename="Orden_{orden.numero_orden}.pdf"'
         
         return response
@@ -1362,21 +1188,328 @@ def update_orden_estado(request, pk):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Actualizar el estado
-        orden.estado = nuevo_estado
-        orden.save(update_fields=['estado', 'updated_at'])
+        # Actualizar el estado y reflejar la recepción (o su reversión) en el stock
+        with transaction.atomic():
+            # Bloquear la orden antes de leer lo que aporta al stock: dos cambios
+            # simultáneos no deben registrar la misma recepción dos veces
+            orden = OrdenProveedor.objects.select_for_update().get(pk=orden.pk)
+            validar_transicion_estado(orden, nuevo_estado)
+            recepcion_anterior = get_recepcion_orden(orden)
+            estado_anterior = orden.estado
+            orden.estado = nuevo_estado
+            orden.save(update_fields=['estado', 'updated_at'])
+            registrar_diferencia_recepcion(orden, recepcion_anterior, usuario=request.user)
+
+            if nuevo_estado != estado_anterior:
+                registrar_cambios_estado([(orden, estado_anterior)], usuario=request.user)
+
+            # El PDF cambia con el estado: dejarlo generado en segundo plano
+            programar_pdf_orden(orden.id)
 
         # Responder con la orden actualizada
         data = {
             "id": orden.id,
             "numero_orden": orden.numero_orden,
             "estado": orden.estado,
+            "fecha_recepcion": orden.fecha_recepcion,
             "updated_at": orden.updated_at,
         }
         return Response(data, status=status.HTTP_200_OK)
 
+    except TransicionEstadoInvalidaError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response(
             {"error": f"Error inesperado al actualizar el estado: {str(e)}"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+
+# ========================================
+# CAMBIO DE ESTADO DE VARIAS ÓRDENES
+# ========================================
+
+MAX_ORDENES_CAMBIO_ESTADO = 500
+
+
+## Cambiar el estado de varias órdenes (POST)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, RolePermission(SUPPLIER_MANAGER_ROLES)])
+def update_ordenes_estado_bulk(request):
+    """
+    Cambia el estado de varias órdenes en una sola transacción.
+    Espera:
+    {
+        "orden_ids": [1, 2, 3],
+        "estado": "recibida"
+    }
+    Si alguna orden no existe o no puede pasar al estado pedido, responde 400
+    con el detalle por orden y no cambia ninguna. Las órdenes que entran o
+    salen de 'recibida' registran sus movimientos de stock en bloque.
+    """
+    try:
+        orden_ids = request.data.get('orden_ids')
+        nuevo_estado = request.data.get('estado')
+
+        if not nuevo_estado:
+            return Response(
+                {"error": "El campo 'estado' es obligatorio."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        estados_permitidos = [valor for valor, _ in OrdenProveedor.ESTADO_CHOICES]
+        if nuevo_estado not in estados_permitidos:
+            return Response(
+                {"error": f"Estado inválido. Los estados permitidos son: {', '.join(estados_permitidos)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not isinstance(orden_ids, list) or not orden_ids:
+            return Response(
+                {"error": "El campo 'orden_ids' debe ser una lista con al menos un ID."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if len(orden_ids) > MAX_ORDENES_CAMBIO_ESTADO:
+            return Response(
+                {"error": f"Se pueden cambiar máximo {MAX_ORDENES_CAMBIO_ESTADO} órdenes por solicitud."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            orden_ids = [int(orden_id) for orden_id in orden_ids]
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "Los IDs de las órdenes deben ser enteros."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
+            cambiadas, sin_cambios = cambiar_estado_ordenes(orden_ids, nuevo_estado, usuario=request.user)
+
+            # El PDF cambia con el estado: dejarlos generados en segundo plano
+            for orden in cambiadas:
+                programar_pdf_orden(orden.id)
+
+        data = {
+            "estado": nuevo_estado,
+            "actualizadas": [
+                {
+                    "id": orden.id,
+                    "numero_orden": orden.numero_orden,
+                    "estado": orden.estado,
+                    "fecha_recepcion": orden.fecha_recepcion,
+                    "updated_at": orden.updated_at,
+                }
+                for orden in cambiadas
+            ],
+            "sin_cambios": [orden.id for orden in sin_cambios],
+        }
+        return Response(data, status=status.HTTP_200_OK)
+
+    except TransicionEstadoInvalidaError as e:
+        return Response({"error": str(e), "detalles": e.errores}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response(
+            {"error": f"Error inesperado al actualizar el estado de las órdenes: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+# ========================================
+# REPORTES DE ÓRDENES
+# ========================================
+
+def _rango_fechas_reporte(request, dias_por_defecto):
+    """
+    Lee start_date / end_date (YYYY-MM-DD) de la consulta. Sin fechas usa los
+    últimos `dias_por_defecto` días hasta hoy. Lanza ValueError si son inválidas.
+    """
+    start_date_str = request.query_params.get('start_date')
+    end_date_str = request.query_params.get('end_date')
+
+    hoy = timezone.localdate()
+    fecha_fin = datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else hoy
+    fecha_inicio = (
+        datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str
+        else fecha_fin - timedelta(days=dias_por_defecto - 1)
+    )
+    if fecha_inicio > fecha_fin:
+        raise ValueError("start_date no puede ser posterior a end_date.")
+    return fecha_inicio, fecha_fin
+
+
+## Historial de estados de una orden (GET)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, RolePermission(SUPPLIER_MANAGER_ROLES)])
+def list_historial_orden(request, pk):
+    """Cambios de estado de una orden, del más antiguo al más reciente."""
+    try:
+        orden = get_object_or_404(OrdenProveedor, pk=pk)
+        historial = orden.historial_estados.select_related('usuario').order_by('fecha', 'id')
+
+        data = {
+            "id": orden.id,
+            "numero_orden": orden.numero_orden,
+            "estado": orden.estado,
+            "historial": [{
+                "estado_anterior": h.estado_anterior,
+                "estado_nuevo": h.estado_nuevo,
+                "fecha": h.fecha,
+                "dias_desde_orden": round(h.segundos_desde_orden / 86400, 2),
+                "total": str(h.total),
+                "usuario": h.usuario.username if h.usuario else None,
+            } for h in historial],
+        }
+        return Response(data, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        return Response(
+            {"error": f"Error al obtener el historial de la orden: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+## Tiempos de entrega por proveedor (GET)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, RolePermission(SUPPLIER_MANAGER_ROLES)])
+def reporte_tiempos_entrega(request):
+    """
+    Tiempo desde la creación de la orden hasta su recepción, por proveedor:
+    promedio, mínimo, máximo y percentiles 50/90/95 (en días).
+    Filtros opcionales: start_date, end_date (fecha de recepción, YYYY-MM-DD;
+    por defecto los últimos 90 días) y proveedor_id.
+    """
+    try:
+        try:
+            fecha_inicio, fecha_fin = _rango_fechas_reporte(request, 90)
+        except ValueError:
+            return Response(
+                {"error": "Rango de fechas inválido. Use YYYY-MM-DD y start_date <= end_date."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        proveedores = get_tiempos_entrega(
+            fecha_inicio, fecha_fin, proveedor_id=request.query_params.get('proveedor_id')
+        )
+        return Response({
+            "fecha_inicio": fecha_inicio.strftime('%Y-%m-%d'),
+            "fecha_fin": fecha_fin.strftime('%Y-%m-%d'),
+            "percentiles": list(PERCENTILES_ENTREGA),
+            "proveedores": proveedores,
+        }, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        return Response(
+            {"error": f"Error al calcular los tiempos de entrega: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+MAX_DIAS_REPORTE_TRANSITO = 3660
+
+
+## Valor en tránsito por día (GET)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, RolePermission(SUPPLIER_MANAGER_ROLES)])
+def reporte_valor_en_transito(request):
+    """
+    Valor total y número de órdenes en tránsito al cierre de cada día.
+    Filtros opcionales: start_date, end_date (YYYY-MM-DD; por defecto los últimos 30 días).
+    """
+    try:
+        try:
+            fecha_inicio, fecha_fin = _rango_fechas_reporte(request, 30)
+        except ValueError:
+            return Response(
+                {"error": "Rango de fechas inválido. Use YYYY-MM-DD y start_date <= end_date."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if (fecha_fin - fecha_inicio).days >= MAX_DIAS_REPORTE_TRANSITO:
+            return Response(
+                {"error": f"El rango máximo es de {MAX_DIAS_REPORTE_TRANSITO} días."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        dias = get_valor_en_transito(fecha_inicio, fecha_fin)
+        return Response({
+            "fecha_inicio": fecha_inicio.strftime('%Y-%m-%d'),
+            "fecha_fin": fecha_fin.strftime('%Y-%m-%d'),
+            "dias": [{
+                "fecha": d["fecha"].strftime('%Y-%m-%d'),
+                "valor_en_transito": float(d["valor_en_transito"]),
+                "ordenes_en_transito": d["ordenes_en_transito"],
+            } for d in dias],
+        }, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        return Response(
+            {"error": f"Error al calcular el valor en tránsito: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+# ========================================
+# EXPORTAR VARIAS ÓRDENES
+# ========================================
+
+## Descargar varias órdenes en un ZIP de PDFs (GET)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, RolePermission(SUPPLIER_MANAGER_ROLES)])
+def descargar_ordenes_zip(request):
+    """
+    Descarga en un ZIP el PDF de cada orden que cumpla los filtros.
+    Filtros opcionales: proveedor_id, estado, start_date, end_date (YYYY-MM-DD).
+
+    Las órdenes y sus detalles se cargan en dos consultas; los PDFs se generan
+    en paralelo en un pool de procesos y el ZIP se envía en streaming.
+    """
+    try:
+        ordenes = OrdenProveedor.objects.select_related('proveedor', 'creado_por').prefetch_related('detalles')
+
+        proveedor_id = request.query_params.get('proveedor_id')
+        estado = request.query_params.get('estado')
+        start_date_str = request.query_params.get('start_date')
+        end_date_str = request.query_params.get('end_date')
+
+        if proveedor_id:
+            ordenes = ordenes.filter(proveedor_id=proveedor_id)
+        if estado:
+            ordenes = ordenes.filter(estado=estado)
+        try:
+            if start_date_str:
+                start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+                ordenes = ordenes.filter(fecha_orden__gte=datetime.combine(start_date, time.min))
+            if end_date_str:
+                end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+                ordenes = ordenes.filter(fecha_orden__lte=datetime.combine(end_date, time.max))
+        except ValueError:
+            return Response(
+                {"error": "Formato de fecha inválido. Use YYYY-MM-DD."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ordenes = list(ordenes.order_by('fecha_orden', 'id')[:MAX_ORDENES_ZIP + 1])
+        if not ordenes:
+            return Response(
+                {"error": "No se encontraron órdenes con los filtros indicados."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if len(ordenes) > MAX_ORDENES_ZIP:
+            return Response(
+                {"error": f"Se pueden exportar máximo {MAX_ORDENES_ZIP} órdenes por descarga. Ajuste los filtros."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        datos_ordenes = [datos_orden_pdf(orden) for orden in ordenes]
+
+        response = StreamingHttpResponse(generar_zip_ordenes(datos_ordenes), content_type='application/zip')
+        response['Content-Disposition'] = 'attachment; filename="ordenes_proveedor.zip"'
+        return response
+
+    except Exception as e:
+        return Response(
+            {"error": f"Error al generar el ZIP de órdenes: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
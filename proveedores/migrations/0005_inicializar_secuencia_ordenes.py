@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def inicializar_secuencia(apps, schema_editor):
+    """
+    Deja la secuencia 'OP-' en el consecutivo más alto ya emitido,
+    para que los nuevos códigos continúen la numeración existente.
+    """
+    Secuencia = apps.get_model('core', 'Secuencia')
+    OrdenProveedor = apps.get_model('proveedores', 'OrdenProveedor')
+
+    ultimo = 0
+    for codigo in OrdenProveedor.objects.filter(numero_orden__startswith='OP-').values_list('numero_orden', flat=True).iterator():
+        numero = codigo[len('OP-'):]
+        if numero.isdigit():
+            ultimo = max(ultimo, int(numero))
+
+    Secuencia.objects.update_or_create(prefijo='OP-', defaults={'ultimo_valor': ultimo})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('proveedores', '0004_ordenproveedor_tarjeta_alter_ordenproveedor_estado'),
+    ]
+
+    operations = [
+        migrations.RunPython(inicializar_secuencia, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2 on 2026-10-16 23:36
+
+from django.db import migrations, models
+
+
+def cargar_fecha_recepcion(apps, schema_editor):
+    """
+    Las órdenes ya recibidas no guardaron cuándo se recibieron: se toma su
+    última actualización como la mejor aproximación disponible.
+    """
+    OrdenProveedor = apps.get_model('proveedores', 'OrdenProveedor')
+    OrdenProveedor.objects.filter(estado='recibida', fecha_recepcion__isnull=True).update(
+        fecha_recepcion=models.F('updated_at')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proveedores', '0005_inicializar_secuencia_ordenes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordenproveedor',
+            name='fecha_recepcion',
+            field=models.DateTimeField(blank=True, help_text="Momento en que la orden pasó a 'recibida' (vacío si no está recibida)", null=True, verbose_name='Fecha de Recepción'),
+        ),
+        migrations.AddIndex(
+            model_name='ordenproveedor',
+            index=models.Index(fields=['estado', 'fecha_recepcion'], name='ordenes_pro_estado_2de54d_idx'),
+        ),
+        migrations.RunPython(cargar_fecha_recepcion, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,116 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def validar_productos_huerfanos(apps, schema_editor):
+    """
+    Antes de crear la llave foránea, verifica que todo producto_id de las
+    líneas de órdenes (incluidas las eliminadas lógicamente) exista en
+    productos. Si hay huérfanos la migración se detiene y los lista para
+    corregirlos a mano: no se inventan productos ni se borran líneas.
+    """
+    OrdenProveedorDetalle = apps.get_model('proveedores', 'OrdenProveedorDetalle')
+    Producto = apps.get_model('productos', 'Producto')
+
+    huerfanos = list(
+        OrdenProveedorDetalle.objects
+        .exclude(producto_id__in=Producto.objects.values('id'))
+        .order_by('producto_id', 'id')
+        .values_list('id', 'producto_id')
+    )
+    if huerfanos:
+        muestra = ", ".join(f"detalle {detalle_id} → producto {producto_id}" for detalle_id, producto_id in huerfanos[:50])
+        raise RuntimeError(
+            f"Hay {len(huerfanos)} línea(s) de órdenes de proveedor con producto_id inexistente "
+            f"({muestra}{', ...' if len(huerfanos) > 50 else ''}). "
+            "Corrija o elimine esas líneas y vuelva a ejecutar la migración."
+        )
+
+
+class Migration(migrations.Migration):
+    """
+    Convierte OrdenProveedorDetalle.producto_id (entero suelto) en la llave
+    foránea `producto` sin copiar datos: la columna sigue siendo producto_id,
+    solo cambia su tipo (al del id de productos) y se agrega la restricción.
+    """
+
+    dependencies = [
+        ('productos', '0004_producto_proveedor'),
+        ('proveedores', '0006_ordenproveedor_fecha_recepcion'),
+    ]
+
+    operations = [
+        migrations.RunPython(validar_productos_huerfanos, migrations.RunPython.noop),
+
+        # Índices que nombran el campo viejo; se recrean sobre `producto` al final
+        migrations.RemoveIndex(
+            model_name='ordenproveedordetalle',
+            name='ordenes_pro_orden_p_290c41_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='ordenproveedordetalle',
+            unique_together=set(),
+        ),
+
+        # Renombrar solo en el estado de Django, fijando la columna existente
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='ordenproveedordetalle',
+                    name='producto_id',
+                    field=models.IntegerField(db_column='producto_id', db_index=True, verbose_name='ID del Producto'),
+                ),
+                migrations.RenameField(
+                    model_name='ordenproveedordetalle',
+                    old_name='producto_id',
+                    new_name='producto',
+                ),
+            ],
+        ),
+
+        # Índice compuesto que empieza por producto: reemplaza al índice simple
+        # y sirve a la llave foránea
+        migrations.AddIndex(
+            model_name='ordenproveedordetalle',
+            index=models.Index(
+                fields=['producto', 'deleted_at', 'orden_proveedor', 'cantidad'],
+                name='ordprov_det_prod_stock_idx',
+            ),
+        ),
+
+        # Cambio real en la base de datos: tipo de la columna + restricción FK
+        migrations.AlterField(
+            model_name='ordenproveedordetalle',
+            name='producto',
+            field=models.ForeignKey(
+                db_column='producto_id',
+                db_index=False,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name='detalles_orden_proveedor',
+                to='productos.producto',
+                verbose_name='Producto',
+            ),
+        ),
+
+        # Quitar db_column del estado (la columna ya se llama producto_id)
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='ordenproveedordetalle',
+                    name='producto',
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name='detalles_orden_proveedor',
+                        to='productos.producto',
+                        verbose_name='Producto',
+                    ),
+                ),
+            ],
+        ),
+
+        migrations.AlterUniqueTogether(
+            name='ordenproveedordetalle',
+            unique_together={('orden_proveedor', 'producto')},
+        ),
+    ]
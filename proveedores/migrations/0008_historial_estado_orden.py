@@ -0,0 +1,86 @@
+# Generated by Django 4.2 on 2026-10-16 23:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def cargar_historial_inicial(apps, schema_editor):
+    """
+    Las órdenes existentes no guardaron sus cambios de estado. Se registra su
+    creación (como 'pendiente', en fecha_orden) y, si ya avanzaron, un único
+    cambio al estado actual en fecha_recepcion (recibidas) o updated_at.
+    """
+    OrdenProveedor = apps.get_model('proveedores', 'OrdenProveedor')
+    HistorialEstadoOrden = apps.get_model('proveedores', 'HistorialEstadoOrden')
+
+    registros = []
+    for orden in OrdenProveedor.objects.all().iterator():
+        registros.append(HistorialEstadoOrden(
+            orden_id=orden.id, proveedor_id=orden.proveedor_id,
+            estado_anterior=None, estado_nuevo='pendiente',
+            fecha=orden.fecha_orden, segundos_desde_orden=0, total=orden.total,
+        ))
+        if orden.estado != 'pendiente':
+            fecha = orden.fecha_recepcion or orden.updated_at
+            registros.append(HistorialEstadoOrden(
+                orden_id=orden.id, proveedor_id=orden.proveedor_id,
+                estado_anterior='pendiente', estado_nuevo=orden.estado,
+                fecha=fecha, segundos_desde_orden=max(int((fecha - orden.fecha_orden).total_seconds()), 0),
+                total=orden.total,
+            ))
+        if len(registros) >= 1000:
+            HistorialEstadoOrden.objects.bulk_create(registros)
+            registros = []
+    HistorialEstadoOrden.objects.bulk_create(registros)
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('proveedores', '0007_ordenproveedordetalle_producto_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistorialEstadoOrden',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Eliminación Lógica')),
+                ('estado_anterior', models.CharField(blank=True, choices=[('pendiente', 'En Cotización'), ('confirmada', 'Pagada'), ('en_transito', 'En Tránsito'), ('recibida', 'Inventariada')], help_text='Vacío cuando la orden se crea', max_length=20, null=True, verbose_name='Estado anterior')),
+                ('estado_nuevo', models.CharField(choices=[('pendiente', 'En Cotización'), ('confirmada', 'Pagada'), ('en_transito', 'En Tránsito'), ('recibida', 'Inventariada')], max_length=20, verbose_name='Estado nuevo')),
+                ('fecha', models.DateTimeField(verbose_name='Fecha del cambio')),
+                ('segundos_desde_orden', models.PositiveBigIntegerField(default=0, verbose_name='Segundos desde la creación de la orden')),
+                ('total', models.DecimalField(decimal_places=2, default=0.0, max_digits=12, verbose_name='Total de la orden al momento del cambio')),
+                ('orden', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historial_estados', to='proveedores.ordenproveedor', verbose_name='Orden de Proveedor')),
+                ('proveedor', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='historial_estados_ordenes', to='proveedores.proveedor', verbose_name='Proveedor')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cambios_estado_ordenes', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Cambio de Estado de Orden',
+                'verbose_name_plural': 'Historial de Estados de Órdenes',
+                'db_table': 'ordenes_proveedor_historial_estado',
+                'ordering': ['fecha', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='historialestadoorden',
+            index=models.Index(fields=['orden', 'fecha'], name='ordenes_pro_orden_i_b97110_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialestadoorden',
+            index=models.Index(fields=['estado_nuevo', 'fecha'], name='ordenes_pro_estado__a276a8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialestadoorden',
+            index=models.Index(fields=['estado_anterior', 'fecha'], name='ordenes_pro_estado__316146_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialestadoorden',
+            index=models.Index(fields=['proveedor', 'estado_nuevo', 'fecha'], name='ordenes_pro_proveed_84ffce_idx'),
+        ),
+        migrations.RunPython(cargar_historial_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2 on 2026-10-17 00:30
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def cargar_valor_transito(apps, schema_editor):
+    """
+    Calcula valor_transito del historial existente recorriéndolo por orden:
+    cada entrada a 'en_transito' guarda su total y cada salida resta el total
+    de la entrada anterior de la misma orden.
+    """
+    HistorialEstadoOrden = apps.get_model('proveedores', 'HistorialEstadoOrden')
+
+    entradas = {}
+    cambios = []
+    for registro in (
+        HistorialEstadoOrden.objects
+        .filter(Q(estado_nuevo='en_transito') | Q(estado_anterior='en_transito'))
+        .order_by('orden_id', 'id')
+        .iterator()
+    ):
+        if registro.estado_nuevo == 'en_transito':
+            entradas[registro.orden_id] = registro.total
+            registro.valor_transito = registro.total
+        else:
+            registro.valor_transito = -entradas.get(registro.orden_id, 0)
+        cambios.append(registro)
+        if len(cambios) >= 1000:
+            HistorialEstadoOrden.objects.bulk_update(cambios, ['valor_transito'])
+            cambios = []
+    HistorialEstadoOrden.objects.bulk_update(cambios, ['valor_transito'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proveedores', '0008_historial_estado_orden'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historialestadoorden',
+            name='valor_transito',
+            field=models.DecimalField(decimal_places=2, default=0.0, help_text="+total al entrar a 'en_transito', -total de esa entrada al salir, 0 en otros cambios", max_digits=12, verbose_name='Cambio en el valor en tránsito'),
+        ),
+        migrations.RunPython(cargar_valor_transito, migrations.RunPython.noop),
+    ]
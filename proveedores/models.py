@@ -1,5 +1,6 @@
 # proveedor/models.py
 from django.db import models
+from django.utils import timezone
 from user.models import User 
 from user.base.models import BaseModel # Importa tu modelo base
 from tarjetabancaria.models import TarjetaBancaria
@@ -87,6 +88,18 @@ class OrdenProveedor(BaseModel):
         ('en_transito', 'En Tránsito'),
         ('recibida', 'Inventariada'),
     ]
+
+    # Cambios de estado permitidos: avanzar en el flujo o retroceder un paso
+    # para corregir (retroceder desde 'recibida' revierte su entrada al stock)
+    TRANSICIONES_ESTADO = {
+        'pendiente':   ['confirmada', 'en_transito', 'recibida'],
+        'confirmada':  ['pendiente', 'en_transito', 'recibida'],
+        'en_transito': ['confirmada', 'recibida'],
+        'recibida':    ['en_transito'],
+    }
+
+    # Prefijo de la secuencia de números de orden (core.Secuencia)
+    PREFIJO_NUMERO = 'OP-'
     
     estado = models.CharField(
         max_length=20,
@@ -109,6 +122,13 @@ class OrdenProveedor(BaseModel):
         null=True,
         verbose_name="Notas / Observaciones"
     )
+
+    fecha_recepcion = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Fecha de Recepción",
+        help_text="Momento en que la orden pasó a 'recibida' (vacío si no está recibida)"
+    )
     
     creado_por = models.ForeignKey(
         User,
@@ -127,10 +147,24 @@ class OrdenProveedor(BaseModel):
             models.Index(fields=['proveedor', 'estado']),
             models.Index(fields=['numero_orden']),
             models.Index(fields=['fecha_orden']),
+            models.Index(fields=['estado', 'fecha_recepcion']),
         ]
     
     def __str__(self):
         return f"Orden {self.numero_orden} - {self.proveedor.nombre_empresa}"
+
+    def save(self, *args, **kwargs):
+        """Mantiene fecha_recepcion de acuerdo con el estado de la orden"""
+        if self.estado == 'recibida':
+            if self.fecha_recepcion is None:
+                self.fecha_recepcion = timezone.now()
+        else:
+            self.fecha_recepcion = None
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'estado' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'fecha_recepcion'}
+        super().save(*args, **kwargs)
     
     # 🔥 AGREGAR ESTE MÉTODO
     def calcular_total(self):
@@ -140,7 +174,7 @@ class OrdenProveedor(BaseModel):
             for detalle in self.detalles.all()
         )
         self.total = total
-        self.save(update_fields=['total'])
+        self.save(update_fields=['total', 'updated_at'])
         return total
 
 
@@ -162,10 +196,13 @@ class OrdenProveedorDetalle(BaseModel):
         verbose_name="Proveedor"
     )
     
-    producto_id = models.IntegerField(
-        verbose_name="ID del Producto",
-        help_text="ID del producto desde el sistema de inventario",
-        db_index=True
+    # Sin índice propio: lo cubre el índice compuesto que empieza por producto
+    producto = models.ForeignKey(
+        'productos.Producto',
+        on_delete=models.PROTECT,
+        related_name='detalles_orden_proveedor',
+        verbose_name="Producto",
+        db_index=False
     )
     
     nombre = models.CharField(
@@ -207,10 +244,16 @@ class OrdenProveedorDetalle(BaseModel):
         db_table = "ordenes_proveedor_detalle"
         ordering = ['id']
         indexes = [
-            models.Index(fields=['orden_proveedor', 'producto_id']),
+            # Totales recibidos e historial de compras por producto: el filtro
+            # (producto, deleted_at), el join a la cabecera y la cantidad salen
+            # del índice sin leer la fila
+            models.Index(
+                fields=['producto', 'deleted_at', 'orden_proveedor', 'cantidad'],
+                name='ordprov_det_prod_stock_idx'
+            ),
             models.Index(fields=['proveedor']),
         ]
-        unique_together = [['orden_proveedor', 'producto_id']]
+        unique_together = [['orden_proveedor', 'producto']]
     
     def __str__(self):
         return f"{self.nombre} - Cantidad: {self.cantidad}"
@@ -229,4 +272,86 @@ class OrdenProveedorDetalle(BaseModel):
         orden = self.orden_proveedor
         super().delete(*args, **kwargs)
         if orden:
-            orden.calcular_total()
\ No newline at end of file
+            orden.calcular_total()
+
+class HistorialEstadoOrden(BaseModel):
+    """
+    Registro (solo inserción) de cada cambio de estado de una orden de proveedor.
+    Guarda el total de la orden, el tiempo transcurrido desde su creación y
+    cuánto cambia el valor en tránsito en el momento del cambio, para medir
+    tiempos de entrega y valor en tránsito sin reconstruir las órdenes.
+    """
+    orden = models.ForeignKey(
+        OrdenProveedor,
+        on_delete=models.CASCADE,
+        related_name='historial_estados',
+        verbose_name="Orden de Proveedor"
+    )
+
+    proveedor = models.ForeignKey(
+        Proveedor,
+        on_delete=models.PROTECT,
+        related_name='historial_estados_ordenes',
+        verbose_name="Proveedor"
+    )
+
+    estado_anterior = models.CharField(
+        max_length=20,
+        choices=OrdenProveedor.ESTADO_CHOICES,
+        blank=True,
+        null=True,
+        verbose_name="Estado anterior",
+        help_text="Vacío cuando la orden se crea"
+    )
+
+    estado_nuevo = models.CharField(
+        max_length=20,
+        choices=OrdenProveedor.ESTADO_CHOICES,
+        verbose_name="Estado nuevo"
+    )
+
+    fecha = models.DateTimeField(verbose_name="Fecha del cambio")
+
+    segundos_desde_orden = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name="Segundos desde la creación de la orden"
+    )
+
+    total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0.00,
+        verbose_name="Total de la orden al momento del cambio"
+    )
+
+    valor_transito = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0.00,
+        verbose_name="Cambio en el valor en tránsito",
+        help_text="+total al entrar a 'en_transito', -total de esa entrada al salir, 0 en otros cambios"
+    )
+
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='cambios_estado_ordenes',
+        verbose_name="Usuario"
+    )
+
+    class Meta:
+        verbose_name = "Cambio de Estado de Orden"
+        verbose_name_plural = "Historial de Estados de Órdenes"
+        db_table = "ordenes_proveedor_historial_estado"
+        ordering = ['fecha', 'id']
+        indexes = [
+            models.Index(fields=['orden', 'fecha']),
+            models.Index(fields=['estado_nuevo', 'fecha']),
+            models.Index(fields=['estado_anterior', 'fecha']),
+            models.Index(fields=['proveedor', 'estado_nuevo', 'fecha']),
+        ]
+
+    def __str__(self):
+        return f"{self.orden_id}: {self.estado_anterior or '-'} → {self.estado_nuevo} ({self.fecha})"
@@ -1,3 +1,394 @@
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+
+from django.db import connection, transaction
+from django.db.migrations.loader import MigrationLoader
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from categoria.models import Categoria
+from inventarioproducto.api.utils import get_stock_producto
+from productos.models import Producto
+from proveedores.api.historial import get_valor_en_transito
+from proveedores.api.pdf import ruta_pdf_orden
+from proveedores.models import Proveedor, OrdenProveedor, OrdenProveedorDetalle, HistorialEstadoOrden
+from tarjetabancaria.models import TarjetaBancaria
+from user.models import User
+
+
+class ListProveedoresConOrdenesConsultasTests(TestCase):
+    """list_proveedores_con_ordenes corre un número fijo de consultas sin importar el tamaño de la página."""
+
+    CONSULTAS = 4  # count, proveedores, órdenes del rango con su tarjeta, detalles
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='compras', role='admin')
+        categoria = Categoria.objects.create(nombre='Cat')
+        tarjeta = TarjetaBancaria.objects.create(nombre='Caja')
+
+        for i in range(6):
+            proveedor = Proveedor.objects.create(nombre_empresa=f'Prov {i}', ciudad='X')
+            productos = [
+                Producto.objects.create(
+                    nombre=f'P{i}-{j}', categoria=categoria, proveedor=proveedor, precio_compra=10,
+                    porcentaje_ganancia=10, precio_final=11, codigo_busqueda=f'C{i}-{j}',
+                )
+                for j in range(3)
+            ]
+            for k in range(2):
+                orden = OrdenProveedor.objects.create(
+                    proveedor=proveedor, tarjeta=tarjeta, numero_orden=f'OP-{i}-{k}',
+                )
+                for producto in productos:
+                    OrdenProveedorDetalle.objects.create(
+                        orden_proveedor=orden, proveedor=proveedor, producto=producto,
+                        nombre=producto.nombre, precio_compra=Decimal('5.00'), cantidad=2,
+                    )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def test_consultas_fijas_por_pagina(self):
+        for page_size in (2, 6):
+            with self.subTest(page_size=page_size), self.assertNumQueries(self.CONSULTAS):
+                respuesta = self.client.get('/api/suppliers/ordenes/by-proveedor/', {'page_size': page_size})
+            self.assertEqual(respuesta.status_code, 200)
+
+            proveedores = respuesta.json()['results']
+            self.assertEqual(len(proveedores), page_size)
+            self.assertEqual(proveedores[0]['cantidad_ordenes'], 2)
+            self.assertEqual(proveedores[0]['total'], 60.0)
+            orden = proveedores[0]['ordenesPedido'][0]
+            self.assertEqual(orden['cantidad_productos'], 3)
+            self.assertEqual(orden['tarjeta_bancaria'], 'Caja')
+
+
+class ValorEnTransitoTests(TestCase):
+    """get_valor_en_transito suma el valor guardado en el historial, sin releer cada entrada."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='compras', role='admin')
+        categoria = Categoria.objects.create(nombre='Cat')
+        cls.proveedor = Proveedor.objects.create(nombre_empresa='Prov', ciudad='X')
+        cls.tarjeta = TarjetaBancaria.objects.create(nombre='Caja')
+        cls.producto = Producto.objects.create(
+            nombre='P0', categoria=categoria, proveedor=cls.proveedor, precio_compra=10,
+            porcentaje_ganancia=10, precio_final=11, codigo_busqueda='C0',
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def _crear_orden(self, precio):
+        respuesta = self.client.post('/api/suppliers/ordenes/create/', {
+            'proveedor_id': self.proveedor.id,
+            'tarjeta_id': self.tarjeta.id,
+            'detalles': [{'producto_id': self.producto.id, 'nombre': 'P0', 'precio_compra': precio, 'cantidad': 1}],
+        }, format='json').json()
+        return respuesta['id'], respuesta['detalles'][0]['id']
+
+    def _cambiar_estado(self, orden_id, estado):
+        respuesta = self.client.patch(f'/api/suppliers/ordenes/{orden_id}/update-estado/', {'estado': estado}, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+
+    def _cierre(self, dia):
+        with self.assertNumQueries(3):
+            cierre = get_valor_en_transito(dia, dia)[-1]
+        return cierre['valor_en_transito'], cierre['ordenes_en_transito']
+
+    def test_entradas_salidas_y_eliminadas(self):
+        hoy = timezone.localdate()
+        manana = hoy + timedelta(days=1)
+
+        orden_id, detalle_id = self._crear_orden('50.00')
+        self._cambiar_estado(orden_id, 'en_transito')
+        self.assertEqual(self._cierre(hoy), (Decimal('50.00'), 1))
+
+        # Editar la orden en tránsito no cambia lo que restará su salida
+        self.client.put(f'/api/suppliers/detalles/{detalle_id}/update/', {'precio_compra': '10.00'}, format='json')
+        self._cambiar_estado(orden_id, 'recibida')
+        self.assertEqual(self._cierre(hoy), (Decimal('0.00'), 0))
+        self.assertEqual(
+            list(HistorialEstadoOrden.objects.filter(orden_id=orden_id).order_by('id').values_list('valor_transito', flat=True)),
+            [Decimal('0.00'), Decimal('50.00'), Decimal('-50.00')],
+        )
+
+        otra_id, _ = self._crear_orden('30.00')
+        self._cambiar_estado(otra_id, 'en_transito')
+        self.assertEqual(self._cierre(manana), (Decimal('30.00'), 1))  # saldo de apertura
+        self.client.delete(f'/api/suppliers/ordenes/{otra_id}/delete/')
+        self.assertEqual(self._cierre(hoy), (Decimal('0.00'), 0))
+        self.assertEqual(self._cierre(manana), (Decimal('0.00'), 0))
+
+
+class RutaPdfOrdenTests(TestCase):
+    """La ruta del PDF en caché cambia con cualquier dato impreso, no solo con la orden."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='compras', role='admin')
+        cls.proveedor = Proveedor.objects.create(nombre_empresa='Prov', ciudad='X')
+        cls.orden = OrdenProveedor.objects.create(
+            proveedor=cls.proveedor, tarjeta=TarjetaBancaria.objects.create(nombre='Caja'),
+            numero_orden='OP-PDF', creado_por=cls.usuario,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def _ruta(self):
+        return ruta_pdf_orden(OrdenProveedor.objects.select_related('proveedor', 'creado_por').get(pk=self.orden.pk))
+
+    def test_ruta_cambia_con_el_proveedor_y_el_creador(self):
+        ruta = self._ruta()
+        self.assertEqual(self._ruta(), ruta)
+
+        respuesta = self.client.put(
+            f'/api/suppliers/{self.proveedor.id}/update/', {'ciudad': 'Y', 'descripcion': 'Nueva'}, format='json'
+        )
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        ruta_proveedor = self._ruta()
+        self.assertNotEqual(ruta_proveedor, ruta)
+
+        User.objects.filter(pk=self.usuario.pk).update(username='compras2')
+        self.assertNotEqual(self._ruta(), ruta_proveedor)
+
+
+class SincronizarDetallesOrdenTests(TestCase):
+    """
+    Editar una orden compara sus líneas por producto y escribe solo las
+    diferencias; las líneas quitadas se eliminan lógicamente y se reactivan
+    si el producto vuelve.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='compras', role='admin')
+        categoria = Categoria.objects.create(nombre='Cat')
+        cls.proveedor = Proveedor.objects.create(nombre_empresa='Prov', ciudad='X')
+        cls.tarjeta = TarjetaBancaria.objects.create(nombre='Caja')
+        cls.productos = [
+            Producto.objects.create(
+                nombre=f'P{i}', categoria=categoria, proveedor=cls.proveedor, precio_compra=10,
+                porcentaje_ganancia=10, precio_final=11, codigo_busqueda=f'C{i}',
+            )
+            for i in range(4)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        respuesta = self.client.post('/api/suppliers/ordenes/create/', {
+            'proveedor_id': self.proveedor.id,
+            'tarjeta_id': self.tarjeta.id,
+            'detalles': [self._linea(p, 2) for p in self.productos[:3]],
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        self.orden = OrdenProveedor.objects.get(pk=respuesta.json()['id'])
+
+    def _linea(self, producto, cantidad, precio='5.00'):
+        return {'producto_id': producto.id, 'nombre': producto.nombre, 'precio_compra': precio, 'cantidad': cantidad}
+
+    def _actualizar(self, detalles):
+        respuesta = self.client.put(f'/api/suppliers/ordenes/{self.orden.id}/update/', {'detalles': detalles}, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+
+    def _lineas(self):
+        return {d.producto_id: d for d in OrdenProveedorDetalle.all_objects.filter(orden_proveedor=self.orden)}
+
+    def test_solo_escribe_las_diferencias(self):
+        p0, p1, p2, p3 = self.productos
+        antes = self._lineas()
+
+        self._actualizar([self._linea(p0, 2), self._linea(p1, 7), self._linea(p3, 1, '8.00')])
+
+        despues = self._lineas()
+        self.assertEqual(despues[p0.id].updated_at, antes[p0.id].updated_at)
+        self.assertEqual((despues[p1.id].id, despues[p1.id].cantidad, despues[p1.id].subtotal), (antes[p1.id].id, 7, Decimal('35.00')))
+        self.assertEqual(despues[p2.id].id, antes[p2.id].id)
+        self.assertIsNotNone(despues[p2.id].deleted_at)
+        self.assertIsNone(despues[p3.id].deleted_at)
+        self.orden.refresh_from_db()
+        self.assertEqual(self.orden.total, Decimal('53.00'))
+
+        # El producto quitado vuelve: se reactiva la misma fila
+        self._actualizar([self._linea(p0, 2), self._linea(p1, 7), self._linea(p2, 4), self._linea(p3, 1, '8.00')])
+        despues = self._lineas()
+        self.assertEqual(len(despues), 4)
+        self.assertEqual((despues[p2.id].id, despues[p2.id].cantidad), (antes[p2.id].id, 4))
+        self.assertIsNone(despues[p2.id].deleted_at)
+        self.orden.refresh_from_db()
+        self.assertEqual(self.orden.total, Decimal('73.00'))
+
+    def test_cambiar_una_cantidad_es_un_update(self):
+        p0, p1, p2, _ = self.productos
+        with CaptureQueriesContext(connection) as consultas:
+            self._actualizar([self._linea(p0, 2), self._linea(p1, 3), self._linea(p2, 2)])
+        escrituras = [
+            q['sql'] for q in consultas.captured_queries
+            if 'ordenes_proveedor_detalle' in q['sql'] and not q['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(len(escrituras), 1, escrituras)
+        self.assertTrue(escrituras[0].startswith('UPDATE'))
+
+    def test_rechaza_productos_repetidos(self):
+        p0 = self.productos[0]
+        respuesta = self.client.put(f'/api/suppliers/ordenes/{self.orden.id}/update/', {
+            'detalles': [self._linea(p0, 1), self._linea(p0, 2)],
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(self._lineas()[p0.id].cantidad, 2)
+
+
+class CambioEstadoOrdenesTests(TestCase):
+    """
+    Cambio de estado en bloque: valida todas las órdenes antes de escribir,
+    deja igual las que ya están en el estado pedido y lleva al stock solo las
+    que entran o salen de 'recibida'.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='compras', role='admin')
+        categoria = Categoria.objects.create(nombre='Cat')
+        cls.proveedor = Proveedor.objects.create(nombre_empresa='Prov', ciudad='X')
+        cls.tarjeta = TarjetaBancaria.objects.create(nombre='Caja')
+        cls.productos = [
+            Producto.objects.create(
+                nombre=f'P{i}', categoria=categoria, proveedor=cls.proveedor, precio_compra=10,
+                porcentaje_ganancia=10, precio_final=11, codigo_busqueda=f'C{i}',
+            )
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def _crear_orden(self, estado, cantidad=1):
+        respuesta = self.client.post('/api/suppliers/ordenes/create/', {
+            'proveedor_id': self.proveedor.id,
+            'tarjeta_id': self.tarjeta.id,
+            'estado': estado,
+            'detalles': [
+                {'producto_id': p.id, 'nombre': p.nombre, 'precio_compra': '5.00', 'cantidad': cantidad}
+                for p in self.productos
+            ],
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        return respuesta.json()['id']
+
+    def _cambiar(self, orden_ids, estado):
+        return self.client.post('/api/suppliers/ordenes/update-estado/', {'orden_ids': orden_ids, 'estado': estado}, format='json')
+
+    def _estados(self, orden_ids):
+        return list(OrdenProveedor.objects.filter(pk__in=orden_ids).order_by('id').values_list('estado', flat=True))
+
+    def _stock(self):
+        return [get_stock_producto(p.id) for p in self.productos]
+
+    def test_recibir_en_bloque(self):
+        pendiente = self._crear_orden('pendiente', 2)
+        en_transito = self._crear_orden('en_transito', 3)
+        recibida = self._crear_orden('recibida', 4)
+        self.assertEqual(self._stock(), [4, 4])
+
+        respuesta = self._cambiar([pendiente, en_transito, recibida], 'recibida')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(sorted(o['id'] for o in respuesta.json()['actualizadas']), [pendiente, en_transito])
+        self.assertEqual(respuesta.json()['sin_cambios'], [recibida])
+        self.assertEqual(self._stock(), [9, 9])
+        self.assertEqual(
+            HistorialEstadoOrden.objects.filter(orden_id__in=[pendiente, en_transito], estado_nuevo='recibida').count(), 2
+        )
+
+        # Revertir la recepción descuenta solo esas órdenes
+        respuesta = self._cambiar([pendiente, en_transito], 'en_transito')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(self._stock(), [4, 4])
+
+    def test_una_transicion_invalida_no_cambia_ninguna(self):
+        pendiente = self._crear_orden('pendiente')
+        recibida = self._crear_orden('recibida')
+
+        respuesta = self._cambiar([pendiente, recibida], 'confirmada')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual([d['orden_id'] for d in respuesta.json()['detalles']], [recibida])
+        self.assertEqual(self._estados([pendiente, recibida]), ['pendiente', 'recibida'])
+
+        respuesta = self._cambiar([pendiente, 999999], 'recibida')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(self._estados([pendiente]), ['pendiente'])
+        self.assertEqual(self._stock(), [1, 1])
+
+        self.assertEqual(self._cambiar([pendiente], 'cancelada').status_code, 400)
+        self.assertEqual(self._cambiar([], 'recibida').status_code, 400)
+
+    def test_consultas_no_crecen_con_las_ordenes(self):
+        # La primera recepción crea las filas de saldo y costo de los productos
+        self._cambiar([self._crear_orden('en_transito')], 'recibida')
+
+        consultas = []
+        for num_ordenes in (2, 5):
+            orden_ids = [self._crear_orden('en_transito') for _ in range(num_ordenes)]
+            with CaptureQueriesContext(connection) as capturadas:
+                respuesta = self._cambiar(orden_ids, 'recibida')
+            self.assertEqual(respuesta.status_code, 200, respuesta.content)
+            consultas.append(len(capturadas))
+        self.assertEqual(consultas[0], consultas[1])
+
+
+class ProductosHuerfanosMigracionTests(TestCase):
+    """
+    La migración de la llave foránea se detiene si alguna línea de orden
+    apunta a un producto que no existe, y deja pasar los eliminados lógicamente.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Cat')
+        proveedor = Proveedor.objects.create(nombre_empresa='Prov', ciudad='X')
+        tarjeta = TarjetaBancaria.objects.create(nombre='Caja')
+        cls.productos = [
+            Producto.objects.create(
+                nombre=f'P{i}', categoria=categoria, proveedor=proveedor, precio_compra=10,
+                porcentaje_ganancia=10, precio_final=11, codigo_busqueda=f'C{i}',
+            )
+            for i in range(2)
+        ]
+        orden = OrdenProveedor.objects.create(proveedor=proveedor, tarjeta=tarjeta, numero_orden='OP-H1')
+        cls.detalles = OrdenProveedorDetalle.objects.bulk_create([
+            OrdenProveedorDetalle(
+                orden_proveedor=orden, proveedor=proveedor, producto=producto, nombre=producto.nombre,
+                precio_compra=Decimal('1.00'), cantidad=1, subtotal=Decimal('1.00'),
+            )
+            for producto in cls.productos
+        ])
+
+    def _validar(self):
+        migracion = import_module('proveedores.migrations.0007_ordenproveedordetalle_producto_fk')
+        # Modelos como estaban antes de la migración (managers sin filtro de eliminación lógica)
+        estado = MigrationLoader(connection).project_state(migracion.Migration.dependencies)
+        migracion.validar_productos_huerfanos(estado.apps, None)
+
+    def test_pasa_con_productos_eliminados_logicamente(self):
+        self.productos[0].delete()
+        OrdenProveedorDetalle.objects.filter(pk=self.detalles[1].pk).update(deleted_at=timezone.now())
+        self._validar()
 
-# Create your tests here.
+    def test_se_detiene_con_productos_inexistentes(self):
+        # El producto se borra sin pasar por la llave foránea y se restaura al revertir
+        with transaction.atomic(), connection.constraint_checks_disabled():
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM productos WHERE id = %s', [self.productos[1].id])
+            with self.assertRaisesMessage(RuntimeError, f'detalle {self.detalles[1].id} → producto {self.productos[1].id}'):
+                self._validar()
+            transaction.set_rollback(True)
@@ -0,0 +1,165 @@
+import csv
+import json
+
+from django.db.models import Q, Prefetch
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from ventas.models import DetalleVenta, PagoVenta
+
+
+# ======================================================
+# Exportación por streaming del reporte de ventas
+# ======================================================
+# GET /api/ventas/reporte/?format=ndjson|csv
+#
+# DRF usa el parámetro `format` para elegir el renderer, por eso estos dos
+# renderers existen: permiten que la negociación acepte ndjson/csv. Las
+# respuestas de error (dict) se siguen escribiendo como JSON.
+
+class NDJSONRenderer(JSONRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class CSVRenderer(JSONRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+FORMATOS_EXPORTACION = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+VENTAS_POR_BLOQUE_EXPORTACION = 500
+
+COLUMNAS_CSV = [
+    "venta_id", "codigo", "fecha", "cliente", "creado_por", "metodo_pago", "pagos",
+    "subtotal", "descuento", "impuesto", "total",
+    "detalle_id", "producto_id", "producto", "cantidad", "precio_unitario", "subtotal_producto",
+]
+
+
+def serializar_venta_reporte(venta):
+    """Venta con sus productos y pagos, en el formato de `detalle_ventas` del reporte."""
+    productos_detalle = [
+        {
+            "venta_id"          : d.id,
+            "venta_completa_id" : venta.id,
+            "codigo_venta"      : venta.codigo,
+            "producto_id"       : d.producto.id,
+            "producto"          : d.producto.nombre,
+            "cantidad"          : d.cantidad,
+            "precio_unitario"   : float(d.precio_unitario),
+            "subtotal_producto" : float(d.cantidad * d.precio_unitario),
+        }
+        for d in venta.detalles.all()
+    ]
+
+    pagos_detalle = [
+        {
+            "metodo_pago": p.metodo_pago,
+            "monto": float(p.monto),
+            "tarjeta": p.tarjeta.nombre if p.tarjeta else None,
+        }
+        for p in venta.pagos.all()
+    ]
+
+    return {
+        "id": venta.id,
+        "codigo": venta.codigo,
+        "cliente": venta.cliente.nombre if venta.cliente else "Cliente no registrado",
+        "metodo_pago": venta.metodo_pago,
+        "pagos": pagos_detalle,
+        "subtotal": float(venta.subtotal),
+        "descuento": float(venta.descuento),
+        "impuesto": float(venta.impuesto),
+        "total": float(venta.total),
+        "fecha": venta.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+        "creado_por": venta.creado_por.username if venta.creado_por else "No asignado",
+        "productos_comprados": productos_detalle,
+    }
+
+
+def con_relaciones_reporte(ventas):
+    """Agrega al queryset de ventas las relaciones que usa serializar_venta_reporte."""
+    return (
+        ventas
+        .select_related("cliente", "creado_por")
+        .prefetch_related(
+            Prefetch("detalles", queryset=DetalleVenta.objects.select_related("producto")),
+            Prefetch("pagos", queryset=PagoVenta.objects.select_related("tarjeta")),
+        )
+    )
+
+
+def iterar_ventas_por_bloques(ventas, tamano=VENTAS_POR_BLOQUE_EXPORTACION):
+    """
+    Recorre las ventas (más recientes primero) de a `tamano` por consulta.
+
+    Cada bloque se pide con paginación por llave (created_at, id) en vez de un
+    único cursor: el driver de MySQL trae al cliente el resultado completo de
+    una consulta aunque se use .iterator(), y así solo hay un bloque en memoria.
+    Detalles y pagos se precargan por bloque (una consulta cada uno).
+    """
+    ventas = con_relaciones_reporte(ventas).order_by("-created_at", "-id")
+    filtro = Q()
+
+    while True:
+        bloque = list(ventas.filter(filtro)[:tamano])
+        if not bloque:
+            return
+
+        yield from bloque
+
+        if len(bloque) < tamano:
+            return
+        ultima = bloque[-1]
+        filtro = Q(created_at__lt=ultima.created_at) | Q(created_at=ultima.created_at, id__lt=ultima.id)
+
+
+class _Eco:
+    """Buffer mínimo para csv.writer: retorna la línea escrita en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _generar_ndjson(ventas):
+    for venta in iterar_ventas_por_bloques(ventas):
+        yield json.dumps(serializar_venta_reporte(venta), ensure_ascii=False) + "\n"
+
+
+def _generar_csv(ventas):
+    writer = csv.writer(_Eco())
+    yield writer.writerow(COLUMNAS_CSV)
+
+    for venta in iterar_ventas_por_bloques(ventas):
+        datos = serializar_venta_reporte(venta)
+        cabecera = [
+            datos["id"], datos["codigo"], datos["fecha"], datos["cliente"], datos["creado_por"],
+            datos["metodo_pago"],
+            " | ".join(f"{p['metodo_pago']}:{p['monto']:.2f}" for p in datos["pagos"]),
+            datos["subtotal"], datos["descuento"], datos["impuesto"], datos["total"],
+        ]
+        # Una fila por producto; las ventas sin productos salen en una sola fila
+        for d in datos["productos_comprados"] or [None]:
+            if d is None:
+                yield writer.writerow(cabecera + [""] * 6)
+            else:
+                yield writer.writerow(cabecera + [
+                    d["venta_id"], d["producto_id"], d["producto"],
+                    d["cantidad"], d["precio_unitario"], d["subtotal_producto"],
+                ])
+
+
+def exportar_ventas(ventas, formato, nombre_archivo):
+    """
+    Respuesta en streaming con las ventas del queryset en formato 'ndjson' o 'csv'.
+    La memoria usada no depende del tamaño del rango.
+    """
+    generador = _generar_ndjson(ventas) if formato == 'ndjson' else _generar_csv(ventas)
+    response = StreamingHttpResponse(generador, content_type=FORMATOS_EXPORTACION[formato])
+    response["Content-Disposition"] = f'attachment; filename="{nombre_archivo}.{formato}"'
+    return response
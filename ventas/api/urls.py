@@ -8,5 +8,8 @@ urlpatterns = [
     path('<int:pk>/delete/', views.delete_venta,        name='delete_venta'),
     path('resumen/',         views.resumen_ventas_view, name='resumen_ventas'),
     path('reporte/',         views.reporte_ventas,      name='reporte_ventas'),
+    path('reporte/margen/',  views.reporte_margen,      name='reporte_margen'),
     path('get-siguiente-codigo-venta-v2/', views.get_siguiente_codigo_venta_v2, name='get_siguiente_codigo_venta_v2'),
+    path('reservar-codigos/', views.reservar_codigos_venta, name='reservar_codigos_venta'),
+    path('batch/',           views.create_ventas_batch, name='create_ventas_batch'),
 ]
\ No newline at end of file
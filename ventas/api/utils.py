@@ -0,0 +1,657 @@
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction, IntegrityError
+from django.db.models import Sum, Count, F, Case, When, Value
+from django.utils import timezone
+from rest_framework import status
+
+from ventas.models import (
+    Venta, DetalleVenta, PagoVenta,
+    ResumenVentaDiaCajero, ResumenVentaDiaProducto, ResumenVentaDiaMetodoPago,
+)
+from productos.models import Producto
+from clientes.models import Cliente
+from tarjetabancaria.models import TarjetaBancaria
+from inventarioproducto.api.utils import reservar_stock
+from inventarioproducto.api.capas import consumir_capas
+from core.utils import siguiente_codigo, consultar_siguiente_codigo, numero_desde_codigo
+
+
+class VentaInvalidaError(Exception):
+    """Error de validación al registrar una venta. Incluye el status HTTP con el que se responde."""
+
+    def __init__(self, mensaje, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(mensaje)
+        self.status_code = status_code
+
+
+def _to_int(value):
+    """Normaliza un ID recibido como texto ("5") para buscarlo en los diccionarios de in_bulk."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _decodificar_lista(valor, campo):
+    """Acepta una lista o un string JSON con una lista (formularios multipart)."""
+    if isinstance(valor, str):
+        try:
+            return json.loads(valor)
+        except json.JSONDecodeError:
+            raise VentaInvalidaError(f"Formato invalido para '{campo}'. Debe ser JSON valido.")
+    return valor
+
+
+def registrar_venta(data, usuario, codigo=None):
+    """
+    Registra una venta completa: cabecera, pagos, detalles y descuento de stock.
+
+    Usada por create_venta y por la sincronización por lotes (create_ventas_batch).
+    Debe llamarse dentro de una transacción: si algo falla, nada queda escrito.
+
+    `codigo` es un código ya reservado por quien llama, fuera de su transacción
+    (ver reservar_codigos). Sin él se usa el 'codigo' enviado por la terminal o
+    se reserva el siguiente dentro de la transacción, bloqueando la secuencia
+    hasta el commit.
+
+    Lanza:
+        VentaInvalidaError: datos inválidos (incluidos números mal formados) o
+            referencias inexistentes.
+        IntegrityError: stock insuficiente o código de venta duplicado.
+
+    Retorna la Venta creada.
+    """
+    try:
+        return _registrar_venta(data, usuario, codigo)
+    # Cantidades, montos o IDs que no son números: es un error del dato
+    # enviado, no del servidor, y la sincronización por lotes lo reporta solo
+    # para esa venta
+    except InvalidOperation as e:
+        raise VentaInvalidaError("Datos inválidos en la venta: algún monto o precio no es un número.") from e
+    except (ValueError, TypeError) as e:
+        raise VentaInvalidaError(f"Datos inválidos en la venta: {e}") from e
+
+
+def _registrar_venta(data, usuario, codigo):
+    # ===============================
+    # Validar y obtener campos base
+    # ===============================
+    cliente_id    = data.get('cliente_id')
+    tarjeta_id    = data.get('tarjeta_id')
+    metodo_pago   = data.get('metodo_pago', 'Efectivo')
+    recibido      = Decimal(data.get('recibido', '0'))
+    cambio        = Decimal(data.get('cambio', '0'))
+    subtotal      = Decimal(data.get('subtotal', '0'))
+    descuento     = Decimal(data.get('descuento', '0'))
+    impuesto      = Decimal(data.get('impuesto', '0'))
+    total         = Decimal(data.get('total', '0'))
+    items         = _decodificar_lista(data.get('items', []), 'items')
+    pagos         = _decodificar_lista(data.get('pagos', []), 'pagos')
+
+    if not isinstance(items, list):
+        raise VentaInvalidaError("'items' debe ser una lista de productos.")
+
+    if not items:
+        raise VentaInvalidaError("Debe incluir al menos un producto en la venta.")
+
+    # Si no se envian pagos, mantener compatibilidad con el flujo anterior
+    if not pagos:
+        if not tarjeta_id:
+            raise VentaInvalidaError("El campo 'tarjeta_id' es obligatorio.")
+    else:
+        # Validar que pagos sea una lista con al menos un pago
+        if not isinstance(pagos, list) or len(pagos) == 0:
+            raise VentaInvalidaError("'pagos' debe ser una lista con al menos un metodo de pago.")
+
+        # Validar que la suma de los montos cubra al menos el total
+        suma_pagos = sum(Decimal(str(p.get('monto', '0'))) for p in pagos)
+        if suma_pagos < total - Decimal('0.99'):
+            raise VentaInvalidaError(f"La suma de los pagos ({suma_pagos}) no cubre el total de la venta ({total}).")
+
+        # Si el cliente pago de mas, registrar el cambio
+        if suma_pagos > total:
+            cambio = suma_pagos - total
+
+        # Determinar metodo_pago resumen
+        metodos_usados = list(set(p.get('metodo_pago', '') for p in pagos))
+        if len(metodos_usados) == 1:
+            metodo_pago = metodos_usados[0]
+        else:
+            metodo_pago = 'Mixto'
+
+        # tarjeta principal: la del primer pago que tenga tarjeta_id
+        tarjeta_id = next((p['tarjeta_id'] for p in pagos if p.get('tarjeta_id')), None)
+
+    # ===============================
+    # Precargar tarjetas, productos y combos (una consulta por tabla)
+    # ===============================
+    from combos.models import Combo, ProductoCombo
+
+    tarjeta_ids  = {tarjeta_id} if tarjeta_id else set()
+    tarjeta_ids |= {p['tarjeta_id'] for p in pagos if p.get('tarjeta_id')}
+    producto_ids = set()
+    combo_ids    = set()
+    for item in items:
+        if item.get('isCombo', False) and item.get('combo_id') and item.get('combo_productos', []):
+            combo_ids.add(item['combo_id'])
+            producto_ids |= {cp.get('producto_id') for cp in item['combo_productos']}
+        else:
+            producto_ids.add(item.get('id'))
+
+    tarjetas  = TarjetaBancaria.objects.in_bulk(tarjeta_ids)
+    productos = Producto.objects.in_bulk(producto_ids)
+    combos    = Combo.objects.in_bulk(combo_ids)
+
+    for modelo, solicitados, encontrados in (
+        ('Tarjeta', tarjeta_ids, tarjetas),
+        ('Producto', producto_ids, productos),
+        ('Combo', combo_ids, combos),
+    ):
+        faltantes = [str(i) for i in solicitados if _to_int(i) not in encontrados]
+        if faltantes:
+            raise VentaInvalidaError(
+                f"{modelo}(s) no encontrado(s): {', '.join(faltantes)}.",
+                status_code=status.HTTP_404_NOT_FOUND
+            )
+
+    tarjeta = tarjetas[_to_int(tarjeta_id)] if tarjeta_id else None
+
+    # Casillas de cada combo, leídas de la base de datos (una consulta): la
+    # caché del índice de categorías puede estar desactualizada en otro proceso
+    casillas_combos = defaultdict(lambda: {'productos': set(), 'categorias': set()})
+    if combos:
+        for combo_id, producto_id, categoria_id in (
+            ProductoCombo.objects
+            .filter(combo_id__in=combos)
+            .values_list('combo_id', 'producto_id', 'categoria_id')
+        ):
+            if producto_id:
+                casillas_combos[combo_id]['productos'].add(producto_id)
+            elif categoria_id:
+                casillas_combos[combo_id]['categorias'].add(categoria_id)
+
+    # ===============================
+    # 🔹 Armar detalles de venta y unidades a descontar (en memoria)
+    # ===============================
+    detalles_venta = []
+    cantidades_por_producto = defaultdict(int)
+
+    for item in items:
+        producto_id     = item.get('id')
+        cantidad        = int(item.get('quantity', 1))
+        precio_unitario = Decimal(item.get('precio_final', '0'))
+        is_combo        = item.get('isCombo', False)
+        combo_id        = item.get('combo_id')
+        combo_productos = item.get('combo_productos', [])
+
+        # ======================================================
+        # 🔹 CASO 1: Es un combo
+        # ======================================================
+        if is_combo and combo_id and combo_productos:
+            combo = combos[_to_int(combo_id)]
+
+            casillas = casillas_combos[combo.id]
+
+            for cp in combo_productos:
+                producto = productos[_to_int(cp.get('producto_id'))]
+                # Un producto del combo debe ser una de sus casillas de producto
+                # o pertenecer a una de sus casillas de categoría
+                if producto.id not in casillas['productos'] and producto.categoria_id not in casillas['categorias']:
+                    raise VentaInvalidaError(
+                        f"El producto '{producto.nombre}' no corresponde a ninguna casilla del combo '{combo.nombre}'."
+                    )
+                cantidad_combo = int(cp.get('cantidad', 1))
+                cantidad_total = cantidad_combo * cantidad  # cantidad del combo * cantidad de combos vendidos
+
+                # Detalle de venta para cada producto del combo
+                detalles_venta.append(DetalleVenta(
+                    producto        = producto,
+                    cantidad        = cantidad_total,
+                    precio_unitario = Decimal(cp.get('precio_combo', '0')),
+                    combo           = combo,  # Referenciar el combo
+                ))
+                cantidades_por_producto[producto.id] += cantidad_total
+
+        # ======================================================
+        # 🔹 CASO 2: Es un producto individual
+        # ======================================================
+        else:
+            producto = productos[_to_int(producto_id)]
+
+            detalles_venta.append(DetalleVenta(
+                producto        = producto,
+                cantidad        = cantidad,
+                precio_unitario = precio_unitario,
+            ))
+            cantidades_por_producto[producto.id] += cantidad
+
+    # ===============================
+    # Crear venta principal
+    # ===============================
+    cliente = None
+    if cliente_id:
+        cliente = Cliente.objects.filter(id=cliente_id).first()
+        if cliente is None:
+            raise VentaInvalidaError(f"Cliente no encontrado: {cliente_id}.", status_code=status.HTTP_404_NOT_FOUND)
+
+    # Código: reservado por quien llama, uno de un bloque reservado
+    # previamente por la terminal POS (reservar-codigos/), o el siguiente
+    # consecutivo de la secuencia
+    if codigo is None:
+        codigo = data.get('codigo')
+        if codigo:
+            numero = numero_desde_codigo(Venta.PREFIJO_CODIGO, codigo)
+            if numero is None or numero >= consultar_siguiente_codigo(Venta.PREFIJO_CODIGO)[1]:
+                raise VentaInvalidaError(f"El código '{codigo}' no pertenece a un bloque reservado.")
+        else:
+            codigo = siguiente_codigo(Venta.PREFIJO_CODIGO)
+
+    venta = Venta.objects.create(
+        codigo             = codigo,
+        clave_idempotencia = data.get('clave_idempotencia') or None,
+        cliente            = cliente,
+        metodo_pago        = metodo_pago,
+        recibido           = recibido,
+        cambio             = cambio,
+        subtotal           = subtotal,
+        descuento          = descuento,
+        impuesto           = impuesto,
+        total              = total,
+        creado_por         = usuario,
+        tarjeta            = tarjeta
+    )
+
+    # ===============================
+    # Crear registros de pagos (un solo INSERT)
+    # ===============================
+    if pagos:
+        pagos_venta = [
+            PagoVenta(
+                venta=venta,
+                metodo_pago=pago.get('metodo_pago', 'Efectivo'),
+                monto=Decimal(str(pago.get('monto', '0'))),
+                tarjeta=tarjetas[_to_int(pago['tarjeta_id'])] if pago.get('tarjeta_id') else None,
+            )
+            for pago in pagos
+        ]
+    else:
+        # Compatibilidad: crear un solo PagoVenta con el metodo_pago original
+        pagos_venta = [PagoVenta(
+            venta=venta,
+            metodo_pago=metodo_pago,
+            monto=total,
+            tarjeta=tarjeta,
+        )]
+    PagoVenta.objects.bulk_create(pagos_venta)
+
+    # ===============================
+    # 🔹 Reservar stock (bloqueo ordenado de saldos) y crear detalles
+    # ===============================
+    # Lanza IntegrityError si algún producto no alcanza; la transacción se revierte completa.
+    reservar_stock(cantidades_por_producto, referencia=venta.codigo, usuario=usuario)
+
+    for detalle in detalles_venta:
+        detalle.venta = venta
+    detalles_venta = DetalleVenta.objects.bulk_create(detalles_venta)
+
+    # MySQL no devuelve los IDs generados en un bulk_create
+    if any(d.pk is None for d in detalles_venta):
+        detalles_venta = list(venta.detalles.select_related('producto').order_by('id'))
+
+    # Costo de lo vendido: consumir las capas FIFO de cada producto
+    consumir_capas(detalles_venta)
+
+    acumular_venta(venta, detalles_venta, pagos_venta)
+
+    return venta
+
+
+def get_ventas_por_clave(claves):
+    """
+    Retorna {clave_idempotencia: Venta} de las ventas ya registradas con esas claves.
+    Es una sola consulta por el índice único de clave_idempotencia.
+    """
+    claves = [c for c in claves if c]
+    if not claves:
+        return {}
+    return {
+        venta.clave_idempotencia: venta
+        for venta in Venta.all_objects.filter(clave_idempotencia__in=claves).only('id', 'codigo', 'clave_idempotencia')
+    }
+
+
+# ======================================================
+# Resúmenes diarios (rollups)
+# ======================================================
+def _acumular_fila(modelo, claves, deltas):
+    """
+    Suma `deltas` ({campo: valor}) a la fila de resumen identificada por `claves`.
+    Si la fila no existe la crea; si otra transacción la crea al mismo tiempo,
+    el índice único lo detecta y se reintenta el UPDATE.
+    """
+    filtro = {
+        (f"{campo}__isnull" if valor is None else campo): (True if valor is None else valor)
+        for campo, valor in claves.items()
+    }
+    incrementos = {campo: F(campo) + valor for campo, valor in deltas.items()}
+
+    if modelo.objects.filter(**filtro).update(**incrementos, updated_at=timezone.now()):
+        return
+    try:
+        with transaction.atomic():
+            modelo.objects.create(**claves, **deltas)
+    except IntegrityError:
+        modelo.objects.filter(**filtro).update(**incrementos, updated_at=timezone.now())
+
+
+def _acumular_filas(modelo, fecha, campo, deltas):
+    """
+    Suma variaciones a varias filas de resumen de una fecha con un número fijo
+    de consultas, sin importar cuántas filas sean.
+
+    deltas: {valor de `campo`: {campo_a_sumar: valor}}, p. ej.
+    {producto_id: {'unidades': 2, 'importe': ..., 'costo': ...}}.
+
+    Las filas que faltan se crean en cero con un INSERT masivo que ignora las
+    que otra transacción creó al mismo tiempo (índice único), y luego un solo
+    UPDATE ... CASE aplica todos los incrementos.
+    """
+    if not deltas:
+        return
+    filtro = {'fecha': fecha, f'{campo}__in': list(deltas)}
+
+    existentes = set(modelo.objects.filter(**filtro).values_list(campo, flat=True))
+    faltantes = sorted(clave for clave in deltas if clave not in existentes)
+    if faltantes:
+        modelo.objects.bulk_create(
+            [modelo(fecha=fecha, **{campo: clave}) for clave in faltantes],
+            ignore_conflicts=True
+        )
+
+    incrementos = {}
+    for campo_suma in next(iter(deltas.values())):
+        output_field = modelo._meta.get_field(campo_suma)
+        incrementos[campo_suma] = F(campo_suma) + Case(
+            *[
+                When(**{campo: clave}, then=Value(valores[campo_suma], output_field=output_field))
+                for clave, valores in deltas.items()
+            ],
+            default=Value(0, output_field=output_field),
+            output_field=output_field,
+        )
+    modelo.objects.filter(**filtro).update(**incrementos, updated_at=timezone.now())
+
+
+def acumular_resumenes(fecha, cajero_id, totales=None, productos=None, metodos=None):
+    """
+    Aplica variaciones a los resúmenes diarios de una fecha.
+
+    Parámetros:
+        fecha (date): día local de la venta.
+        cajero_id (int | None): usuario que registró la venta.
+        totales (dict | None): {'num_ventas', 'subtotal', 'descuento', 'impuesto', 'total'}
+        productos (dict | None): {producto_id: (unidades, importe, costo)}
+        metodos (dict | None): {metodo_pago: (num_pagos, monto)}
+
+    Cada tabla se actualiza con un número fijo de consultas (ver _acumular_filas),
+    siempre en el mismo orden (cajero, productos, métodos); dentro de cada tabla
+    el UPDATE recorre las filas por el índice único, así dos transacciones
+    concurrentes no se bloquean mutuamente.
+    """
+    with transaction.atomic():
+        # La fila del cajero puede tener cajero NULL, que el índice único no
+        # distingue: va por _acumular_fila
+        if totales and any(totales.values()):
+            _acumular_fila(ResumenVentaDiaCajero, {'fecha': fecha, 'cajero_id': cajero_id}, totales)
+
+        _acumular_filas(ResumenVentaDiaProducto, fecha, 'producto_id', {
+            producto_id: {'unidades': unidades, 'importe': importe, 'costo': costo}
+            for producto_id, (unidades, importe, costo) in (productos or {}).items()
+            if unidades or importe or costo
+        })
+
+        _acumular_filas(ResumenVentaDiaMetodoPago, fecha, 'metodo_pago', {
+            metodo_pago: {'num_pagos': num_pagos, 'monto': monto}
+            for metodo_pago, (num_pagos, monto) in (metodos or {}).items()
+            if num_pagos or monto
+        })
+
+
+def acumular_venta(venta, detalles, pagos, signo=1):
+    """
+    Suma (signo=1, venta creada) o resta (signo=-1, venta eliminada) una venta
+    completa de los resúmenes de su día.
+    """
+    productos = defaultdict(lambda: [0, Decimal('0.00'), Decimal('0.00')])
+    for d in detalles:
+        productos[d.producto_id][0] += signo * d.cantidad
+        productos[d.producto_id][1] += signo * d.cantidad * d.precio_unitario
+        productos[d.producto_id][2] += signo * d.costo_total
+
+    metodos = defaultdict(lambda: [0, Decimal('0.00')])
+    for p in pagos:
+        metodos[p.metodo_pago][0] += signo
+        metodos[p.metodo_pago][1] += signo * p.monto
+
+    acumular_resumenes(
+        timezone.localdate(venta.created_at),
+        venta.creado_por_id,
+        totales={
+            'num_ventas': signo,
+            'subtotal': signo * venta.subtotal,
+            'descuento': signo * venta.descuento,
+            'impuesto': signo * venta.impuesto,
+            'total': signo * venta.total,
+        },
+        productos=productos,
+        metodos=metodos,
+    )
+
+
+def acumular_devolucion(venta, detalle, cantidad, totales_antes, costo=Decimal('0.00')):
+    """
+    Descuenta de los resúmenes del día de la venta las unidades devueltas,
+    su costo y la diferencia de subtotal/impuesto/total tras recalcular la venta.
+
+    totales_antes: (subtotal, descuento, impuesto, total) de la venta antes de la devolución.
+    costo: costo de las unidades devueltas (el que retorna restaurar_capas).
+    """
+    subtotal, descuento, impuesto, total = totales_antes
+    acumular_resumenes(
+        timezone.localdate(venta.created_at),
+        venta.creado_por_id,
+        totales={
+            'num_ventas': 0,
+            'subtotal': venta.subtotal - subtotal,
+            'descuento': venta.descuento - descuento,
+            'impuesto': venta.impuesto - impuesto,
+            'total': venta.total - total,
+        },
+        productos={detalle.producto_id: (-cantidad, -cantidad * detalle.precio_unitario, -costo)},
+    )
+
+
+def rango_dia_local(fecha_inicio, fecha_fin):
+    """Retorna (inicio, fin) aware: 00:00:00 de fecha_inicio a 23:59:59.999999 de fecha_fin, hora local."""
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(fecha_inicio, datetime.min.time()), tz),
+        timezone.make_aware(datetime.combine(fecha_fin, datetime.max.time()), tz),
+    )
+
+
+def get_resumen_ventas(fecha_inicio, fecha_fin, top=10):
+    """
+    Totales de ventas de un rango de días locales (ambos incluidos).
+
+    Los días anteriores a hoy se leen de los resúmenes diarios; el día actual
+    (parcial) se agrega desde las tablas de ventas. Solo cuenta ventas activas.
+
+    Retorna dict con total_ventas, total_subtotal, total_descuentos, total_impuestos,
+    cantidad_ventas, total_unidades, por_metodo_pago [{metodo_pago, total}] y
+    productos_top [{nombre, total_vendido}].
+    """
+    hoy = timezone.localdate()
+    totales = {'cantidad_ventas': 0}
+    for campo in ('total_ventas', 'total_subtotal', 'total_descuentos', 'total_impuestos'):
+        totales[campo] = Decimal('0.00')
+    total_unidades = 0
+    metodos = defaultdict(lambda: Decimal('0.00'))
+    productos = {}  # producto_id -> [nombre, unidades]
+
+    # --- Días cerrados: resúmenes ---
+    fin_cerrado = min(fecha_fin, hoy - timedelta(days=1))
+    if fecha_inicio <= fin_cerrado:
+        rango = {'fecha__range': (fecha_inicio, fin_cerrado)}
+
+        agregado = ResumenVentaDiaCajero.objects.filter(**rango).aggregate(
+            cantidad_ventas=Sum('num_ventas'),
+            total_ventas=Sum('total'),
+            total_subtotal=Sum('subtotal'),
+            total_descuentos=Sum('descuento'),
+            total_impuestos=Sum('impuesto'),
+        )
+        for campo, valor in agregado.items():
+            totales[campo] += valor or 0
+
+        # Un método o producto cuyas ventas se eliminaron o devolvieron queda
+        # en cero en los resúmenes; en las ventas ya no aparece
+        for metodo_pago, monto in (
+            ResumenVentaDiaMetodoPago.objects.filter(**rango)
+            .values('metodo_pago').annotate(pagos=Sum('num_pagos'), monto_total=Sum('monto'))
+            .filter(pagos__gt=0)
+            .values_list('metodo_pago', 'monto_total')
+        ):
+            metodos[metodo_pago] += monto or 0
+
+        total_unidades += ResumenVentaDiaProducto.objects.filter(**rango).aggregate(
+            total=Sum('unidades'))['total'] or 0
+
+        por_producto = (
+            ResumenVentaDiaProducto.objects.filter(**rango)
+            .values('producto_id', nombre=F('producto__nombre'))
+            .annotate(total_vendido=Sum('unidades'))
+            .filter(total_vendido__gt=0)
+        )
+        for fila in por_producto.order_by('-total_vendido', 'producto_id')[:top]:
+            productos[fila['producto_id']] = [fila['nombre'], fila['total_vendido']]
+    else:
+        por_producto = None
+
+    # --- Día actual: tablas de ventas ---
+    # Los IDs de las ventas del día se materializan una vez; el resumen sale de
+    # un solo aggregate y pagos/unidades de consultas agrupadas sobre esos IDs.
+    venta_ids = []
+    if fecha_fin >= hoy and fecha_inicio <= hoy:
+        inicio_dt, fin_dt = rango_dia_local(max(fecha_inicio, hoy), fecha_fin)
+        venta_ids = list(
+            Venta.objects.filter(created_at__range=(inicio_dt, fin_dt)).values_list('id', flat=True)
+        )
+
+    if venta_ids:
+        agregado = Venta.objects.filter(id__in=venta_ids).aggregate(
+            cantidad_ventas=Count('id'),
+            total_ventas=Sum('total'),
+            total_subtotal=Sum('subtotal'),
+            total_descuentos=Sum('descuento'),
+            total_impuestos=Sum('impuesto'),
+        )
+        for campo, valor in agregado.items():
+            totales[campo] += valor or 0
+
+        for metodo_pago, monto in (
+            PagoVenta.objects.filter(venta_id__in=venta_ids)
+            .values('metodo_pago').annotate(monto_total=Sum('monto'))
+            .values_list('metodo_pago', 'monto_total')
+        ):
+            metodos[metodo_pago] += monto or 0
+
+        vendidos_hoy = list(
+            DetalleVenta.objects.filter(venta_id__in=venta_ids)
+            .values('producto_id', nombre=F('producto__nombre'))
+            .annotate(total_vendido=Sum('cantidad'))
+        )
+        # Los productos vendidos hoy que no quedaron en el top de los días
+        # cerrados pueden entrar al top sumando ambos periodos
+        faltantes = [f['producto_id'] for f in vendidos_hoy if f['producto_id'] not in productos]
+        if por_producto is not None and faltantes:
+            for fila in por_producto.filter(producto_id__in=faltantes):
+                productos[fila['producto_id']] = [fila['nombre'], fila['total_vendido']]
+        for fila in vendidos_hoy:
+            total_unidades += fila['total_vendido']
+            productos.setdefault(fila['producto_id'], [fila['nombre'], 0])[1] += fila['total_vendido']
+
+    productos_top = sorted(productos.items(), key=lambda item: (-item[1][1], item[0]))[:top]
+
+    return {
+        **totales,
+        'total_unidades': total_unidades,
+        'por_metodo_pago': [
+            {'metodo_pago': metodo_pago, 'total': metodos[metodo_pago]}
+            for metodo_pago in sorted(metodos)
+        ],
+        'productos_top': [
+            {'nombre': nombre, 'total_vendido': unidades}
+            for _, (nombre, unidades) in productos_top
+        ],
+    }
+
+
+def _margen(importe, costo):
+    """Margen (importe - costo) y su porcentaje sobre el importe."""
+    margen = importe - costo
+    porcentaje = (margen * 100 / importe).quantize(Decimal('0.01')) if importe else Decimal('0.00')
+    return margen, porcentaje
+
+
+def get_margen_ventas(fecha_inicio, fecha_fin, top=10):
+    """
+    Importe, costo de lo vendido (FIFO) y margen de un rango de días locales.
+
+    Todo sale del resumen diario por producto, que se actualiza en la misma
+    transacción que cada venta y devolución: son dos SUM agrupados sobre el
+    índice (fecha, producto), sin recorrer las ventas.
+
+    Retorna dict con totales, dias [{fecha, unidades, importe, costo, margen, margen_porcentaje}]
+    y productos_top (por margen).
+    """
+    filas = ResumenVentaDiaProducto.objects.filter(fecha__range=(fecha_inicio, fecha_fin))
+
+    dias = []
+    unidades_total = 0
+    importe_total = costo_total = Decimal('0.00')
+    for fila in (
+        filas.values('fecha')
+        .annotate(unidades=Sum('unidades'), importe=Sum('importe'), costo=Sum('costo'))
+        .order_by('fecha')
+    ):
+        margen, porcentaje = _margen(fila['importe'], fila['costo'])
+        dias.append({**fila, 'margen': margen, 'margen_porcentaje': porcentaje})
+        unidades_total += fila['unidades']
+        importe_total += fila['importe']
+        costo_total += fila['costo']
+
+    productos_top = []
+    for fila in (
+        filas.values('producto_id', nombre=F('producto__nombre'))
+        .annotate(unidades=Sum('unidades'), importe=Sum('importe'), costo=Sum('costo'))
+        .annotate(margen=F('importe') - F('costo'))
+        .order_by('-margen', 'producto_id')[:top]
+    ):
+        _, porcentaje = _margen(fila['importe'], fila['costo'])
+        productos_top.append({**fila, 'margen_porcentaje': porcentaje})
+
+    margen_total, porcentaje_total = _margen(importe_total, costo_total)
+    return {
+        'total_unidades': unidades_total,
+        'total_importe': importe_total,
+        'total_costo': costo_total,
+        'total_margen': margen_total,
+        'margen_porcentaje': porcentaje_total,
+        'dias': dias,
+        'productos_top': productos_top,
+    }
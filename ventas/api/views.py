@@ -1,13 +1,15 @@
 from tarjetabancaria.models import TarjetaBancaria
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.renderers import JSONRenderer, BrowsableAPIRenderer
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 from django.shortcuts import get_object_or_404
 from django.db import transaction, IntegrityError, DatabaseError
 from decimal import Decimal
-from django.db.models import Q, Sum, F, DecimalField, ExpressionWrapper, Prefetch
+from django.db.models import Q, Sum, F, DecimalField, ExpressionWrapper, Prefetch, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce
 from django.utils.timezone import now
 from django.utils import timezone
 from datetime import datetime, timedelta
@@ -17,7 +19,15 @@ from ventas.models import Venta, DetalleVenta, PagoVenta
 from productos.models import Producto
 from clientes.models import Cliente
 from inventarioproducto.models import InventarioProducto
-from proveedores.models import OrdenProveedorDetalle
+from ventas.api.utils import (
+    registrar_venta, get_ventas_por_clave, VentaInvalidaError,
+    acumular_venta, get_resumen_ventas, get_margen_ventas, rango_dia_local,
+)
+from ventas.api.exportar import (
+    NDJSONRenderer, CSVRenderer, FORMATOS_EXPORTACION,
+    exportar_ventas, serializar_venta_reporte, con_relaciones_reporte,
+)
+from core.utils import reservar_codigos, consultar_siguiente_codigo
 
 import json
 VENTA_MANAGER_ROLES = ['admin', 'vendedor']  # Ajusta según tu modelo de permisos
@@ -28,262 +38,46 @@ VENTA_MANAGER_ROLES = ['admin', 'vendedor']  # Ajusta según tu modelo de permis
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, RolePermission(VENTA_MANAGER_ROLES)])
 def create_venta(request):
-    try:
-        with transaction.atomic():
-            data = request.data
-
-            # ===============================
-            # Validar y obtener campos base
-            # ===============================
-            cliente_id    = data.get('cliente_id')
-            tarjeta_id    = data.get('tarjeta_id')
-            metodo_pago   = data.get('metodo_pago', 'Efectivo')
-            recibido      = Decimal(data.get('recibido', '0'))
-            cambio        = Decimal(data.get('cambio', '0'))
-            subtotal      = Decimal(data.get('subtotal', '0'))
-            descuento     = Decimal(data.get('descuento', '0'))
-            impuesto      = Decimal(data.get('impuesto', '0'))
-            total         = Decimal(data.get('total', '0'))
-            items         = data.get('items', [])
-            pagos         = data.get('pagos', [])
-
-            # Decodificar pagos si llega como string JSON
-            if isinstance(pagos, str):
-                try:
-                    pagos = json.loads(pagos)
-                except json.JSONDecodeError:
-                    return Response(
-                        {"error": "Formato invalido para 'pagos'. Debe ser JSON valido."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-            # Si no se envian pagos, mantener compatibilidad con el flujo anterior
-            if not pagos:
-                if not tarjeta_id:
-                    return Response(
-                        {"error": "El campo 'tarjeta_id' es obligatorio."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                tarjeta = get_object_or_404(TarjetaBancaria, id=tarjeta_id)
-            else:
-                # Validar que pagos sea una lista con al menos un pago
-                if not isinstance(pagos, list) or len(pagos) == 0:
-                    return Response(
-                        {"error": "'pagos' debe ser una lista con al menos un metodo de pago."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-                # Validar que la suma de los montos cubra al menos el total
-                suma_pagos = sum(Decimal(str(p.get('monto', '0'))) for p in pagos)
-                if suma_pagos < total - Decimal('0.99'):
-                    return Response(
-                        {"error": f"La suma de los pagos ({suma_pagos}) no cubre el total de la venta ({total})."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-                # Si el cliente pago de mas, registrar el cambio
-                if suma_pagos > total:
-                    cambio = suma_pagos - total
-
-                # Determinar metodo_pago resumen
-                metodos_usados = list(set(p.get('metodo_pago', '') for p in pagos))
-                if len(metodos_usados) == 1:
-                    metodo_pago = metodos_usados[0]
-                else:
-                    metodo_pago = 'Mixto'
-
-                # tarjeta principal: la del primer pago que tenga tarjeta_id
-                tarjeta_id = None
-                tarjeta = None
-                for p in pagos:
-                    if p.get('tarjeta_id'):
-                        tarjeta_id = p['tarjeta_id']
-                        tarjeta = get_object_or_404(TarjetaBancaria, id=tarjeta_id)
-                        break
-
-            # Si items llega como string JSON, decodificarlo
-            if isinstance(items, str):
-                try:
-                    items = json.loads(items)
-                except json.JSONDecodeError:
-                    return Response(
-                        {"error": "Formato invalido para 'items'. Debe ser JSON valido."},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-            if not isinstance(items, list):
-                return Response(
-                    {"error": "'items' debe ser una lista de productos."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            if not items:
-                return Response(
-                    {"error": "Debe incluir al menos un producto en la venta."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            # ===============================
-            # Crear venta principal
-            # ===============================
-            cliente = get_object_or_404(Cliente, id=cliente_id) if cliente_id else None
-
-            venta = Venta.objects.create(
-                codigo      = f"V-{Venta.objects.count() + 1:05d}",
-                cliente     = cliente,
-                metodo_pago = metodo_pago,
-                recibido    = recibido,
-                cambio      = cambio,
-                subtotal    = subtotal,
-                descuento   = descuento,
-                impuesto    = impuesto,
-                total       = total,
-                creado_por  = request.user,
-                tarjeta     = tarjeta
-            )
-
-            # ===============================
-            # Crear registros de pagos
-            # ===============================
-            if pagos:
-                for pago in pagos:
-                    pago_tarjeta = None
-                    if pago.get('tarjeta_id'):
-                        pago_tarjeta = get_object_or_404(TarjetaBancaria, id=pago['tarjeta_id'])
-                    PagoVenta.objects.create(
-                        venta=venta,
-                        metodo_pago=pago.get('metodo_pago', 'Efectivo'),
-                        monto=Decimal(str(pago.get('monto', '0'))),
-                        tarjeta=pago_tarjeta,
-                    )
-            else:
-                # Compatibilidad: crear un solo PagoVenta con el metodo_pago original
-                PagoVenta.objects.create(
-                    venta=venta,
-                    metodo_pago=metodo_pago,
-                    monto=total,
-                    tarjeta=tarjeta,
-                )
-
-            # ===============================
-            # 🔹 Validar stock y crear detalles de venta
-            # ===============================
-            for item in items:
-                producto_id     = item.get('id')
-                cantidad        = int(item.get('quantity', 1))
-                precio_unitario = Decimal(item.get('precio_final', '0'))
-                is_combo        = item.get('isCombo', False)
-                combo_id        = item.get('combo_id')
-                combo_productos = item.get('combo_productos', [])
-
-                # ======================================================
-                # 🔹 CASO 1: Es un combo
-                # ======================================================
-                if is_combo and combo_id and combo_productos:
-                    from combos.models import Combo
-                    combo = get_object_or_404(Combo, id=combo_id)
-
-                    # Validar stock para cada producto del combo
-                    for cp in combo_productos:
-                        producto_combo_id = cp.get('producto_id')
-                        cantidad_combo = int(cp.get('cantidad', 1))
-                        cantidad_total = cantidad_combo * cantidad  # cantidad del combo * cantidad de combos vendidos
-
-                        producto = get_object_or_404(Producto, id=producto_combo_id)
-
-                        # Calcular stock disponible
-                        cantidad_recibida = (
-                            OrdenProveedorDetalle.objects
-                            .filter(
-                                orden_proveedor__estado='recibida',
-                                producto_id=producto_combo_id,
-                                deleted_at__isnull=True
-                            )
-                            .aggregate(total=Sum('cantidad'))['total'] or 0
-                        )
-
-                        cantidad_vendida = (
-                            DetalleVenta.objects
-                            .filter(
-                                producto_id=producto_combo_id,
-                                deleted_at__isnull=True
-                            )
-                            .aggregate(total=Sum('cantidad'))['total'] or 0
-                        )
-
-                        stock_disponible = cantidad_recibida - cantidad_vendida
-
-                        # Validar stock
-                        if stock_disponible < cantidad_total:
-                            raise IntegrityError(
-                                f"Stock insuficiente para '{producto.nombre}' en combo '{combo.nombre}'. "
-                                f"Disponible: {stock_disponible}, Solicitado: {cantidad_total}"
-                            )
-
-                        # Crear detalle de venta para cada producto del combo
-                        DetalleVenta.objects.create(
-                            venta           = venta,
-                            producto        = producto,
-                            cantidad        = cantidad_total,
-                            precio_unitario = Decimal(cp.get('precio_combo', '0')),
-                            combo           = combo,  # Referenciar el combo
-                        )
-
-                # ======================================================
-                # 🔹 CASO 2: Es un producto individual
-                # ======================================================
-                else:
-                    producto = get_object_or_404(Producto, id=producto_id)
-
-                    # Calcular stock disponible
-                    cantidad_recibida = (
-                        OrdenProveedorDetalle.objects
-                        .filter(
-                            orden_proveedor__estado='recibida',
-                            producto_id=producto_id,
-                            deleted_at__isnull=True
-                        )
-                        .aggregate(total=Sum('cantidad'))['total'] or 0
-                    )
-
-                    cantidad_vendida = (
-                        DetalleVenta.objects
-                        .filter(
-                            producto_id=producto_id,
-                            deleted_at__isnull=True
-                        )
-                        .aggregate(total=Sum('cantidad'))['total'] or 0
-                    )
-
-                    stock_disponible = cantidad_recibida - cantidad_vendida
-
-                    # Validar stock
-                    if stock_disponible < cantidad:
-                        raise IntegrityError(
-                            f"Stock insuficiente para '{producto.nombre}'. "
-                            f"Disponible: {stock_disponible}, Solicitado: {cantidad}"
-                        )
-
-                    # Crear detalle de venta
-                    DetalleVenta.objects.create(
-                        venta           = venta,
-                        producto        = producto,
-                        cantidad        = cantidad,
-                        precio_unitario = precio_unitario,
-                    )
-
-            # ===============================
-            # 🔹 Respuesta final
-            # ===============================
-            response_data = {
-                "id"     : venta.id,
-                "codigo" : venta.codigo,
-                "cliente": venta.cliente.nombre if venta.cliente else "Venta rápida",
-                "mensaje": "✅ Venta creada correctamente. Stock validado desde órdenes de proveedor."
-            }
+    """
+    Crea una venta con sus detalles y pagos, descontando stock del saldo de inventario.
+    Si se envía 'clave_idempotencia' y ya existe una venta con esa clave, retorna la
+    venta existente en vez de registrarla otra vez (reintentos de la terminal POS).
+    """
+    data = request.data
+    clave = data.get('clave_idempotencia')
 
-            return Response(response_data, status=status.HTTP_201_CREATED)
+    try:
+        if clave:
+            existente = get_ventas_por_clave([clave]).get(clave)
+            if existente:
+                return Response({
+                    "id"     : existente.id,
+                    "codigo" : existente.codigo,
+                    "mensaje": "La venta ya había sido registrada con esta clave de idempotencia."
+                }, status=status.HTTP_200_OK)
+
+        # El código se reserva en su propia transacción corta: la fila de la
+        # secuencia no queda bloqueada mientras se registra la venta. Si la
+        # venta falla, ese consecutivo queda sin usar.
+        codigo = None if data.get('codigo') else reservar_codigos(Venta.PREFIJO_CODIGO)[0]
 
+        with transaction.atomic():
+            venta = registrar_venta(data, request.user, codigo=codigo)
+
+        # ===============================
+        # 🔹 Respuesta final
+        # ===============================
+        response_data = {
+            "id"     : venta.id,
+            "codigo" : venta.codigo,
+            "cliente": venta.cliente.nombre if venta.cliente else "Venta rápida",
+            "mensaje": "✅ Venta creada correctamente. Stock validado desde el saldo de inventario."
+        }
+
+        return Response(response_data, status=status.HTTP_201_CREATED)
+
+    except VentaInvalidaError as e:
+        return Response({"error": str(e)}, status=e.status_code)
     except IntegrityError as e:
         return Response({"error": f"Error de integridad al crear la venta: {str(e)}"},
                         status=status.HTTP_400_BAD_REQUEST)
@@ -292,45 +86,114 @@ def create_venta(request):
                         status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# ======================================================
+# Sincronización por lotes desde terminales POS (POST)
+# ======================================================
+MAX_VENTAS_LOTE = 500
+VENTAS_POR_BLOQUE = 50
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, RolePermission(VENTA_MANAGER_ROLES)])
+def create_ventas_batch(request):
+    """
+    Registra varias ventas acumuladas por una terminal sin conexión.
+
+    Body: {"ventas": [{...mismo formato que create/..., "clave_idempotencia": "uuid"}, ...]}
+
+    - Cada venta debe traer 'clave_idempotencia' (generada por la terminal).
+    - Las ventas se procesan en bloques de VENTAS_POR_BLOQUE, un bloque por transacción.
+      Cada venta va en su propio savepoint: si falla, solo esa venta se descarta.
+    - Las claves ya aplicadas se resuelven con una consulta por bloque sobre el índice
+      único y se informan como 'duplicada' sin volver a procesarse.
+    - Los códigos de las ventas nuevas del bloque se reservan juntos antes de abrir su
+      transacción; los de ventas que fallan quedan sin usar.
+
+    Retorna el resultado de cada venta en el mismo orden recibido.
+    """
+    ventas = request.data.get('ventas')
+
+    if not isinstance(ventas, list) or not ventas:
+        return Response({"error": "'ventas' debe ser una lista con al menos una venta."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    if len(ventas) > MAX_VENTAS_LOTE:
+        return Response({"error": f"Se permiten máximo {MAX_VENTAS_LOTE} ventas por lote."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    claves = [v.get('clave_idempotencia') if isinstance(v, dict) else None for v in ventas]
+    faltantes = [str(i) for i, clave in enumerate(claves) if not clave]
+    if faltantes:
+        return Response({"error": f"Falta 'clave_idempotencia' en las ventas de las posiciones: {', '.join(faltantes)}."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    resultados = []
+    try:
+        for inicio in range(0, len(ventas), VENTAS_POR_BLOQUE):
+            bloque = ventas[inicio:inicio + VENTAS_POR_BLOQUE]
+            aplicadas = get_ventas_por_clave([v['clave_idempotencia'] for v in bloque])
+
+            # Un código por venta nueva sin código de terminal, en una transacción corta
+            nuevas = [v['clave_idempotencia'] for v in bloque
+                      if v['clave_idempotencia'] not in aplicadas and not v.get('codigo')]
+            codigos = dict(zip(nuevas, reservar_codigos(Venta.PREFIJO_CODIGO, len(nuevas)))) if nuevas else {}
+
+            resultados_bloque = []
+            with transaction.atomic():
+                for data in bloque:
+                    clave = data['clave_idempotencia']
+                    venta = aplicadas.get(clave)
+                    if venta:
+                        resultados_bloque.append({"clave_idempotencia": clave, "estado": "duplicada",
+                                                  "id": venta.id, "codigo": venta.codigo})
+                        continue
+
+                    try:
+                        with transaction.atomic():
+                            venta = registrar_venta(data, request.user, codigo=codigos.get(clave))
+                    except (VentaInvalidaError, IntegrityError) as e:
+                        # Carrera con otra petición que aplicó la misma clave
+                        venta = get_ventas_por_clave([clave]).get(clave)
+                        if venta:
+                            aplicadas[clave] = venta
+                            resultados_bloque.append({"clave_idempotencia": clave, "estado": "duplicada",
+                                                      "id": venta.id, "codigo": venta.codigo})
+                        else:
+                            resultados_bloque.append({"clave_idempotencia": clave, "estado": "error", "error": str(e)})
+                        continue
+
+                    aplicadas[clave] = venta
+                    resultados_bloque.append({"clave_idempotencia": clave, "estado": "creada",
+                                              "id": venta.id, "codigo": venta.codigo})
+
+            # Las ventas del bloque se informan solo cuando su transacción confirmó
+            resultados.extend(resultados_bloque)
+
+    except Exception as e:
+        return Response({"error": f"Error inesperado al sincronizar las ventas: {str(e)}",
+                         "procesadas": resultados},
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return Response({
+        "total"      : len(resultados),
+        "creadas"    : sum(1 for r in resultados if r["estado"] == "creada"),
+        "duplicadas" : sum(1 for r in resultados if r["estado"] == "duplicada"),
+        "errores"    : sum(1 for r in resultados if r["estado"] == "error"),
+        "resultados" : resultados,
+    }, status=status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, RolePermission(VENTA_MANAGER_ROLES)])
 def get_siguiente_codigo_venta_v2(request):
     """
-    Genera el siguiente código de venta consecutivo (versión robusta).
-    Busca el número más alto en todos los códigos existentes.
+    Retorna el siguiente código de venta consecutivo sin reservarlo.
+    Se lee de la secuencia 'V-' (una fila por índice único), no de la tabla de ventas.
     Formato: V-00001, V-00002, etc.
     """
     try:
-        from django.db.models import Max
-        from django.db.models.functions import Cast, Substr
-        from django.db.models import IntegerField
-        
-        # Obtener todas las ventas y extraer el número más alto
-        ventas = Venta.objects.all()
-        
-        if not ventas.exists():
-            # Primera venta
-            siguiente_numero = 1
-        else:
-            # Extraer números de todos los códigos y encontrar el máximo
-            numeros = []
-            for venta in ventas:
-                if venta.codigo:
-                    try:
-                        # Extraer número del formato "V-00001"
-                        numero = int(venta.codigo.split('-')[-1])
-                        numeros.append(numero)
-                    except (ValueError, IndexError):
-                        continue
-            
-            if numeros:
-                siguiente_numero = max(numeros) + 1
-            else:
-                siguiente_numero = 1
-        
-        # Formatear con ceros a la izquierda (5 dígitos)
-        codigo_venta_formateado = f"V-{siguiente_numero:05d}"
-        
+        codigo_venta_formateado, siguiente_numero = consultar_siguiente_codigo(Venta.PREFIJO_CODIGO)
+
         return Response({
             "siguiente_codigo": codigo_venta_formateado,
             "numero": siguiente_numero
@@ -341,7 +204,46 @@ def get_siguiente_codigo_venta_v2(request):
             {"error": f"Error al generar código de venta: {str(e)}"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
-    
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated, RolePermission(VENTA_MANAGER_ROLES)])
+def reservar_codigos_venta(request):
+    """
+    Reserva un bloque de códigos de venta para una terminal POS (ej: para vender sin conexión).
+    Los códigos reservados se envían luego en el campo 'codigo' de create_venta.
+    Espera:
+    {
+        "cantidad": 50
+    }
+    """
+    try:
+        cantidad = int(request.data.get('cantidad', 1))
+        if cantidad < 1 or cantidad > 1000:
+            return Response(
+                {"error": "La cantidad debe estar entre 1 y 1000."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    except (TypeError, ValueError):
+        return Response(
+            {"error": "La cantidad debe ser un número entero."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        codigos = reservar_codigos(Venta.PREFIJO_CODIGO, cantidad)
+        return Response({
+            "desde": codigos[0],
+            "hasta": codigos[-1],
+            "codigos": codigos,
+        }, status=status.HTTP_201_CREATED)
+
+    except Exception as e:
+        return Response(
+            {"error": f"Error al reservar códigos de venta: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
 # ======================================================
 # Listar Ventas (GET)
 # ======================================================
@@ -349,7 +251,20 @@ def get_siguiente_codigo_venta_v2(request):
 @permission_classes([IsAuthenticated, RolePermission(VENTA_MANAGER_ROLES)])
 def list_ventas(request):
     try:
-        ventas = Venta.objects.select_related('cliente', 'creado_por').prefetch_related('detalles', 'pagos').all()
+        # Unidades por venta en una subconsulta (no una consulta por fila)
+        unidades_venta = (
+            DetalleVenta.objects
+            .filter(venta=OuterRef('pk'))
+            .values('venta')
+            .annotate(total=Sum('cantidad'))
+            .values('total')
+        )
+        ventas = (
+            Venta.objects
+            .select_related('cliente', 'creado_por')
+            .prefetch_related(Prefetch('pagos', queryset=PagoVenta.objects.select_related('tarjeta')))
+            .annotate(num_productos=Coalesce(Subquery(unidades_venta, output_field=IntegerField()), 0))
+        )
 
         search = request.query_params.get('search')
         metodo_pago = request.query_params.get('metodo_pago')
@@ -362,7 +277,7 @@ def list_ventas(request):
         if metodo_pago:
             ventas = ventas.filter(metodo_pago=metodo_pago)
 
-        ventas = ventas.order_by('-creado_en')
+        ventas = ventas.order_by('-created_at')
 
         paginator = PageNumberPagination()
         paginator.page_size_query_param = 'page_size'
@@ -392,8 +307,8 @@ def list_ventas(request):
                 "recibido": float(v.recibido),
                 "cambio": float(v.cambio),
                 "creado_por": v.creado_por.username if v.creado_por else None,
-                "fecha": v.creado_en,
-                "num_productos": v.detalles.aggregate(total=Sum('cantidad'))['total'] or 0
+                "fecha": v.created_at,
+                "num_productos": v.num_productos
             })
 
         return paginator.get_paginated_response(data)
@@ -447,7 +362,10 @@ def get_venta(request, pk):
 def delete_venta(request, pk):
     venta = get_object_or_404(Venta, pk=pk)
     try:
-        venta.delete()
+        with transaction.atomic():
+            # Restar la venta de los resúmenes diarios antes de marcarla eliminada
+            acumular_venta(venta, venta.detalles.all(), venta.pagos.all(), signo=-1)
+            venta.delete()
         return Response({"message": "Venta eliminada correctamente."}, status=status.HTTP_200_OK)
     except DatabaseError:
         return Response({"error": "Error de base de datos al eliminar la venta."},
@@ -471,8 +389,6 @@ def resumen_ventas_view(request):
         fecha_inicio_param = request.GET.get("start_date")
         fecha_fin_param = request.GET.get("end_date")
 
-        tz = timezone.get_current_timezone()
-
         if fecha_inicio_param and fecha_fin_param:
             # ✅ Si se envía rango de fechas: 00:00:00 del start hasta 23:59:59 del end (hora local)
             fecha_inicio_date = datetime.strptime(fecha_inicio_param, "%Y-%m-%d").date()
@@ -484,24 +400,19 @@ def resumen_ventas_view(request):
             fecha_fin_date = hoy
 
         # Construir rango aware: 00:00:00 inicio → 23:59:59.999999 fin (hora local Bogotá)
-        inicio_dt = timezone.make_aware(
-            datetime.combine(fecha_inicio_date, datetime.min.time()), tz
-        )
-        fin_dt = timezone.make_aware(
-            datetime.combine(fecha_fin_date, datetime.max.time()), tz
-        )
+        inicio_dt, fin_dt = rango_dia_local(fecha_inicio_date, fecha_fin_date)
 
-        ventas = Venta.objects.filter(created_at__range=(inicio_dt, fin_dt))
-        detalles = DetalleVenta.objects.filter(venta__created_at__range=(inicio_dt, fin_dt))
+        # Días cerrados desde los resúmenes diarios; el día actual desde las ventas
+        resumen = get_resumen_ventas(fecha_inicio_date, fecha_fin_date)
 
         # 💰 Total de ventas
-        total_ventas = ventas.aggregate(total=Sum("total"))["total"] or 0
+        total_ventas = resumen["total_ventas"]
 
         # 📦 Total de unidades vendidas
-        total_unidades = detalles.aggregate(total=Sum("cantidad"))["total"] or 0
+        total_unidades = resumen["total_unidades"]
 
         # 📊 Total de transacciones
-        total_transacciones = ventas.count()
+        total_transacciones = resumen["cantidad_ventas"]
 
         return Response({
             "status": "sucess",
@@ -522,6 +433,7 @@ def resumen_ventas_view(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@renderer_classes([JSONRenderer, BrowsableAPIRenderer, NDJSONRenderer, CSVRenderer])
 def reporte_ventas(request):
     """
     🧾 Reporte detallado y entendible de ventas.
@@ -533,10 +445,13 @@ def reporte_ventas(request):
     Parámetros opcionales:
     - fecha_inicio: YYYY-MM-DD
     - fecha_fin: YYYY-MM-DD
+    - format: ndjson | csv → exporta solo el detalle de ventas en streaming
+      (una venta por línea en ndjson, un producto por fila en csv)
 
     Ejemplos:
     - GET /api/ventas/reporte/                     → Reporte del día actual
     - GET /api/ventas/reporte/?fecha_inicio=2025-11-01&fecha_fin=2025-11-07
+    - GET /api/ventas/reporte/?fecha_inicio=2025-11-01&fecha_fin=2025-11-30&format=csv
     """
 
     # === 1️⃣ Definir rango de fechas ===
@@ -545,13 +460,13 @@ def reporte_ventas(request):
 
     try:
         if fecha_inicio and fecha_fin:
-            inicio = datetime.strptime(fecha_inicio, "%Y-%m-%d")
-            fin = datetime.strptime(fecha_fin, "%Y-%m-%d") + timedelta(days=1)
+            fecha_inicio_date = datetime.strptime(fecha_inicio, "%Y-%m-%d").date()
+            fecha_fin_date = datetime.strptime(fecha_fin, "%Y-%m-%d").date()
             rango_texto = f"📆 Desde {fecha_inicio} hasta {fecha_fin}"
         else:
-            hoy = now().date()
-            inicio = hoy
-            fin = hoy + timedelta(days=1)
+            hoy = timezone.localdate()
+            fecha_inicio_date = hoy
+            fecha_fin_date = hoy
             rango_texto = f"📅 Reporte del día: {hoy.strftime('%Y-%m-%d')}"
     except ValueError:
         return Response(
@@ -559,18 +474,21 @@ def reporte_ventas(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    # === 2 Obtener ventas del rango ===
-    ventas = (
-        Venta.objects.filter(created_at__range=[inicio, fin])
-        .select_related("cliente", "creado_por")
-        .prefetch_related(
-            Prefetch("detalles", queryset=DetalleVenta.objects.select_related("producto")),
-            Prefetch("pagos"),
+    inicio, fin = rango_dia_local(fecha_inicio_date, fecha_fin_date)
+
+    # === Exportación en streaming (memoria constante para cualquier rango) ===
+    formato = request.query_params.get("format")
+    if formato in FORMATOS_EXPORTACION:
+        return exportar_ventas(
+            Venta.objects.filter(created_at__range=[inicio, fin]),
+            formato,
+            f"reporte_ventas_{fecha_inicio_date}_{fecha_fin_date}",
         )
-        .order_by("-created_at")
-    )
 
-    if not ventas.exists():
+    # === 2️⃣ Resumen del rango (resúmenes diarios + día actual desde las ventas) ===
+    resumen = get_resumen_ventas(fecha_inicio_date, fecha_fin_date)
+
+    if not resumen["cantidad_ventas"]:
         return Response(
             {
                 "mensaje": "No se encontraron ventas en el rango seleccionado.",
@@ -580,82 +498,33 @@ def reporte_ventas(request):
             status=status.HTTP_200_OK,
         )
 
-    # === 3️⃣ Cálculos generales ===
-    total_ventas = ventas.aggregate(total=Sum("total"))["total"] or 0
-    total_descuentos = ventas.aggregate(descuento=Sum("descuento"))["descuento"] or 0
-    total_impuestos = ventas.aggregate(impuesto=Sum("impuesto"))["impuesto"] or 0
-    cantidad_ventas = ventas.count()
-
-    # === 4️⃣ Unidades vendidas ===
-    detalles = DetalleVenta.objects.filter(venta__in=ventas)
-    total_unidades_vendidas = detalles.aggregate(total_unidades=Sum("cantidad"))[
-        "total_unidades"
-    ] or 0
-
-    # === 5 Desglose por metodo de pago (desde PagoVenta) ===
-    metodos_pago = (
-        PagoVenta.objects.filter(venta__in=ventas, deleted_at__isnull=True)
-        .values("metodo_pago")
-        .annotate(total=Sum("monto"))
-        .order_by("metodo_pago")
-    )
-
-    # === 6️⃣ Productos más vendidos ===
-    productos_top = (
-        detalles.values(nombre=F("producto__nombre"))
-        .annotate(total_vendido=Sum("cantidad"))
-        .order_by("-total_vendido")[:10]
-    )
+    # === 3️⃣ Ventas del rango para el detalle ===
+    ventas = con_relaciones_reporte(
+        Venta.objects.filter(created_at__range=[inicio, fin])
+    ).order_by("-created_at")
 
-    # === 7️⃣ Detalle de ventas con productos incluidos ===
-    detalle_ventas = []
+    # === 4️⃣ Cálculos generales ===
+    total_ventas = resumen["total_ventas"]
+    total_descuentos = resumen["total_descuentos"]
+    total_impuestos = resumen["total_impuestos"]
+    cantidad_ventas = resumen["cantidad_ventas"]
+    total_unidades_vendidas = resumen["total_unidades"]
 
-    for venta in ventas:
-        productos_detalle = [ 
-            {
-                "venta_id"          : d.id,
-                "venta_completa_id" : venta.id,
-                "codigo_venta"      : venta.codigo,
-                "producto_id"       : d.producto.id,
-                "producto"          : d.producto.nombre,
-                "cantidad"          : d.cantidad,
-                "precio_unitario"   : float(d.precio_unitario),
-                "subtotal_producto" : float(d.cantidad * d.precio_unitario),
-            }
-            for d in venta.detalles.all()
-        ]
+    # === 5️⃣ Desglose por metodo de pago (desde PagoVenta) ===
+    metodos_pago = resumen["por_metodo_pago"]
 
-        pagos_detalle = [
-            {
-                "metodo_pago": p.metodo_pago,
-                "monto": float(p.monto),
-                "tarjeta": p.tarjeta.nombre if p.tarjeta else None,
-            }
-            for p in venta.pagos.all()
-        ]
+    # === 6️⃣ Productos más vendidos ===
+    productos_top = resumen["productos_top"]
 
-        detalle_ventas.append(
-            {
-                "id": venta.id,
-                "codigo": venta.codigo,
-                "cliente": venta.cliente.nombre if venta.cliente else "Cliente no registrado",
-                "metodo_pago": venta.metodo_pago,
-                "pagos": pagos_detalle,
-                "subtotal": float(venta.subtotal),
-                "descuento": float(venta.descuento),
-                "impuesto": float(venta.impuesto),
-                "total": float(venta.total),
-                "fecha": venta.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                "creado_por": venta.creado_por.username if venta.creado_por else "No asignado",
-                "productos_comprados": productos_detalle,
-            }
-        )
+    # === 7️⃣ Detalle de ventas con productos incluidos ===
+    detalle_ventas = [serializar_venta_reporte(venta) for venta in ventas]
 
     # === 8️⃣ Totales contables (para el pie de tabla) ===
+    # Sumas exactas de la base de datos (Decimal); solo se convierten al responder
     totales_tabla = {
-        "subtotal_general": round(sum(v["subtotal"] for v in detalle_ventas), 2),
-        "impuesto_general": round(sum(v["impuesto"] for v in detalle_ventas), 2),
-        "total_general": round(sum(v["total"] for v in detalle_ventas), 2),
+        "subtotal_general": float(round(resumen["total_subtotal"], 2)),
+        "impuesto_general": float(round(resumen["total_impuestos"], 2)),
+        "total_general": float(round(resumen["total_ventas"], 2)),
     }
 
     # === 9️⃣ Construcción final del reporte ===
@@ -674,4 +543,63 @@ def reporte_ventas(request):
         "totales_tabla": totales_tabla,
     }
 
-    return Response(reporte, status=status.HTTP_200_OK)
\ No newline at end of file
+    return Response(reporte, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def reporte_margen(request):
+    """
+    Costo de lo vendido (FIFO) y margen por día del rango, con los productos de mayor margen.
+    El importe es neto de devoluciones y no incluye descuentos generales ni impuestos.
+
+    Parámetros opcionales:
+    - start_date: YYYY-MM-DD
+    - end_date: YYYY-MM-DD
+    Sin fechas se usa el día actual.
+    """
+    fecha_inicio = request.GET.get("start_date")
+    fecha_fin    = request.GET.get("end_date")
+
+    try:
+        if fecha_inicio and fecha_fin:
+            fecha_inicio_date = datetime.strptime(fecha_inicio, "%Y-%m-%d").date()
+            fecha_fin_date = datetime.strptime(fecha_fin, "%Y-%m-%d").date()
+        else:
+            fecha_inicio_date = fecha_fin_date = timezone.localdate()
+    except ValueError:
+        return Response(
+            {"error": "Formato de fecha inválido. Use YYYY-MM-DD."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        margen = get_margen_ventas(fecha_inicio_date, fecha_fin_date)
+
+        def _fila(fila):
+            return {
+                **fila,
+                "importe": float(fila["importe"]),
+                "costo": float(fila["costo"]),
+                "margen": float(fila["margen"]),
+                "margen_porcentaje": float(fila["margen_porcentaje"]),
+            }
+
+        return Response({
+            "fecha_inicio": fecha_inicio_date.strftime("%Y-%m-%d"),
+            "fecha_fin": fecha_fin_date.strftime("%Y-%m-%d"),
+            "totales": {
+                "unidades": margen["total_unidades"],
+                "importe": float(margen["total_importe"]),
+                "costo": float(margen["total_costo"]),
+                "margen": float(margen["total_margen"]),
+                "margen_porcentaje": float(margen["margen_porcentaje"]),
+            },
+            "dias": [_fila(d) for d in margen["dias"]],
+            "productos_top": [_fila(p) for p in margen["productos_top"]],
+        }, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        return Response(
+            {"error": f"Error al generar el reporte de margen: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
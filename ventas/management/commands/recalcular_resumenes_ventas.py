@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum, Count, F, DecimalField, ExpressionWrapper, Min, Max
+from django.utils import timezone
+
+from ventas.models import (
+    Venta, DetalleVenta, PagoVenta,
+    ResumenVentaDiaCajero, ResumenVentaDiaProducto, ResumenVentaDiaMetodoPago,
+)
+from ventas.api.utils import rango_dia_local
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye los resúmenes diarios de ventas (por cajero, producto y método de pago) "
+        "desde las tablas de ventas. Sin fechas recorre todo el historial."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Fecha inicial (YYYY-MM-DD)")
+        parser.add_argument('--hasta', help="Fecha final (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        try:
+            desde = datetime.strptime(options['desde'], "%Y-%m-%d").date() if options['desde'] else None
+            hasta = datetime.strptime(options['hasta'], "%Y-%m-%d").date() if options['hasta'] else None
+        except ValueError:
+            raise CommandError("Formato de fecha inválido. Use YYYY-MM-DD.")
+
+        if desde is None or hasta is None:
+            limites = Venta.objects.aggregate(primera=Min('created_at'), ultima=Max('created_at'))
+            if limites['primera'] is None:
+                self.stdout.write("No hay ventas registradas.")
+                return
+            desde = desde or timezone.localdate(limites['primera'])
+            hasta = hasta or timezone.localdate(limites['ultima'])
+
+        if desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta.")
+
+        dia = desde
+        dias = 0
+        while dia <= hasta:
+            self.recalcular_dia(dia)
+            dia += timedelta(days=1)
+            dias += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Resúmenes recalculados: {dias} día(s) desde {desde} hasta {hasta}."))
+
+    @transaction.atomic
+    def recalcular_dia(self, fecha):
+        """Reemplaza los resúmenes de un día por los valores agregados desde las ventas activas."""
+        inicio, fin = rango_dia_local(fecha, fecha)
+        ventas = Venta.objects.filter(created_at__range=(inicio, fin))
+
+        ResumenVentaDiaCajero.objects.filter(fecha=fecha).delete()
+        ResumenVentaDiaProducto.objects.filter(fecha=fecha).delete()
+        ResumenVentaDiaMetodoPago.objects.filter(fecha=fecha).delete()
+
+        ResumenVentaDiaCajero.objects.bulk_create([
+            ResumenVentaDiaCajero(fecha=fecha, **fila)
+            for fila in (
+                ventas.values(cajero_id=F('creado_por_id'))
+                .annotate(
+                    num_ventas=Count('id'),
+                    subtotal=Sum('subtotal'),
+                    descuento=Sum('descuento'),
+                    impuesto=Sum('impuesto'),
+                    total=Sum('total'),
+                )
+            )
+        ])
+
+        importe = ExpressionWrapper(F('cantidad') * F('precio_unitario'),
+                                    output_field=DecimalField(max_digits=14, decimal_places=2))
+        ResumenVentaDiaProducto.objects.bulk_create([
+            ResumenVentaDiaProducto(fecha=fecha, **fila)
+            for fila in (
+                DetalleVenta.objects.filter(venta__in=ventas)
+                .values('producto_id')
+                .annotate(unidades=Sum('cantidad'), importe=Sum(importe), costo=Sum('costo_total'))
+            )
+        ])
+
+        ResumenVentaDiaMetodoPago.objects.bulk_create([
+            ResumenVentaDiaMetodoPago(fecha=fecha, **fila)
+            for fila in (
+                PagoVenta.objects.filter(venta__in=ventas)
+                .values('metodo_pago')
+                .annotate(num_pagos=Count('id'), monto=Sum('monto'))
+            )
+        ])
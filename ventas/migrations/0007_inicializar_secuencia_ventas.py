@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def inicializar_secuencia(apps, schema_editor):
+    """
+    Deja la secuencia 'V-' en el consecutivo más alto ya emitido,
+    para que los nuevos códigos continúen la numeración existente.
+    """
+    Secuencia = apps.get_model('core', 'Secuencia')
+    Venta = apps.get_model('ventas', 'Venta')
+
+    ultimo = 0
+    for codigo in Venta.objects.filter(codigo__startswith='V-').values_list('codigo', flat=True).iterator():
+        numero = codigo[len('V-'):]
+        if numero.isdigit():
+            ultimo = max(ultimo, int(numero))
+
+    Secuencia.objects.update_or_create(prefijo='V-', defaults={'ultimo_valor': ultimo})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('ventas', '0006_alter_venta_tarjeta'),
+    ]
+
+    operations = [
+        migrations.RunPython(inicializar_secuencia, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2 on 2026-10-16 23:28
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('productos', '0004_producto_proveedor'),
+        ('ventas', '0008_venta_clave_idempotencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenVentaDiaMetodoPago',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Eliminación Lógica')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('metodo_pago', models.CharField(max_length=50, verbose_name='Método de Pago')),
+                ('num_pagos', models.IntegerField(default=0, verbose_name='Número de pagos')),
+                ('monto', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Monto')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario por método de pago',
+                'verbose_name_plural': 'Resúmenes diarios por método de pago',
+                'db_table': 'resumen_ventas_dia_metodo_pago',
+                'ordering': ['-fecha'],
+                'unique_together': {('fecha', 'metodo_pago')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenVentaDiaProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Eliminación Lógica')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('unidades', models.IntegerField(default=0, verbose_name='Unidades vendidas')),
+                ('importe', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Importe')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_ventas', to='productos.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario por producto',
+                'verbose_name_plural': 'Resúmenes diarios por producto',
+                'db_table': 'resumen_ventas_dia_producto',
+                'ordering': ['-fecha'],
+                'unique_together': {('fecha', 'producto')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenVentaDiaCajero',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Eliminación Lógica')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('num_ventas', models.IntegerField(default=0, verbose_name='Número de ventas')),
+                ('subtotal', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Subtotal')),
+                ('descuento', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Descuento')),
+                ('impuesto', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Impuesto')),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Total')),
+                ('cajero', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='resumenes_ventas', to=settings.AUTH_USER_MODEL, verbose_name='Cajero')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario por cajero',
+                'verbose_name_plural': 'Resúmenes diarios por cajero',
+                'db_table': 'resumen_ventas_dia_cajero',
+                'ordering': ['-fecha'],
+                'unique_together': {('fecha', 'cajero')},
+            },
+        ),
+    ]
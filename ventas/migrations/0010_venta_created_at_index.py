@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-16 23:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0009_resumenes_diarios_ventas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['created_at', 'id'], name='ventas_created_04ec7f_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-16 23:40
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def estimar_costo_historico(apps, schema_editor):
+    """
+    Las ventas anteriores no consumieron capas FIFO: su costo se estima con el
+    precio de compra actual de cada producto. Los resúmenes diarios se
+    completan después con `python manage.py recalcular_resumenes_ventas`.
+    """
+    DetalleVenta = apps.get_model('ventas', 'DetalleVenta')
+    Producto = apps.get_model('productos', 'Producto')
+
+    precio_compra = Producto.objects.filter(pk=models.OuterRef('producto_id')).values('precio_compra')[:1]
+    DetalleVenta.objects.update(
+        costo_total=models.ExpressionWrapper(
+            models.F('cantidad') * models.Subquery(precio_compra),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0010_venta_created_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detalleventa',
+            name='costo_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='Costo de lo vendido (FIFO)'),
+        ),
+        migrations.AddField(
+            model_name='resumenventadiaproducto',
+            name='costo',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Costo de lo vendido'),
+        ),
+        migrations.RunPython(estimar_costo_historico, migrations.RunPython.noop),
+    ]
@@ -25,11 +25,23 @@ class Venta(BaseModel):
         ('Otro', 'Otro'),
     ]
 
+    # Prefijo de la secuencia de códigos (core.Secuencia)
+    PREFIJO_CODIGO = 'V-'
+
     codigo = models.CharField(
         max_length=50,
         unique=True,
         verbose_name="Código de Venta"
     )
+
+    # Clave generada por la terminal POS para que los reintentos no dupliquen la venta
+    clave_idempotencia = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name="Clave de Idempotencia"
+    )
     
     cliente = models.ForeignKey(
         Cliente,
@@ -112,6 +124,10 @@ class Venta(BaseModel):
         verbose_name_plural = "Ventas"
         db_table = "ventas"
         ordering = ['-created_at']
+        indexes = [
+            # Rangos de fechas de reportes y recorrido por bloques de la exportación
+            models.Index(fields=['created_at', 'id']),
+        ]
 
     def __str__(self):
         return f"Venta #{self.codigo}"
@@ -201,6 +217,13 @@ class DetalleVenta(BaseModel):
         verbose_name="Combo"
     )
 
+    costo_total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="Costo de lo vendido (FIFO)"
+    )
+
     class Meta:
         verbose_name = "Detalle de Venta"
         verbose_name_plural = "Detalles de Ventas"
@@ -210,3 +233,83 @@ class DetalleVenta(BaseModel):
     def __str__(self):
         return f"{self.producto.nombre} x {self.cantidad}"
     
+
+
+# ======================================================
+# Resúmenes diarios (rollups) para resumen/ y reporte/
+# ======================================================
+# Se actualizan de forma incremental en la misma transacción que crea, devuelve
+# o elimina una venta (ventas.api.utils), y se reconstruyen con el comando
+# `python manage.py recalcular_resumenes_ventas`. La fecha es el día local.
+
+class ResumenVentaDiaCajero(BaseModel):
+    """Totales de ventas por día y por usuario que registró la venta."""
+
+    fecha  = models.DateField(verbose_name="Fecha")
+    cajero = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="resumenes_ventas",
+        verbose_name="Cajero"
+    )
+    num_ventas = models.IntegerField(default=0, verbose_name="Número de ventas")
+    subtotal   = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Subtotal")
+    descuento  = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Descuento")
+    impuesto   = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Impuesto")
+    total      = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Total")
+
+    class Meta:
+        verbose_name = "Resumen diario por cajero"
+        verbose_name_plural = "Resúmenes diarios por cajero"
+        db_table = "resumen_ventas_dia_cajero"
+        ordering = ['-fecha']
+        unique_together = [['fecha', 'cajero']]
+
+    def __str__(self):
+        return f"{self.fecha} · {self.cajero_id}: {self.total}"
+
+
+class ResumenVentaDiaProducto(BaseModel):
+    """Unidades, importe y costo vendidos por día y por producto (netos de devoluciones)."""
+
+    fecha    = models.DateField(verbose_name="Fecha")
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name="resumenes_ventas",
+        verbose_name="Producto"
+    )
+    unidades = models.IntegerField(default=0, verbose_name="Unidades vendidas")
+    importe  = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Importe")
+    costo    = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Costo de lo vendido")
+
+    class Meta:
+        verbose_name = "Resumen diario por producto"
+        verbose_name_plural = "Resúmenes diarios por producto"
+        db_table = "resumen_ventas_dia_producto"
+        ordering = ['-fecha']
+        unique_together = [['fecha', 'producto']]
+
+    def __str__(self):
+        return f"{self.fecha} · {self.producto_id}: {self.unidades}"
+
+
+class ResumenVentaDiaMetodoPago(BaseModel):
+    """Monto cobrado por día y por método de pago (desde PagoVenta)."""
+
+    fecha       = models.DateField(verbose_name="Fecha")
+    metodo_pago = models.CharField(max_length=50, verbose_name="Método de Pago")
+    num_pagos   = models.IntegerField(default=0, verbose_name="Número de pagos")
+    monto       = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Monto")
+
+    class Meta:
+        verbose_name = "Resumen diario por método de pago"
+        verbose_name_plural = "Resúmenes diarios por método de pago"
+        db_table = "resumen_ventas_dia_metodo_pago"
+        ordering = ['-fecha']
+        unique_together = [['fecha', 'metodo_pago']]
+
+    def __str__(self):
+        return f"{self.fecha} · {self.metodo_pago}: {self.monto}"
@@ -1,3 +1,442 @@
-from django.test import TestCase
+import sys
+import threading
+import time
 
-# Create your tests here.
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from categoria.models import Categoria
+from inventarioproducto.api.utils import reservar_stock
+from inventarioproducto.models import MovimientoInventario, SaldoInventario
+from productos.models import Producto
+from proveedores.models import Proveedor
+from tarjetabancaria.models import TarjetaBancaria
+from user.models import User
+from ventas.api.utils import get_resumen_ventas
+from ventas.models import Venta, DetalleVenta, PagoVenta
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ReservarStockConcurrenciaTests(TransactionTestCase):
+    """
+    Ventas simultáneas del mismo producto: cada hilo usa su propia conexión y
+    su propia transacción, como dos cajas del POS. El saldo nunca debe quedar
+    negativo ni descontar más de lo que había.
+
+    Necesitan SELECT ... FOR UPDATE: se omiten en sqlite y corren contra
+    MySQL con la configuración de backend/settings.py, por ejemplo
+    `python manage.py test ventas` con las variables DATABASE_* apuntando a
+    un servidor de pruebas.
+    """
+
+    HILOS = 8
+    STOCK_INICIAL = 5
+
+    # Rendimiento: ventas de varios productos por hilo sobre un catálogo chico,
+    # así las ventas comparten productos y esperan bloqueos entre sí
+    VENTAS_POR_HILO = 25
+    PRODUCTOS_POR_VENTA = 3
+    PRODUCTOS_RENDIMIENTO = 6
+
+    def setUp(self):
+        categoria = Categoria.objects.create(nombre='Cat')
+        proveedor = Proveedor.objects.create(nombre_empresa='Prov', ciudad='X')
+        self.productos = [
+            Producto.objects.create(
+                nombre=f'P{i}', categoria=categoria, proveedor=proveedor, precio_compra=10,
+                porcentaje_ganancia=10, precio_final=11, codigo_busqueda=f'C{i}',
+            )
+            for i in range(2)
+        ]
+        for producto in self.productos:
+            SaldoInventario.objects.update_or_create(
+                producto=producto, defaults={'cantidad': self.STOCK_INICIAL}
+            )
+
+    def _vender_en_hilos(self, cantidades_por_hilo):
+        barrera = threading.Barrier(len(cantidades_por_hilo))
+        resultados, errores = [], []
+
+        def vender(cantidades):
+            try:
+                barrera.wait()
+                with transaction.atomic():
+                    reservar_stock(cantidades, referencia='TEST')
+                resultados.append(True)
+            except IntegrityError:
+                resultados.append(False)  # Stock insuficiente: la venta se rechaza completa
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=vender, args=(cantidades,)) for cantidades in cantidades_por_hilo]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(errores, [])
+        return resultados
+
+    def test_no_vende_mas_que_el_stock(self):
+        producto = self.productos[0]
+        resultados = self._vender_en_hilos([{producto.id: 1}] * self.HILOS)
+
+        saldo = SaldoInventario.objects.get(producto=producto)
+        self.assertEqual(resultados.count(True), self.STOCK_INICIAL)
+        self.assertEqual(saldo.cantidad, 0)
+        self.assertEqual(
+            MovimientoInventario.objects.filter(producto=producto, tipo='venta').count(),
+            self.STOCK_INICIAL,
+        )
+
+    def test_productos_en_orden_distinto_no_se_bloquean(self):
+        # Mitad de los hilos pide (A, B) y la otra mitad (B, A): el bloqueo en
+        # orden de producto_id evita el deadlock y ninguna venta queda a medias.
+        a, b = self.productos
+        pedidos = [{a.id: 1, b.id: 1}, {b.id: 1, a.id: 1}] * (self.HILOS // 2)
+        resultados = self._vender_en_hilos(pedidos)
+
+        vendidas = resultados.count(True)
+        self.assertEqual(vendidas, self.STOCK_INICIAL)
+        for producto in self.productos:
+            self.assertEqual(SaldoInventario.objects.get(producto=producto).cantidad, self.STOCK_INICIAL - vendidas)
+
+    def test_rendimiento_ventas_simultaneas_varios_productos(self):
+        # Informa ventas por segundo de HILOS cajas vendiendo a la vez; todas
+        # deben completarse y el saldo debe cuadrar con los movimientos.
+        base = self.productos[0]
+        productos = self.productos + [
+            Producto.objects.create(
+                nombre=f'R{i}', categoria=base.categoria, proveedor=base.proveedor, precio_compra=10,
+                porcentaje_ganancia=10, precio_final=11, codigo_busqueda=f'R{i}',
+            )
+            for i in range(self.PRODUCTOS_RENDIMIENTO - len(self.productos))
+        ]
+        stock = self.HILOS * self.VENTAS_POR_HILO
+        for producto in productos:
+            SaldoInventario.objects.update_or_create(producto=producto, defaults={'cantidad': stock})
+
+        # Cada venta toma PRODUCTOS_POR_VENTA productos seguidos, en orden
+        # distinto según el hilo
+        pedidos_por_hilo = [
+            [
+                {
+                    productos[(hilo + venta + k) % len(productos)].id: 1
+                    for k in (range(self.PRODUCTOS_POR_VENTA) if hilo % 2 else reversed(range(self.PRODUCTOS_POR_VENTA)))
+                }
+                for venta in range(self.VENTAS_POR_HILO)
+            ]
+            for hilo in range(self.HILOS)
+        ]
+
+        barrera = threading.Barrier(self.HILOS + 1)
+        errores = []
+
+        def vender(pedidos):
+            try:
+                barrera.wait()
+                for cantidades in pedidos:
+                    with transaction.atomic():
+                        reservar_stock(cantidades, referencia='TEST')
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=vender, args=(pedidos,)) for pedidos in pedidos_por_hilo]
+        for hilo in hilos:
+            hilo.start()
+        barrera.wait()
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.join()
+        segundos = time.perf_counter() - inicio
+
+        self.assertEqual(errores, [])
+        ventas = self.HILOS * self.VENTAS_POR_HILO
+        vendidos = {}
+        for pedidos in pedidos_por_hilo:
+            for cantidades in pedidos:
+                for producto_id, cantidad in cantidades.items():
+                    vendidos[producto_id] = vendidos.get(producto_id, 0) + cantidad
+        for producto in productos:
+            self.assertEqual(SaldoInventario.objects.get(producto=producto).cantidad, stock - vendidos.get(producto.id, 0))
+        self.assertEqual(
+            MovimientoInventario.objects.filter(producto__in=productos, tipo='venta').count(),
+            ventas * self.PRODUCTOS_POR_VENTA,
+        )
+
+        sys.stderr.write(
+            f"\n{ventas} ventas de {self.PRODUCTOS_POR_VENTA} productos en {self.HILOS} hilos: "
+            f"{segundos:.2f} s ({ventas / segundos:.0f} ventas/s)\n"
+        )
+
+
+class ListVentasConsultasTests(TestCase):
+    """list_ventas corre un número fijo de consultas sin importar el tamaño de la página."""
+
+    CONSULTAS = 3  # count, página de ventas, pagos con su tarjeta
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='cajero', role='admin')
+        categoria = Categoria.objects.create(nombre='Cat')
+        proveedor = Proveedor.objects.create(nombre_empresa='Prov', ciudad='X')
+        producto = Producto.objects.create(
+            nombre='P0', categoria=categoria, proveedor=proveedor, precio_compra=10,
+            porcentaje_ganancia=10, precio_final=11, codigo_busqueda='C0',
+        )
+        tarjeta = TarjetaBancaria.objects.create(nombre='Caja')
+
+        for i in range(12):
+            venta = Venta.objects.create(
+                codigo=f'V-{i + 1:05d}', subtotal=Decimal('22.00'), total=Decimal('22.00'),
+                creado_por=cls.usuario, tarjeta=tarjeta,
+            )
+            DetalleVenta.objects.bulk_create([
+                DetalleVenta(venta=venta, producto=producto, cantidad=1, precio_unitario=Decimal('11.00')),
+                DetalleVenta(venta=venta, producto=producto, cantidad=1, precio_unitario=Decimal('11.00')),
+            ])
+            PagoVenta.objects.bulk_create([
+                PagoVenta(venta=venta, metodo_pago='Efectivo', monto=Decimal('12.00'), tarjeta=tarjeta),
+                PagoVenta(venta=venta, metodo_pago='Tarjeta', monto=Decimal('10.00'), tarjeta=tarjeta),
+            ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def test_consultas_fijas_por_pagina(self):
+        for page_size in (2, 12):
+            with self.subTest(page_size=page_size), self.assertNumQueries(self.CONSULTAS):
+                respuesta = self.client.get('/api/ventas/list/', {'page_size': page_size})
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(len(respuesta.json()['results']), page_size)
+            self.assertEqual(respuesta.json()['results'][0]['num_productos'], 2)
+            self.assertEqual(len(respuesta.json()['results'][0]['pagos']), 2)
+
+
+class CodigosVentaTests(TestCase):
+    """Los códigos de venta salen de la secuencia 'V-' o de un bloque reservado por la terminal."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='cajero', role='admin')
+        categoria = Categoria.objects.create(nombre='Cat')
+        proveedor = Proveedor.objects.create(nombre_empresa='Prov', ciudad='X')
+        cls.producto = Producto.objects.create(
+            nombre='P0', categoria=categoria, proveedor=proveedor, precio_compra=10,
+            porcentaje_ganancia=10, precio_final=11, codigo_busqueda='C0',
+        )
+        SaldoInventario.objects.update_or_create(producto=cls.producto, defaults={'cantidad': 100})
+        cls.tarjeta = TarjetaBancaria.objects.create(nombre='Caja')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def _vender(self, **extra):
+        return self.client.post('/api/ventas/create/', {
+            'tarjeta_id': self.tarjeta.id,
+            'total': '11.00',
+            'items': [{'id': self.producto.id, 'quantity': 1, 'precio_final': '11.00'}],
+            **extra,
+        }, format='json')
+
+    def test_codigos_consecutivos(self):
+        siguiente = self.client.get('/api/ventas/get-siguiente-codigo-venta-v2/').json()
+        self.assertEqual(siguiente, {'siguiente_codigo': 'V-00001', 'numero': 1})
+
+        self.assertEqual(self._vender().json()['codigo'], 'V-00001')
+        self.assertEqual(self._vender().json()['codigo'], 'V-00002')
+        self.assertEqual(self.client.get('/api/ventas/get-siguiente-codigo-venta-v2/').json()['numero'], 3)
+
+    def test_codigos_de_bloque_reservado(self):
+        respuesta = self.client.post('/api/ventas/reservar-codigos/', {'cantidad': 3}, format='json')
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.json()['codigos'], ['V-00001', 'V-00002', 'V-00003'])
+
+        self.assertEqual(self._vender(codigo='V-00002').json()['codigo'], 'V-00002')
+        # Las ventas sin código siguen después del bloque
+        self.assertEqual(self._vender().json()['codigo'], 'V-00004')
+
+        # Un código fuera de los bloques reservados se rechaza
+        respuesta = self._vender(codigo='V-00099')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(Venta.objects.filter(codigo='V-00099').exists())
+
+        self.assertEqual(self.client.post('/api/ventas/reservar-codigos/', {'cantidad': 0}, format='json').status_code, 400)
+
+
+class VentasLoteTests(TestCase):
+    """
+    Sincronización por lotes: reenviar un lote ya aplicado no registra de
+    nuevo sus ventas ni descuenta stock otra vez.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='cajero', role='admin')
+        categoria = Categoria.objects.create(nombre='Cat')
+        proveedor = Proveedor.objects.create(nombre_empresa='Prov', ciudad='X')
+        cls.producto = Producto.objects.create(
+            nombre='P0', categoria=categoria, proveedor=proveedor, precio_compra=10,
+            porcentaje_ganancia=10, precio_final=11, codigo_busqueda='C0',
+        )
+        SaldoInventario.objects.update_or_create(producto=cls.producto, defaults={'cantidad': 10})
+        cls.tarjeta = TarjetaBancaria.objects.create(nombre='Caja')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def _venta(self, clave, cantidad):
+        return {
+            'clave_idempotencia': clave,
+            'tarjeta_id': self.tarjeta.id,
+            'total': str(11 * cantidad),
+            'items': [{'id': self.producto.id, 'quantity': cantidad, 'precio_final': '11.00'}],
+        }
+
+    def _sincronizar(self, ventas):
+        respuesta = self.client.post('/api/ventas/batch/', {'ventas': ventas}, format='json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        return respuesta.json()
+
+    def _stock(self):
+        return SaldoInventario.objects.get(producto=self.producto).cantidad
+
+    @patch('ventas.api.views.VENTAS_POR_BLOQUE', 2)
+    def test_reenviar_lote_es_idempotente(self):
+        lote = [self._venta('a', 2), self._venta('b', 50), self._venta('c', 3), self._venta('a', 2)]
+
+        primera = self._sincronizar(lote)
+        self.assertEqual(
+            [r['estado'] for r in primera['resultados']],
+            ['creada', 'error', 'creada', 'duplicada'],
+        )
+        self.assertEqual(primera['resultados'][3]['id'], primera['resultados'][0]['id'])
+        self.assertEqual(self._stock(), 5)
+
+        segunda = self._sincronizar(lote)
+        self.assertEqual(
+            [r['estado'] for r in segunda['resultados']],
+            ['duplicada', 'error', 'duplicada', 'duplicada'],
+        )
+        self.assertEqual(
+            [r.get('codigo') for r in segunda['resultados']],
+            [r.get('codigo') for r in primera['resultados']],
+        )
+        self.assertEqual((segunda['creadas'], segunda['duplicadas'], segunda['errores']), (0, 3, 1))
+        self.assertEqual(self._stock(), 5)
+        self.assertEqual(Venta.objects.count(), 2)
+        self.assertEqual(MovimientoInventario.objects.filter(producto=self.producto, tipo='venta').count(), 2)
+
+        # create/ con una clave ya sincronizada retorna la venta existente
+        respuesta = self.client.post('/api/ventas/create/', self._venta('c', 3), format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['id'], primera['resultados'][2]['id'])
+        self.assertEqual(self._stock(), 5)
+
+    def test_rechaza_ventas_sin_clave(self):
+        venta = self._venta('a', 1)
+        del venta['clave_idempotencia']
+        respuesta = self.client.post('/api/ventas/batch/', {'ventas': [self._venta('b', 1), venta]}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(Venta.objects.exists())
+
+
+class ResumenesDiariosTests(TestCase):
+    """
+    Los resúmenes diarios deben dar lo mismo que agregar las tablas de
+    ventas. get_resumen_ventas lee el día actual de las ventas y los días
+    cerrados de los resúmenes: se comparan ambos caminos para el mismo día.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create(username='cajero', role='admin')
+        categoria = Categoria.objects.create(nombre='Cat')
+        proveedor = Proveedor.objects.create(nombre_empresa='Prov', ciudad='X')
+        cls.productos = [
+            Producto.objects.create(
+                nombre=f'P{i}', categoria=categoria, proveedor=proveedor, precio_compra=10,
+                porcentaje_ganancia=10, precio_final=11, codigo_busqueda=f'C{i}',
+            )
+            for i in range(3)
+        ]
+        for producto in cls.productos:
+            SaldoInventario.objects.update_or_create(producto=producto, defaults={'cantidad': 50})
+        cls.efectivo = TarjetaBancaria.objects.create(nombre='Caja')
+        cls.banco = TarjetaBancaria.objects.create(nombre='Banco', pan='4111')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def _vender(self, cantidades, pagos):
+        total = sum(11 * cantidad for cantidad in cantidades.values())
+        respuesta = self.client.post('/api/ventas/create/', {
+            'subtotal': str(total),
+            'total': str(total),
+            'items': [
+                {'id': producto.id, 'quantity': cantidad, 'precio_final': '11.00'}
+                for producto, cantidad in cantidades.items()
+            ],
+            'pagos': [
+                {'metodo_pago': metodo, 'monto': str(monto), 'tarjeta_id': tarjeta.id}
+                for metodo, monto, tarjeta in pagos
+            ],
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        return Venta.objects.get(pk=respuesta.json()['id'])
+
+    def _resumen_desde_resumenes(self, dia):
+        # Con "hoy" en el día siguiente, el día consultado ya está cerrado
+        with patch('ventas.api.utils.timezone.localdate', return_value=dia + timedelta(days=1)):
+            return get_resumen_ventas(dia, dia)
+
+    def assertResumenesIgualVentas(self):
+        hoy = timezone.localdate()
+        self.assertEqual(self._resumen_desde_resumenes(hoy), get_resumen_ventas(hoy, hoy))
+
+    def test_resumenes_igual_a_ventas(self):
+        a, b, c = self.productos
+        self._vender({a: 2, b: 1}, [('Efectivo', 20, self.efectivo), ('Transferencia', 13, self.banco)])
+        self._vender({b: 3}, [('Efectivo', 33, self.efectivo)])
+        descartada = self._vender({c: 4, a: 1}, [('Tarjeta', 55, self.banco)])
+        self.assertResumenesIgualVentas()
+
+        # Devolución parcial de una línea
+        detalle = DetalleVenta.objects.get(producto=b, cantidad=3)
+        respuesta = self.client.post('/api/devoluciones/create/', {
+            'venta_completa_id': detalle.venta_id,
+            'detalle_venta_id': detalle.id,
+            'codigo_venta': detalle.venta.codigo,
+            'producto_id': b.id,
+            'cantidad': 1,
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        self.assertResumenesIgualVentas()
+
+        self.assertEqual(self.client.delete(f'/api/ventas/{descartada.id}/delete/').status_code, 200)
+        self.assertResumenesIgualVentas()
+
+        resumen = get_resumen_ventas(timezone.localdate(), timezone.localdate())
+        self.assertEqual(resumen['cantidad_ventas'], 2)
+        self.assertEqual(resumen['total_unidades'], 5)
+        self.assertEqual(resumen['productos_top'], [{'nombre': 'P1', 'total_vendido': 3}, {'nombre': 'P0', 'total_vendido': 2}])
+
+        # El comando de reparación reconstruye los mismos valores
+        antes = self._resumen_desde_resumenes(timezone.localdate())
+        call_command('recalcular_resumenes_ventas', stdout=StringIO())
+        self.assertEqual(self._resumen_desde_resumenes(timezone.localdate()), antes)